@@ -0,0 +1,223 @@
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import tabulate
+
+from .synthetic import Workload, generate
+from .worker import CASES
+
+logger = logging.getLogger('benchmarks')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# bump this whenever the format of the results changes
+VERSION = 1
+
+# stages that take less than this number of seconds are too noisy to compare
+MIN_COMPARABLE_DURATION = 0.05
+
+
+def workload_for_scale(scale):
+    # type: (int) -> Workload
+    return Workload(files=10 * scale,
+                    lines_per_file=500,
+                    tests=20,
+                    transformations=50000 * scale,
+                    patch_every=100)
+
+
+def run_case(case, fn_files, directory, workload):
+    # type: (str, str, str, Workload) -> Dict[str, Any]
+    dir_case = os.path.join(directory, case)
+    os.makedirs(dir_case, exist_ok=True)
+    fn_result = os.path.join(dir_case, 'result.json')
+    fn_log = os.path.join(dir_case, 'benchmark.log')
+    cmd = [sys.executable, '-m', 'benchmarks.worker', case,
+           '--files', fn_files,
+           '--directory', dir_case,
+           '--patch-every', str(workload.patch_every),
+           '--result', fn_result]
+    with open(fn_log, 'w') as f:
+        returncode = subprocess.call(cmd, stdout=f, stderr=subprocess.STDOUT)
+    if returncode != 0 or not os.path.exists(fn_result):
+        raise Exception("benchmark case [{}] failed (exit code {}); see log: {}".format(  # noqa: pycodestyle
+            case, returncode, fn_log))
+    with open(fn_result, 'r') as f:
+        return json.load(f)
+
+
+def summarize(results):
+    # type: (List[Dict[str, Any]]) -> Dict[str, Any]
+    """
+    Combines the results of repeated runs of a benchmark case, using the
+    fastest time and the largest memory usage observed for each stage.
+    """
+    summary = {'duration': min(r['duration'] for r in results),
+               'peak_rss_mb': max(r['peak_rss_mb'] for r in results),
+               'stages': {}}  # type: Dict[str, Any]
+    for result in results:
+        for stage in result['stages']:
+            name = stage['name']
+            if name not in summary['stages']:
+                summary['stages'][name] = dict(stage)
+                continue
+            existing = summary['stages'][name]
+            existing['duration'] = min(existing['duration'], stage['duration'])
+            for key in ('rss_mb', 'peak_rss_mb'):
+                if stage[key] is not None:
+                    existing[key] = max(existing[key] or 0, stage[key])
+    return summary
+
+
+def compare(results, baseline, tolerance):
+    # type: (Dict[str, Any], Dict[str, Any], float) -> List[Tuple[str, str, str, float, float]]
+    """
+    Compares a set of results against a baseline.
+
+    Returns:
+        a list of regressions, each given by its case, stage, measure,
+        baseline value, and current value.
+    """
+    regressions = []  # type: List[Tuple[str, str, str, float, float]]
+    for (case, summary) in results['cases'].items():
+        if case not in baseline['cases']:
+            continue
+        base = baseline['cases'][case]
+        if summary['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append((case, '*', 'peak_rss_mb',
+                                base['peak_rss_mb'], summary['peak_rss_mb']))
+        for (name, stage) in summary['stages'].items():
+            if name not in base['stages']:
+                continue
+            before = base['stages'][name]['duration']
+            after = stage['duration']
+            if before >= MIN_COMPARABLE_DURATION \
+               and after > before * (1 + tolerance):
+                regressions.append((case, name, 'duration', before, after))
+    return regressions
+
+
+def format_results(results, baseline=None):
+    # type: (Dict[str, Any], Optional[Dict[str, Any]]) -> str
+    def fmt(value, spec='{:.3f}'):
+        # type: (Optional[float], str) -> str
+        return '-' if value is None else spec.format(value)
+
+    rows = []  # type: List[List[str]]
+    for (case, summary) in sorted(results['cases'].items()):
+        for (name, stage) in summary['stages'].items():
+            items = stage['items']
+            throughput = None  # type: Optional[float]
+            if items is not None and stage['duration'] > 0:
+                throughput = items / stage['duration']
+            row = [case,
+                   name,
+                   fmt(items, '{}'),
+                   fmt(stage['duration']),
+                   fmt(throughput, '{:.1f}'),
+                   fmt(stage['rss_mb'], '{:.1f}'),
+                   fmt(stage['peak_rss_mb'], '{:.1f}')]
+            if baseline is not None:
+                before = None  # type: Optional[float]
+                try:
+                    before = baseline['cases'][case]['stages'][name]['duration']
+                except KeyError:
+                    pass
+                change = None  # type: Optional[float]
+                if before:
+                    change = 100.0 * (stage['duration'] - before) / before
+                row += [fmt(before), fmt(change, '{:+.1f}%')]
+            rows.append(row)
+    headers = ['Case', 'Stage', 'Items', 'Time (s)', 'Items/s',
+               'RSS (MB)', 'Peak RSS (MB)']
+    if baseline is not None:
+        headers += ['Baseline (s)', 'Change']
+    return tabulate.tabulate(rows, headers=headers)
+
+
+def main():
+    # type: () -> None
+    logging.basicConfig(format='%(message)s')
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='benchmarks the repair pipeline of the CLI offline, '
+                    'using synthetic scenarios and stand-ins for BugZoo and Docker.')  # noqa: pycodestyle
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES),
+                        default=sorted(CASES),
+                        help='the benchmark cases that should be run.')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='the size of the synthetic scenario.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='the number of times that each case should be run.')  # noqa: pycodestyle
+    parser.add_argument('--output', type=str,
+                        help='writes the results to a given file.')
+    parser.add_argument('--baseline', type=str,
+                        help='compares the results against a given results file.')  # noqa: pycodestyle
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='the fractional slowdown (or increase in peak memory) that is tolerated before a regression is reported.')  # noqa: pycodestyle
+    parser.add_argument('--workdir', type=str,
+                        help='the directory in which the synthetic scenario and results are kept.')  # noqa: pycodestyle
+    args = parser.parse_args()
+
+    baseline = None  # type: Optional[Dict[str, Any]]
+    workload = workload_for_scale(args.scale)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != VERSION \
+           or baseline.get('workload') != workload._asdict():
+            logger.error("baseline was produced for a different workload or format: %s",  # noqa: pycodestyle
+                         args.baseline)
+            sys.exit(2)
+
+    directory = args.workdir or tempfile.mkdtemp(prefix='start-cli-benchmarks-')
+    try:
+        fn_files = os.path.join(directory, 'files.json')
+        files = generate(workload, os.path.join(directory, 'scenario'))
+        with open(fn_files, 'w') as f:
+            json.dump(files, f)
+
+        results = {'version': VERSION,
+                   'workload': workload._asdict(),
+                   'python': platform.python_version(),
+                   'cases': {}}  # type: Dict[str, Any]
+        for case in args.cases:
+            runs = []  # type: List[Dict[str, Any]]
+            for num in range(args.repeat):
+                logger.info("running benchmark case [%s] (%d/%d)",
+                            case, num + 1, args.repeat)
+                try:
+                    runs.append(run_case(case, fn_files, directory, workload))
+                except Exception as e:
+                    logger.error(str(e))
+                    sys.exit(2)
+            results['cases'][case] = summarize(runs)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print(format_results(results, baseline))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info("wrote results to file: %s", args.output)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for (case, stage, measure, before, after) in regressions:
+            logger.error("regression in %s [%s] %s: %.3f -> %.3f",
+                         case, stage, measure, before, after)
+        if regressions:
+            sys.exit(1)
+        logger.info("no regressions relative to baseline: %s", args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+__all__ = ['install']
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from collections import namedtuple
+import datetime
+import json
+import logging
+import time
+import uuid
+
+import start_cli.repair
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+TestCase = namedtuple('TestCase', ['name'])
+CommandResponse = namedtuple('CommandResponse', ['code', 'output', 'duration'])
+
+
+class FakeScenario(object):
+    """
+    Stands in for a START scenario, which would otherwise require its
+    mission, attack and Docker image to be present.
+    """
+    def __init__(self, name):
+        # type: (str) -> None
+        self.name = name
+
+    @staticmethod
+    def from_file(fn):
+        # type: (str) -> FakeScenario
+        with open(fn, 'r') as f:
+            return FakeScenario(json.load(f)['name'])
+
+
+class FakeSnapshot(object):
+    """
+    Stands in for a BugZoo snapshot of a scenario.
+    """
+    def __init__(self, name, tests):
+        # type: (str, List[TestCase]) -> None
+        self.name = name
+        self.tests = tests
+        self.source_dir = '/opt/ardupilot'
+
+    @staticmethod
+    def build(scenario, **kwargs):
+        # type: (FakeScenario, **Any) -> FakeSnapshot
+        return FakeSnapshot(scenario.name, [])
+
+    def __str__(self):
+        # type: () -> str
+        return self.name
+
+
+class FakeContainers(object):
+    """
+    Stands in for the container manager of BugZoo. Commands and coverage
+    requests succeed immediately without doing any work.
+    """
+    def __init__(self):
+        # type: () -> None
+        self.__containers = {}  # type: Dict[str, Any]
+
+    def provision(self, snapshot):
+        # type: (FakeSnapshot) -> Any
+        container = namedtuple('Container', ['uid', 'snapshot'])(
+            uuid.uuid4().hex, snapshot)
+        self.__containers[container.uid] = container
+        return container
+
+    def command(self, container, cmd, context=None, **kwargs):
+        # type: (Any, str, Optional[str], **Any) -> CommandResponse
+        return CommandResponse(0, '', 0.0)
+
+    def coverage(self, container, tests=None, **kwargs):
+        # type: (Any, Optional[List[TestCase]], **Any) -> Any
+        return start_cli.repair.TestSuiteCoverage({})
+
+    def __delitem__(self, uid):
+        # type: (str) -> None
+        del self.__containers[uid]
+
+
+class FakeBugs(object):
+    def __init__(self):
+        # type: () -> None
+        self.__bugs = {}  # type: Dict[str, FakeSnapshot]
+
+    def add(self, snapshot):
+        # type: (FakeSnapshot) -> None
+        self.__bugs[snapshot.name] = snapshot
+
+    def __getitem__(self, name):
+        # type: (str) -> FakeSnapshot
+        return self.__bugs[name]
+
+
+class FakeBugZoo(object):
+    """
+    Stands in for a BugZoo installation, which would otherwise require a
+    Docker daemon and the scenario images.
+    """
+    def __init__(self, docker_client_api_version=None):
+        # type: (Optional[str]) -> None
+        self.bugs = FakeBugs()
+        self.containers = FakeContainers()
+
+
+class FakeProblem(object):
+    """
+    Stands in for a repair problem, which would otherwise obtain the
+    contents of the source files from a container.
+    """
+    def __init__(self, bz, snapshot, coverage, **kwargs):
+        # type: (FakeBugZoo, FakeSnapshot, Any, **Any) -> None
+        self.bug = snapshot
+        self.coverage = coverage
+
+
+class FakeCandidate(object):
+    def __init__(self, transformation):
+        # type: (Any) -> None
+        self.transformations = (transformation,)
+
+    def to_diff(self, problem):
+        # type: (FakeProblem) -> str
+        d = self.transformations[0].to_dict()
+        filename = d['location'].split('@')[0]
+        line = int(d['location'].split('@')[1].split(':')[0])
+        snippet = d.get('replacement') or d.get('statement')
+        replacement = snippet['content'] if snippet else ''
+        return ("--- a/{0}\n+++ b/{0}\n@@ -{1},1 +{1},1 @@\n"
+                "-  /* {2} */\n+  {3}\n").format(filename, line, d['kind'],
+                                                 replacement)
+
+
+class FakeOutcomes(object):
+    def record(self, candidate, outcome):
+        # type: (Any, Any) -> None
+        pass
+
+
+class FakeSearcher(object):
+    """
+    Stands in for the search, which would otherwise evaluate each candidate
+    patch within a container. Each transformation is treated as a candidate
+    patch that is instantaneously evaluated, and one in every `patch_every`
+    candidates is reported as a plausible patch.
+    """
+    def __init__(self, transformations, patch_every):
+        # type: (Iterable[Any], int) -> None
+        self.__transformations = transformations
+        self.__patch_every = patch_every
+        self.__time_started = None  # type: Optional[float]
+        self.__time_stopped = None  # type: Optional[float]
+        self.num_candidate_evals = 0
+        self.num_test_evals = 0
+        self.outcomes = FakeOutcomes()
+
+    @property
+    def time_running(self):
+        # type: () -> datetime.timedelta
+        if self.__time_started is None:
+            return datetime.timedelta()
+        stopped = self.__time_stopped or time.time()
+        return datetime.timedelta(seconds=stopped - self.__time_started)
+
+    def __iter__(self):
+        # type: () -> Iterator[FakeCandidate]
+        self.__time_started = time.time()
+        for transformation in self.__transformations:
+            self.num_candidate_evals += 1
+            self.num_test_evals += 1
+            if self.num_candidate_evals % self.__patch_every == 0:
+                yield FakeCandidate(transformation)
+        self.__time_stopped = time.time()
+
+
+class FakeRepair(object):
+    """
+    Stands in for the start_repair module: the search is replaced by a
+    stand-in, but every other function (e.g., fault localization) is used
+    as is.
+    """
+    def __init__(self, real, patch_every):
+        # type: (Any, int) -> None
+        self.__real = real
+        self.__patch_every = patch_every
+
+    def __getattr__(self, name):
+        # type: (str) -> Any
+        if name.startswith('_FakeRepair__'):
+            raise AttributeError(name)
+        return getattr(self.__real, name)
+
+    def search(self, problem, snapshot, transformations=None, **kwargs):
+        # type: (FakeProblem, FakeSnapshot, Iterable[Any], **Any) -> FakeSearcher
+        return FakeSearcher(transformations, self.__patch_every)
+
+
+def install(patch_every):
+    # type: (int) -> None
+    """
+    Replaces the dependencies of the repair controller that require Docker
+    (i.e., BugZoo and the scenario, snapshot, problem and search built upon
+    it) with local stand-ins. The artifact loaders, fault localization,
+    snippet extraction and transformation readers are left untouched.
+    """
+    logger.debug("installing stand-ins for BugZoo and Docker")
+    start_cli.repair.Scenario = FakeScenario
+    start_cli.repair.Snapshot = FakeSnapshot
+    start_cli.repair.BugZoo = FakeBugZoo
+    start_cli.repair.Problem = FakeProblem
+    start_cli.repair.start_repair = FakeRepair(start_cli.repair.start_repair,
+                                               patch_every)
@@ -0,0 +1,166 @@
+__all__ = ['Workload', 'generate']
+
+from typing import Any, Dict, Iterator, List
+from collections import namedtuple
+import json
+import logging
+import os
+import random
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# describes the size of a synthetic scenario
+Workload = namedtuple('Workload', ['files',
+                                   'lines_per_file',
+                                   'tests',
+                                   'transformations',
+                                   'patch_every'])
+
+# the statements that are used to populate synthetic source files
+STATEMENTS = [
+    'x = y + 1;',
+    'return x;',
+    'y = compute(x, z);',
+    'if (x > 0) { y = -y; }',
+    'z = buffer[i];',
+    'count++;',
+    'state = next_state(state);',
+    'log_write(LOG_INFO, x);'
+]
+
+
+def _filename(num):
+    # type: (int) -> str
+    return 'libraries/AP_Synthetic/file{}.cpp'.format(num)
+
+
+def _location(filename, line, content):
+    # type: (str, int, str) -> str
+    return '{}@{}:1::{}:{}'.format(filename, line, line, len(content) + 1)
+
+
+def _snippet(content):
+    # type: (str) -> Dict[str, Any]
+    """
+    Describes a snippet, in the format produced by Darjeeling.
+    """
+    return {'content': content,
+            'kind': 'BinaryOperator',
+            'reads': ['x', 'y'],
+            'writes': ['x'],
+            'declares': [],
+            'requires_syntax': []}
+
+
+def coverage(workload, rng):
+    # type: (Workload, random.Random) -> Dict[str, Any]
+    """
+    Generates a line coverage report, in the format produced by BugZoo, in
+    which one in every ten tests fails.
+    """
+    report = {}  # type: Dict[str, Any]
+    for num_test in range(workload.tests):
+        name = 'test{}'.format(num_test)
+        lines = {}  # type: Dict[str, List[int]]
+        for num_file in range(workload.files):
+            lines[_filename(num_file)] = \
+                sorted(rng.sample(range(1, workload.lines_per_file + 1),
+                                  workload.lines_per_file // 3))
+        passed = num_test % 10 != 0
+        response = {'code': 0 if passed else 1,
+                    'duration': rng.uniform(10.0, 60.0),
+                    'output': ''}
+        report[name] = {'test': name,
+                        'outcome': {'passed': passed, 'response': response},
+                        'coverage': lines}
+    return report
+
+
+def analysis(workload, rng):
+    # type: (Workload, random.Random) -> Dict[str, Any]
+    """
+    Generates a static analysis report, in the format produced by Kaskara,
+    in which every other line of each file holds a statement.
+    """
+    functions = []  # type: List[Dict[str, Any]]
+    statements = []  # type: List[Dict[str, Any]]
+    for num_file in range(workload.files):
+        filename = _filename(num_file)
+        functions.append({
+            'name': 'function{}'.format(num_file),
+            'location': _location(filename, 1, ''),
+            'body': _location(filename, 1, ''),
+            'return-type': 'int',
+            'global': True,
+            'pure': False})
+        for line in range(1, workload.lines_per_file + 1, 2):
+            content = rng.choice(STATEMENTS)
+            statements.append({
+                'content': content,
+                'canonical': content,
+                'kind': 'BinaryOperator',
+                'location': _location(filename, line, content),
+                'reads': ['x', 'y'],
+                'writes': ['x'],
+                'visible': ['x', 'y', 'z', 'i', 'buffer', 'state', 'count'],
+                'declares': [],
+                'live_before': ['x', 'y'],
+                'requires_syntax': []})
+    return {'functions': functions, 'statements': statements, 'loops': []}
+
+
+def transformations(workload, rng):
+    # type: (Workload, random.Random) -> Iterator[Dict[str, Any]]
+    """
+    Generates a stream of transformations, in the format produced by
+    Darjeeling, that target statements within the synthetic source files.
+    """
+    for _ in range(workload.transformations):
+        filename = _filename(rng.randrange(workload.files))
+        line = rng.randrange(1, workload.lines_per_file + 1, 2)
+        content = rng.choice(STATEMENTS)
+        location = _location(filename, line, content)
+        kind = rng.choice(['delete-statement',
+                           'replace-statement',
+                           'prepend-statement'])
+        if kind == 'delete-statement':
+            yield {'kind': kind, 'location': location}
+        elif kind == 'replace-statement':
+            yield {'kind': kind,
+                   'location': location,
+                   'replacement': _snippet(rng.choice(STATEMENTS))}
+        else:
+            yield {'kind': kind,
+                   'location': location,
+                   'statement': _snippet(rng.choice(STATEMENTS))}
+
+
+def generate(workload, directory, seed=0):
+    # type: (Workload, str, int) -> Dict[str, str]
+    """
+    Generates the artifacts for a synthetic scenario of a given size within
+    a given directory.
+
+    Returns:
+        a mapping from the name of each artifact to the file that holds it.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    files = {'scenario': os.path.join(directory, 'scenario.config'),
+             'coverage': os.path.join(directory, 'coverage.json'),
+             'analysis': os.path.join(directory, 'analysis.json'),
+             'transformations': os.path.join(directory, 'transformations.jsonl')}
+
+    logger.info("generating synthetic scenario in directory: %s", directory)
+    with open(files['scenario'], 'w') as f:
+        json.dump({'name': 'synthetic', 'workload': workload._asdict()}, f)
+    with open(files['coverage'], 'w') as f:
+        json.dump(coverage(workload, rng), f)
+    with open(files['analysis'], 'w') as f:
+        json.dump(analysis(workload, rng), f)
+    with open(files['transformations'], 'w') as f:
+        for d in transformations(workload, rng):
+            f.write(json.dumps(d) + '\n')
+    logger.info("generated synthetic scenario")
+    return files
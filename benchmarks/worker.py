@@ -0,0 +1,165 @@
+__all__ = ['CASES', 'run_case']
+
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the span annotations that hold the number of items processed by a stage
+ITEM_COUNTS = ['num_tests',
+               'num_lines',
+               'num_snippets',
+               'num_candidate_evals',
+               'num_patches']
+
+
+def _args_prepare(files, dir_case):
+    # type: (Dict[str, str], str) -> List[str]
+    return ['prepare', files['scenario'],
+            '--coverage', files['coverage'],
+            '--analysis', files['analysis'],
+            '--transformations', files['transformations'],
+            '--output', os.path.join(dir_case, 'artifacts')]
+
+
+def _args_repair(files, dir_case):
+    # type: (Dict[str, str], str) -> List[str]
+    return ['repair', files['scenario'],
+            '--coverage', files['coverage'],
+            '--analysis', files['analysis'],
+            '--transformations', files['transformations'],
+            '--no-terminate-early',
+            '--output', os.path.join(dir_case, 'patches')]
+
+
+def _args_repair_db(files, dir_case):
+    # type: (Dict[str, str], str) -> List[str]
+    from start_cli.database import TransformationDatabase
+    from start_cli.stream import read_transformations
+
+    # the database is built before the benchmark begins
+    fn_db = os.path.join(dir_case, 'transformations.db')
+    if os.path.exists(fn_db):
+        os.remove(fn_db)
+    with TransformationDatabase(fn_db) as db:
+        db.add_transformations(read_transformations(files['transformations']))
+    files = dict(files, transformations=fn_db)
+    return _args_repair(files, dir_case)
+
+
+# the command-line arguments used by each benchmark case
+CASES = {
+    'prepare': _args_prepare,
+    'repair': _args_repair,
+    'repair-db': _args_repair_db
+}  # type: Dict[str, Callable[[Dict[str, str], str], List[str]]]
+
+
+def _stages(fn_trace):
+    # type: (str) -> List[Dict[str, Any]]
+    """
+    Extracts the duration, item count and memory usage of each stage from a
+    given trace.
+    """
+    if not os.path.exists(fn_trace):
+        return []
+    with open(fn_trace, 'r') as f:
+        events = json.load(f)['traceEvents']
+    spans = [e for e in events if e['ph'] == 'X']
+    spans.sort(key=lambda e: e['ts'])
+
+    # stages that are repeated (e.g., writing each patch) are merged
+    stages = []  # type: List[Dict[str, Any]]
+    named = {}  # type: Dict[str, Dict[str, Any]]
+    repeats = {}  # type: Dict[str, int]
+    for span in spans:
+        args = span['args']
+        name = span['name']
+        if 'file' in args:
+            name = "{}:{}".format(name, os.path.basename(args['file']))
+        items = None  # type: Optional[int]
+        for count in ITEM_COUNTS:
+            if count in args:
+                items = args[count]
+                break
+        if name in named:
+            stage = named[name]
+            repeats[name] += 1
+            stage['duration'] += span['dur'] / 1e6
+            stage['items'] = repeats[name]
+            stage['rss_mb'] = args.get('rss_mb')
+            stage['peak_rss_mb'] = args.get('peak_rss_mb')
+            continue
+        stage = {'name': name,
+                 'duration': span['dur'] / 1e6,
+                 'items': items,
+                 'rss_mb': args.get('rss_mb'),
+                 'peak_rss_mb': args.get('peak_rss_mb')}
+        named[name] = stage
+        repeats[name] = 1
+        stages.append(stage)
+    return stages
+
+
+def run_case(case, files, dir_case, patch_every):
+    # type: (str, Dict[str, str], str, int) -> Dict[str, Any]
+    """
+    Executes a given benchmark case. Each case should be executed within a
+    fresh process, so that the peak memory usage that is reported for that
+    case is unaffected by any other case.
+    """
+    from benchmarks.standins import install
+    from start_cli import CLI
+    from start_cli.trace import memory_usage
+
+    install(patch_every)
+    os.makedirs(dir_case, exist_ok=True)
+    fn_trace = os.path.join(dir_case, 'trace.json')
+    args = CASES[case](files, dir_case) + ['--no-cache', '--trace', fn_trace]
+
+    logger.info("running benchmark case [%s]: %s", case, ' '.join(args))
+    time_start = time.perf_counter()
+    code = 0
+    try:
+        with CLI(argv=args) as app:
+            app.run()
+    except SystemExit as e:
+        code = e.code or 0
+    duration = time.perf_counter() - time_start
+    (_, peak_rss_mb) = memory_usage()
+    return {'case': case,
+            'returncode': code,
+            'duration': duration,
+            'peak_rss_mb': peak_rss_mb,
+            'stages': _stages(fn_trace)}
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser()
+    parser.add_argument('case', choices=sorted(CASES))
+    parser.add_argument('--files', required=True,
+                        help='a JSON file describing the scenario artifacts.')
+    parser.add_argument('--directory', required=True,
+                        help='the working directory for this case.')
+    parser.add_argument('--patch-every', type=int, required=True)
+    parser.add_argument('--result', required=True,
+                        help='the file to which the result should be written.')
+    args = parser.parse_args()
+
+    with open(args.files, 'r') as f:
+        files = json.load(f)
+    result = run_case(args.case, files, args.directory, args.patch_every)
+    with open(args.result, 'w') as f:
+        json.dump(result, f)
+    sys.exit(0 if result['returncode'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
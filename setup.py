@@ -12,6 +12,8 @@ setuptools.setup(
         'start-image',
         'start-core',
         'tabulate',
+        'numpy',
+        'zstandard',
         'cement==2.10.12'
     ],
     packages=['start_cli'],
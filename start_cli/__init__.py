@@ -1,7 +1,17 @@
+import sys
 import logging
 import warnings
 import traceback
 
+from .imports import ImportProfiler
+
+# the profiler must be installed before any other modules are imported
+if '--import-profile' in sys.argv:
+    import_profiler = ImportProfiler()
+    import_profiler.install()
+else:
+    import_profiler = None
+
 from cement.core.foundation import CementApp
 from cement.ext.ext_argparse import ArgparseController
 
@@ -15,6 +25,11 @@ except Exception as e:
 
 from .test import TestController
 from .image import ImageController
+from .cache import CacheController
+from .profile import apply_host_profile
+from .history import apply_time_limit
+from .daemon import DaemonController, DEFAULT_SOCKET, forward, \
+    strip_daemon_args
 
 
 
@@ -53,7 +68,13 @@ class BaseController(ArgparseController):
             (['--version'], {'action': 'version',
                              'version': BANNER}),
             (['--verbose'], {'action': 'store_true',
-                             'help': 'enables detailed reporting.'})
+                             'help': 'enables detailed reporting.'}),
+            (['--import-profile'], {'action': 'store_true',
+                                    'help': 'reports the time taken to import each module.'}),
+            (['--daemon'], {'action': 'store_true',
+                            'help': 'forwards the command to a running daemon (see serve).'}),
+            (['--daemon-socket'], {'default': DEFAULT_SOCKET,
+                                   'help': 'the Unix socket of the daemon.'})
         ]
 
     def default(self):
@@ -65,9 +86,16 @@ class CLI(CementApp):
     class Meta:
         label = 'start'
         base_controller = BaseController
+        hooks = [
+            ('post_argument_parsing', apply_host_profile),
+            # the time limit depends on the speed-up factor
+            ('post_argument_parsing', apply_time_limit)
+        ]
         handlers = [
             TestController,
-            ImageController
+            ImageController,
+            CacheController,
+            DaemonController
         ]
         try:
             handlers.append(RepairController)
@@ -76,5 +104,16 @@ class CLI(CementApp):
 
 
 def main():
-    with CLI() as app:
-        app.run()
+    # commands are forwarded to the daemon before any arguments are parsed,
+    # since the daemon parses them itself
+    daemon_args = strip_daemon_args(sys.argv[1:])
+    if daemon_args:
+        (argv, fn_socket) = daemon_args
+        sys.exit(forward(argv, fn_socket))
+    try:
+        with CLI() as app:
+            app.run()
+    finally:
+        if import_profiler:
+            import_profiler.uninstall()
+            print(import_profiler.report(), file=sys.stderr)
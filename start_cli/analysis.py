@@ -0,0 +1,150 @@
+__all__ = ['analyze_incrementally']
+
+from typing import Any, Dict, Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+import importlib
+import json
+import logging
+import os
+
+from .cache import ArtifactCache
+from .imports import lazy_import
+from .util import digest
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+start_repair = lazy_import('start_repair')
+Analysis = lazy_import('kaskara.analysis', 'Analysis')
+FileLocationRange = lazy_import('kaskara.core', 'FileLocationRange')
+
+# the name of the cache stage used to store per-file analysis results
+STAGE = 'analysis-file'
+
+
+def analyzer_version():
+    # type: () -> str
+    return importlib.import_module('kaskara.version').__version__
+
+
+def source_digests(bz, snapshot, files):
+    # type: (BugZoo, Snapshot, List[str]) -> Dict[str, str]
+    """
+    Computes a digest of the contents of each of a given set of source files
+    within a snapshot.
+    """
+    container = bz.containers.provision(snapshot)
+    try:
+        cmd = "sha256sum {}".format(' '.join('"{}"'.format(fn) for fn in files))
+        response = bz.containers.command(container,
+                                         cmd,
+                                         context=snapshot.source_dir)
+        if response.code != 0:
+            msg = "failed to compute digests of source files:\n{}"
+            raise Exception(msg.format(response.output))
+    finally:
+        del bz.containers[container.uid]
+
+    digests = {}  # type: Dict[str, str]
+    for line in response.output.splitlines():
+        (checksum, fn) = line.strip().split(None, 1)
+        digests[fn.lstrip('*')] = checksum
+    return digests
+
+
+def split_analysis(d):
+    # type: (Dict[str, Any]) -> Dict[str, Dict[str, List[Any]]]
+    """
+    Splits a dictionary-based description of a static analysis into a
+    description for each of the source files that it covers.
+    """
+    def filename(location):
+        # type: (str) -> str
+        return FileLocationRange.from_string(location).filename
+
+    fragments = {}  # type: Dict[str, Dict[str, List[Any]]]
+    def fragment(location):
+        # type: (str) -> Dict[str, List[Any]]
+        fn = filename(location)
+        if fn not in fragments:
+            fragments[fn] = {'functions': [], 'statements': [], 'loops': []}
+        return fragments[fn]
+
+    for desc in d['functions']:
+        fragment(desc['location'])['functions'].append(desc)
+    for desc in d['statements']:
+        fragment(desc['location'])['statements'].append(desc)
+    for loc in d['loops']:
+        fragment(loc)['loops'].append(loc)
+    return fragments
+
+
+def merge_analysis(fragments):
+    # type: (Iterable[Dict[str, List[Any]]]) -> Dict[str, Any]
+    d = {'functions': [], 'statements': [], 'loops': []}  # type: Dict[str, Any]
+    for fragment in fragments:
+        for kind in d:
+            d[kind] += fragment[kind]
+    return d
+
+
+def analyze_incrementally(bz,           # type: BugZoo
+                          snapshot,     # type: Snapshot
+                          files,        # type: List[str]
+                          cache,        # type: ArtifactCache
+                          workers=1     # type: int
+                          ):            # type: (...) -> Analysis
+    """
+    Performs static analysis of a given set of files, reusing the cached
+    results for each file whose contents and analyzer are unchanged. Files
+    that have not been analyzed before are analyzed in parallel by a given
+    number of workers, and their results are added to the cache.
+    """
+    files = sorted(set(files))
+    version = analyzer_version()
+    digests = source_digests(bz, snapshot, files)
+    keys = {fn: digest(STAGE, version, snapshot.source_dir, fn, digests.get(fn))
+            for fn in files}  # type: Dict[str, str]
+
+    fragments = {}  # type: Dict[str, Dict[str, List[Any]]]
+    for fn in files:
+        fn_fragment = cache.lookup(STAGE, keys[fn])
+        if fn_fragment:
+            with open(fn_fragment, 'r') as f:
+                fragments[fn] = json.load(f)
+    missing = [fn for fn in files if fn not in fragments]
+    logger.info("reusing cached analysis for %d of %d files",
+                len(files) - len(missing), len(files))
+
+    def analyze(shard):
+        # type: (List[str]) -> None
+        logger.debug("analyzing files: %s", ', '.join(shard))
+        analysis = start_repair.analyze(snapshot, shard)
+        by_file = split_analysis(analysis.to_dict(snapshot))
+
+        # analysis results refer to files by their absolute path
+        for fn in shard:
+            fn_abs = os.path.join(snapshot.source_dir, fn)
+            fragment = merge_analysis(by_file[f] for f in (fn, fn_abs)
+                                      if f in by_file)
+
+            def write(fn_out):
+                # type: (str) -> None
+                with open(fn_out, 'w') as f:
+                    json.dump(fragment, f)
+
+            cache.store(STAGE, keys[fn], write, inputs={'file': fn}, prune=False)
+            fragments[fn] = fragment
+        logger.debug("analyzed files: %s", ', '.join(shard))
+
+    if missing:
+        workers = max(1, min(workers, len(missing)))
+        shards = [missing[i::workers] for i in range(workers)]
+        logger.info("analyzing %d files using %d workers",
+                    len(missing), workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(analyze, shards))
+        cache.prune()
+
+    d = merge_analysis(fragments[fn] for fn in files)
+    return Analysis.from_dict(d, snapshot)
@@ -0,0 +1,213 @@
+__all__ = ['archive_format', 'save_image', 'load_image', 'Throughput']
+
+from typing import Any, BinaryIO, Iterator, Optional
+import contextlib
+import gzip
+import logging
+import sys
+import time
+
+from .imports import lazy_import
+from .util import atomic_write
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+zstandard = lazy_import('zstandard')
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def archive_format(fn):
+    # type: (str) -> str
+    """
+    Determines the compression format of an image archive from its name:
+    'zstd' for .zst files, 'gzip' for .gz and .tgz files, and 'tar' for
+    uncompressed archives. Archives written to stdout (i.e., "-") use zstd.
+    """
+    if fn == '-' or fn.endswith(('.zst', '.zstd')):
+        return 'zstd'
+    if fn.endswith(('.gz', '.tgz')):
+        return 'gzip'
+    return 'tar'
+
+
+class Throughput(object):
+    """
+    Measures the rate at which data passes through a stream, and
+    periodically logs it.
+    """
+    def __init__(self, verb, interval=5.0):
+        # type: (str, float) -> None
+        self.__verb = verb
+        self.__interval = interval
+        self.__time_started = time.time()
+        self.__time_logged = self.__time_started
+        self.uncompressed = 0
+        self.compressed = 0
+
+    @property
+    def duration(self):
+        # type: () -> float
+        return time.time() - self.__time_started
+
+    def update(self, uncompressed=0, compressed=0):
+        # type: (int, int) -> None
+        self.uncompressed += uncompressed
+        self.compressed += compressed
+        if time.time() - self.__time_logged >= self.__interval:
+            self.__time_logged = time.time()
+            logger.info(str(self))
+
+    def __str__(self):
+        # type: () -> str
+        mb = 1024 * 1024
+        duration = max(self.duration, 1e-6)
+        ratio = self.uncompressed / max(self.compressed, 1)
+        return ("{} {:.1f} MB ({:.1f} MB compressed, ratio {:.2f}) in {:.1f}s: "
+                "{:.1f} MB/s").format(self.__verb,
+                                      self.uncompressed / mb,
+                                      self.compressed / mb,
+                                      ratio,
+                                      duration,
+                                      self.uncompressed / mb / duration)
+
+
+class _CountingWriter(object):
+    def __init__(self, f, throughput):
+        # type: (BinaryIO, Throughput) -> None
+        self.__f = f
+        self.__throughput = throughput
+
+    def write(self, data):
+        # type: (bytes) -> int
+        self.__f.write(data)
+        self.__throughput.update(compressed=len(data))
+        return len(data)
+
+    def flush(self):
+        # type: () -> None
+        self.__f.flush()
+
+
+class _CountingReader(object):
+    def __init__(self, f, throughput):
+        # type: (BinaryIO, Throughput) -> None
+        self.__f = f
+        self.__throughput = throughput
+
+    def read(self, size=-1):
+        # type: (int) -> bytes
+        data = self.__f.read(size)
+        self.__throughput.update(compressed=len(data))
+        return data
+
+
+@contextlib.contextmanager
+def _open_output(fn):
+    # type: (str) -> Iterator[BinaryIO]
+    if fn == '-':
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+    else:
+        with atomic_write(fn, 'wb') as f:
+            yield f
+
+
+@contextlib.contextmanager
+def _open_input(fn):
+    # type: (str) -> Iterator[BinaryIO]
+    if fn == '-':
+        yield sys.stdin.buffer
+    else:
+        with open(fn, 'rb') as f:
+            yield f
+
+
+def save_image(dkr,         # type: DockerClient
+               image,       # type: str
+               fn,          # type: str
+               level=3,     # type: int
+               threads=-1   # type: int
+               ):           # type: (...) -> Throughput
+    """
+    Streams a given image from the Docker daemon into a (compressed) archive
+    without writing an intermediate, uncompressed copy to disk.
+
+    Parameters:
+        dkr: a client for the Docker daemon.
+        image: the name of the image.
+        fn: the archive file, or "-" to write the archive to stdout.
+        level: the compression level.
+        threads: the number of threads used for zstd compression; -1 uses
+            one thread per CPU.
+
+    Returns:
+        the throughput of the save.
+    """
+    fmt = archive_format(fn)
+    throughput = Throughput('saved')
+    chunks = dkr.images.get(image).save(chunk_size=CHUNK_SIZE, named=True)
+    with _open_output(fn) as f:
+        out = _CountingWriter(f, throughput)
+        if fmt == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=level,
+                                                  threads=threads)
+            writer = compressor.stream_writer(out)
+        elif fmt == 'gzip':
+            writer = gzip.GzipFile(fileobj=out, mode='wb',
+                                   compresslevel=min(max(level, 1), 9))
+        else:
+            writer = out
+        for chunk in chunks:
+            writer.write(chunk)
+            throughput.update(uncompressed=len(chunk))
+        if fmt == 'zstd':
+            writer.flush(zstandard.FLUSH_FRAME)
+        elif fmt == 'gzip':
+            writer.close()
+    return throughput
+
+
+def load_image(dkr, fn):
+    # type: (DockerClient, str) -> Throughput
+    """
+    Streams a (compressed) image archive into the Docker daemon, decompressing
+    it on the fly rather than writing a decompressed copy to disk.
+
+    Parameters:
+        dkr: a client for the Docker daemon.
+        fn: the archive file, or "-" to read the archive from stdin.
+
+    Returns:
+        the throughput of the load.
+
+    Raises:
+        Exception: if the Docker daemon failed to load the image.
+    """
+    fmt = archive_format(fn)
+    throughput = Throughput('installed')
+    with _open_input(fn) as f:
+        source = _CountingReader(f, throughput)
+        if fmt == 'zstd':
+            reader = zstandard.ZstdDecompressor().stream_reader(source)
+        elif fmt == 'gzip':
+            reader = gzip.GzipFile(fileobj=source, mode='rb')
+        else:
+            reader = source
+
+        def chunks():
+            # type: () -> Iterator[bytes]
+            while True:
+                chunk = reader.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                throughput.update(uncompressed=len(chunk))
+                yield chunk
+
+        for message in dkr.api.load_image(chunks()) or []:
+            if 'error' in message:
+                raise Exception(message['error'])
+            if 'stream' in message:
+                logger.debug(message['stream'].strip())
+    return throughput
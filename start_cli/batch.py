@@ -0,0 +1,140 @@
+__all__ = ['Job', 'JobResult', 'run_jobs', 'forward_options', 'expand_files',
+           'unique_names', 'NETNS_PREFIX']
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import glob
+import logging
+import os
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Job = namedtuple('Job', ['name', 'args', 'fn_log', 'prefix'])
+Job.__new__.__defaults__ = (None,)
+
+# runs a command inside its own (unprivileged) network namespace, giving it a
+# private loopback interface and port space
+NETNS_PREFIX = ['unshare', '--net', '--map-root-user',
+                'sh', '-c', 'ip link set lo up && exec "$@"', 'sh']
+JobResult = namedtuple('JobResult', ['job', 'returncode', 'duration'])
+
+
+def expand_files(patterns):
+    # type: (Iterable[str]) -> List[str]
+    """
+    Expands a list of file names and glob patterns into a sorted list of
+    file names, without duplicates.
+    """
+    files = []  # type: List[str]
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.path.expanduser(pattern)))
+        if not matches:
+            logger.warning("no files matched: %s", pattern)
+        for fn in matches:
+            if fn not in files:
+                files.append(fn)
+    return files
+
+
+def unique_names(names):
+    # type: (List[str]) -> List[str]
+    """
+    Makes each of a list of job names unique by adding a numeric suffix to
+    every repetition of a name. Suffixed names never collide with any of
+    the given names, nor with each other.
+    """
+    taken = set(names)
+    seen = set()  # type: Set[str]
+    suffixes = {}  # type: Dict[str, int]
+    unique = []  # type: List[str]
+    for name in names:
+        if name not in seen:
+            seen.add(name)
+            unique.append(name)
+            continue
+        suffix = suffixes.get(name, 1)
+        while True:
+            suffix += 1
+            candidate = "{}-{}".format(name, suffix)
+            if candidate not in taken:
+                break
+        suffixes[name] = suffix
+        taken.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
+def forward_options(pargs, opts):
+    # type: (Any, List[Tuple[List[str], Dict[str, Any]]]) -> List[str]
+    """
+    Reconstructs the command-line flags for a given set of options from the
+    values that were parsed for those options, allowing those options to be
+    forwarded to a child process.
+    """
+    args = []  # type: List[str]
+    for (flags, kwargs) in opts:
+        flag = flags[0]
+        if not flag.startswith('-'):
+            continue
+        dest = kwargs.get('dest', flag.lstrip('-').replace('-', '_'))
+        value = getattr(pargs, dest, None)
+        action = kwargs.get('action')
+        if action == 'store_true':
+            if value:
+                args.append(flag)
+        elif action == 'store_false':
+            if not value:
+                args.append(flag)
+        elif value is not None:
+            args += [flag, str(value)]
+    return args
+
+
+def _run_job(job):
+    # type: (Job) -> JobResult
+    cmd = [sys.executable, '-m', 'start_cli'] + job.args
+    if job.prefix:
+        cmd = job.prefix + cmd
+    logger.info("starting job [%s]: %s", job.name, ' '.join(cmd))
+    time_start = time.time()
+    with open(job.fn_log, 'w') as f_log:
+        returncode = subprocess.call(cmd,
+                                     stdout=f_log,
+                                     stderr=subprocess.STDOUT)
+    duration = time.time() - time_start
+    logger.info("finished job [%s] with exit code %d after %.1f seconds",
+                job.name, returncode, duration)
+    return JobResult(job, returncode, duration)
+
+
+def run_jobs(jobs,              # type: List[Job]
+             workers,           # type: int
+             on_complete=None   # type: Optional[Callable[[JobResult], None]]
+             ):                 # type: (...) -> List[JobResult]
+    """
+    Executes a list of CLI invocations, each in its own process, across a
+    bounded pool of workers.
+
+    Parameters:
+        jobs: the jobs that should be executed.
+        workers: the maximum number of jobs that may run at once.
+        on_complete: an optional callback that is invoked, in the calling
+            thread, as each job finishes.
+
+    Returns:
+        the result of each job, in the same order as the given jobs.
+    """
+    results = {}  # type: Dict[str, JobResult]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(_run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.job.name] = result
+            if on_complete:
+                on_complete(result)
+    return [results[job.name] for job in jobs]
@@ -0,0 +1,325 @@
+__all__ = ['ArtifactCache', 'CacheEntry', 'CacheController']
+
+from typing import Callable, Dict, Iterator, List, Optional, Any
+from collections import namedtuple
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import tabulate
+from cement.ext.ext_argparse import ArgparseController, expose
+
+from .opts import *
+from .outcome_cache import OutcomeCache
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+CacheEntry = namedtuple('CacheEntry',
+                        ['stage', 'key', 'path', 'size', 'created', 'accessed'])
+
+
+class ArtifactCache(object):
+    """
+    Stores precomputed repair artifacts (e.g., coverage, localization, static
+    analysis) on disk. Each artifact is indexed by the name of the stage that
+    produced it and by a digest of all of the inputs to that stage; an
+    artifact is only ever reused when each of its inputs is unchanged.
+    """
+    # bump this whenever the on-disk layout or artifact formats change
+    VERSION = 1
+
+    def __init__(self,
+                 directory,         # type: str
+                 max_size=None,     # type: Optional[int]
+                 max_age=None       # type: Optional[float]
+                 ):                 # type: (...) -> None
+        """
+        Parameters:
+            directory: the directory that holds the cache.
+            max_size: an optional limit on the total size of the cache, given
+                in bytes.
+            max_age: an optional limit on the age of cached artifacts, given
+                in seconds.
+        """
+        self.__directory = directory
+        self.__max_size = max_size
+        self.__max_age = max_age
+
+    @property
+    def directory(self):
+        # type: () -> str
+        return self.__directory
+
+    def __path(self, stage, key):
+        # type: (str, str) -> str
+        return os.path.join(self.__directory, stage, key)
+
+    def __read_entry(self, path):
+        # type: (str) -> Optional[CacheEntry]
+        fn_meta = os.path.join(path, 'meta.json')
+        fn_artifact = os.path.join(path, 'artifact')
+        try:
+            with open(fn_meta, 'r') as f:
+                meta = json.load(f)
+            accessed = os.stat(fn_meta).st_mtime
+            size = os.stat(fn_artifact).st_size
+        except (IOError, OSError, ValueError):
+            return None
+        if meta.get('version') != self.VERSION or meta.get('size') != size:
+            return None
+        return CacheEntry(stage=meta['stage'],
+                          key=meta['key'],
+                          path=fn_artifact,
+                          size=size,
+                          created=meta['created'],
+                          accessed=accessed)
+
+    def __iter__(self):
+        # type: () -> Iterator[CacheEntry]
+        """
+        Returns an iterator over all valid entries within this cache.
+        """
+        if not os.path.isdir(self.__directory):
+            return
+        for stage in sorted(os.listdir(self.__directory)):
+            dir_stage = os.path.join(self.__directory, stage)
+            if not os.path.isdir(dir_stage):
+                continue
+            for key in sorted(os.listdir(dir_stage)):
+                if key.startswith('.'):
+                    continue
+                entry = self.__read_entry(os.path.join(dir_stage, key))
+                if entry:
+                    yield entry
+
+    def lookup(self, stage, key):
+        # type: (str, str) -> Optional[str]
+        """
+        Returns the path to the artifact produced by a given stage for a
+        given input digest, or None if no such artifact is cached. Stale,
+        expired and corrupt artifacts are discarded rather than returned.
+        """
+        path = self.__path(stage, key)
+        if not os.path.exists(path):
+            return None
+        entry = self.__read_entry(path)
+        if not entry or entry.stage != stage or entry.key != key:
+            logger.warning("discarding corrupt cache entry: %s", path)
+            self.discard(stage, key)
+            return None
+        if self.__max_age is not None \
+           and time.time() - entry.created > self.__max_age:
+            logger.debug("discarding expired cache entry: %s", path)
+            self.discard(stage, key)
+            return None
+
+        # record the access for the purposes of LRU eviction
+        os.utime(os.path.join(path, 'meta.json'), None)
+        return entry.path
+
+    def store(self,
+              stage,            # type: str
+              key,              # type: str
+              write,            # type: Callable[[str], None]
+              inputs=None,      # type: Optional[Dict[str, Any]]
+              prune=True        # type: bool
+              ):                # type: (...) -> str
+        """
+        Adds an artifact to the cache.
+
+        Parameters:
+            stage: the name of the stage that produced the artifact.
+            key: a digest of the inputs to that stage.
+            write: a function that writes the artifact to a given file.
+            inputs: an optional description of the inputs to the stage,
+                recorded alongside the artifact for the purposes of debugging.
+            prune: if True, evicts artifacts from the cache, as necessary, to
+                respect its limits once the artifact has been added.
+
+        Returns:
+            the path to the cached artifact.
+        """
+        dir_stage = os.path.join(self.__directory, stage)
+        os.makedirs(dir_stage, exist_ok=True)
+        dir_tmp = tempfile.mkdtemp(dir=dir_stage, prefix='.tmp-')
+        try:
+            fn_artifact = os.path.join(dir_tmp, 'artifact')
+            write(fn_artifact)
+            meta = {'version': self.VERSION,
+                    'stage': stage,
+                    'key': key,
+                    'size': os.stat(fn_artifact).st_size,
+                    'created': time.time(),
+                    'inputs': inputs or {}}
+            with open(os.path.join(dir_tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+            # atomically move the entry into place
+            path = self.__path(stage, key)
+            if os.path.exists(path):
+                self.discard(stage, key)
+            os.rename(dir_tmp, path)
+        except Exception:
+            shutil.rmtree(dir_tmp, ignore_errors=True)
+            raise
+        logger.debug("cached %s artifact: %s", stage, path)
+
+        if prune:
+            self.prune()
+        return os.path.join(path, 'artifact')
+
+    def discard(self, stage, key):
+        # type: (str, str) -> None
+        """
+        Removes a given artifact from the cache, if present.
+        """
+        shutil.rmtree(self.__path(stage, key), ignore_errors=True)
+
+    def clear(self):
+        # type: () -> List[CacheEntry]
+        """
+        Evicts every artifact from the cache.
+
+        Returns:
+            the list of evicted entries.
+        """
+        evicted = list(self)
+        for entry in evicted:
+            logger.debug("evicting %s artifact from cache: %s",
+                         entry.stage, entry.key)
+            self.discard(entry.stage, entry.key)
+        return evicted
+
+    def prune(self,
+              max_size=None,    # type: Optional[int]
+              max_age=None      # type: Optional[float]
+              ):                # type: (...) -> List[CacheEntry]
+        """
+        Evicts expired artifacts from the cache, followed by the least
+        recently used artifacts until the cache fits within its size limit.
+        If no limits are given, the limits of this cache are used.
+
+        Returns:
+            the list of evicted entries.
+        """
+        if max_size is None:
+            max_size = self.__max_size
+        if max_age is None:
+            max_age = self.__max_age
+
+        evicted = []  # type: List[CacheEntry]
+        entries = list(self)
+        if max_age is not None:
+            now = time.time()
+            evicted += [e for e in entries if now - e.created > max_age]
+            entries = [e for e in entries if now - e.created <= max_age]
+        if max_size is not None:
+            entries.sort(key=lambda e: e.accessed, reverse=True)
+            total = 0
+            for entry in entries:
+                total += entry.size
+                if total > max_size:
+                    evicted.append(entry)
+
+        for entry in evicted:
+            logger.debug("evicting %s artifact from cache: %s",
+                         entry.stage, entry.key)
+            self.discard(entry.stage, entry.key)
+        return evicted
+
+
+def _format_entries(entries):
+    # type: (List[CacheEntry]) -> str
+    def fmt_time(t):
+        # type: (float) -> str
+        return datetime.datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M')
+    rows = [(e.stage,
+             e.key[:12],
+             "{:.1f}".format(e.size / (1024 * 1024)),
+             fmt_time(e.created),
+             fmt_time(e.accessed))
+            for e in entries]
+    return tabulate.tabulate(
+        rows, headers=['Stage', 'Key', 'Size (MB)', 'Created', 'Last Used'])
+
+
+class CacheController(ArgparseController):
+    class Meta:
+        label = 'cache'
+        description = 'manages the cache of precomputed repair artifacts'
+        help = 'manages the cache of precomputed repair artifacts'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+
+    def default(self):
+        # type: () -> None
+        self.app.args.print_help()
+
+    def obtain_cache(self):
+        # type: () -> ArtifactCache
+        return ArtifactCache(self.app.pargs.cache_dir)
+
+    def obtain_outcome_cache(self):
+        # type: () -> Optional[OutcomeCache]
+        fn = os.path.join(self.app.pargs.cache_dir, 'outcomes.sqlite')
+        if not os.path.exists(fn):
+            return None
+        return OutcomeCache(fn)
+
+    @expose(
+        help='lists the contents of the artifact cache',
+        arguments=[OPT_CACHE_DIR])
+    def ls(self):
+        # type: () -> None
+        cache = self.obtain_cache()
+        entries = list(cache)
+        print(_format_entries(entries))
+        total = sum(e.size for e in entries) / (1024 * 1024)
+        print("\n{} artifacts ({:.1f} MB) in {}".format(len(entries),
+                                                        total,
+                                                        cache.directory))
+        outcome_cache = self.obtain_outcome_cache()
+        if outcome_cache:
+            with outcome_cache:
+                print("{} candidate outcomes ({:.1f} MB) in {}".format(
+                    len(outcome_cache),
+                    outcome_cache.size / (1024 * 1024),
+                    outcome_cache.filename))
+
+    @expose(
+        help='evicts old and least recently used artifacts from the cache',
+        arguments=[OPT_CACHE_DIR,
+                   OPT_CACHE_MAX_SIZE,
+                   OPT_CACHE_MAX_AGE,
+                   (['--all'],
+                    {'help': 'evicts all artifacts from the cache.',
+                     'dest': 'prune_all',
+                     'action': 'store_true'})])
+    def prune(self):
+        # type: () -> None
+        cache = self.obtain_cache()
+        if self.app.pargs.prune_all:
+            evicted = cache.clear()
+        else:
+            evicted = cache.prune(
+                max_size=self.app.pargs.cache_max_size * 1024 * 1024,
+                max_age=self.app.pargs.cache_max_age * 24 * 60 * 60)
+        if evicted:
+            print(_format_entries(evicted))
+        logger.info("evicted %d artifacts from cache", len(evicted))
+
+        outcome_cache = self.obtain_outcome_cache()
+        if outcome_cache:
+            with outcome_cache:
+                if self.app.pargs.prune_all:
+                    num_evicted = outcome_cache.clear()
+                else:
+                    num_evicted = outcome_cache.prune(
+                        max_size=self.app.pargs.cache_max_size * 1024 * 1024,
+                        max_age=self.app.pargs.cache_max_age * 24 * 60 * 60)
+            logger.info("evicted %d candidate outcomes from cache", num_evicted)
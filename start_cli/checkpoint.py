@@ -0,0 +1,189 @@
+__all__ = ['Checkpoint']
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from .outcomes import candidate_key, candidate_to_dict, candidate_from_dict, \
+    outcome_to_dict, outcome_from_dict
+from .util import atomic_write
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+def _to_state(obj):
+    # type: (Any) -> Any
+    """
+    Converts a JSON-decoded RNG state back into the nested tuples that are
+    expected by random.setstate.
+    """
+    if isinstance(obj, list):
+        return tuple(_to_state(x) for x in obj)
+    return obj
+
+
+class Checkpoint(object):
+    """
+    Records the state of a search to disk as it progresses, allowing the
+    search to be resumed after it has been interrupted without evaluating
+    the same candidate patches again.
+
+    The outcome of each candidate is appended to a JSON Lines file as soon
+    as it has been evaluated. The remaining state of the search (i.e., the
+    state of the RNG at the start of the search and the patches that have
+    been found) is periodically written to a separate file.
+    """
+    VERSION = 1
+
+    def __init__(self, directory, fingerprint, interval=60.0):
+        # type: (str, str, float) -> None
+        """
+        Parameters:
+            directory: the directory that holds the checkpoint.
+            fingerprint: a digest of the inputs that determine the outcome
+                of a candidate patch (i.e., the scenario and the snapshot
+                options). A checkpoint can only be resumed by a search with
+                the same fingerprint.
+            interval: the minimum number of seconds between writes of the
+                search state.
+        """
+        self.__directory = directory
+        self.__fingerprint = fingerprint
+        self.__interval = interval
+        self.__lock = threading.Lock()
+        self.__random_state = None  # type: Optional[Any]
+        self.__patches = []  # type: List[Dict[str, Any]]
+        self.__num_outcomes = 0
+        self.__time_saved = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def fn_outcomes(self):
+        # type: () -> str
+        return os.path.join(self.__directory, 'outcomes.jsonl')
+
+    @property
+    def fn_state(self):
+        # type: () -> str
+        return os.path.join(self.__directory, 'state.json')
+
+    def __read_outcomes(self):
+        # type: () -> Iterator[Tuple[Candidate, CandidateOutcome]]
+        if not os.path.exists(self.fn_outcomes):
+            return
+        with open(self.fn_outcomes, 'r') as f:
+            for (num, line) in enumerate(f, 1):
+                try:
+                    jsn = json.loads(line)
+                    candidate = candidate_from_dict(jsn['candidate'])
+                    outcome = outcome_from_dict(jsn['outcome'])
+                except Exception:
+                    # the final line may have been partially written
+                    logger.warning("ignoring malformed outcome in checkpoint (line %d): %s",  # noqa: pycodestyle
+                                   num, self.fn_outcomes)
+                    continue
+                yield (candidate, outcome)
+
+    def reset(self):
+        # type: () -> None
+        """
+        Discards the contents of this checkpoint.
+        """
+        for fn in (self.fn_outcomes, self.fn_state):
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def resume(self, searcher):
+        # type: (Searcher) -> None
+        """
+        Restores the state of a previous search from this checkpoint. The
+        outcomes of previously evaluated candidates are added to the outcome
+        manager of a given searcher, which will use them rather than
+        evaluating those candidates again, and the RNG is restored to the
+        state it was in at the start of the previous search so that the
+        search proceeds in the same order.
+        """
+        if not os.path.exists(self.fn_state):
+            logger.info("no checkpoint found in directory: %s",
+                        self.__directory)
+            return
+        with open(self.fn_state, 'r') as f:
+            state = json.load(f)
+        if state.get('version') != self.VERSION \
+           or state.get('fingerprint') != self.__fingerprint:
+            msg = "checkpoint was produced by a different scenario or configuration: {}"  # noqa: pycodestyle
+            raise ValueError(msg.format(self.__directory))
+
+        if state.get('random_state') is not None:
+            self.__random_state = state['random_state']
+            random.setstate(_to_state(self.__random_state))
+        self.__patches = state.get('patches', [])
+
+        keys = set()
+        for (candidate, outcome) in self.__read_outcomes():
+            keys.add(candidate_key(candidate))
+            searcher.outcomes.record(candidate, outcome)
+        self.__num_outcomes = len(keys)
+        logger.info("resumed search from checkpoint: %d evaluated candidates, %d patches",  # noqa: pycodestyle
+                    self.__num_outcomes, len(self.__patches))
+
+    def attach(self, searcher):
+        # type: (Searcher) -> None
+        """
+        Records the outcome of each candidate that is evaluated by a given
+        searcher from this point onwards. Should be called after the
+        checkpoint has been resumed, if at all, and before the search begins.
+        """
+        if self.__random_state is None:
+            self.__random_state = random.getstate()
+        outcomes = searcher.outcomes
+        record = outcomes.record
+
+        def record_and_checkpoint(candidate, outcome):
+            # type: (Candidate, CandidateOutcome) -> None
+            record(candidate, outcome)
+            self.record(candidate, outcome)
+
+        outcomes.record = record_and_checkpoint
+        self.save()
+
+    def record(self, candidate, outcome):
+        # type: (Candidate, CandidateOutcome) -> None
+        line = json.dumps({'candidate': candidate_to_dict(candidate),
+                           'outcome': outcome_to_dict(outcome)})
+        with self.__lock:
+            with open(self.fn_outcomes, 'a') as f:
+                f.write(line + '\n')
+            self.__num_outcomes += 1
+        if time.time() - self.__time_saved >= self.__interval:
+            self.save()
+
+    def record_patch(self, patch):
+        # type: (Candidate) -> None
+        d = candidate_to_dict(patch)
+        with self.__lock:
+            if d not in self.__patches:
+                self.__patches.append(d)
+        self.save()
+
+    def save(self):
+        # type: () -> None
+        """
+        Writes the state of the search to disk.
+        """
+        with self.__lock:
+            state = {'version': self.VERSION,
+                     'fingerprint': self.__fingerprint,
+                     'random_state': self.__random_state,
+                     'num_outcomes': self.__num_outcomes,
+                     'patches': self.__patches,
+                     'time': time.time()}
+            with atomic_write(self.fn_state) as f:
+                json.dump(state, f)
+            self.__time_saved = time.time()
+        logger.debug("saved search checkpoint: %s", self.fn_state)
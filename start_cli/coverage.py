@@ -0,0 +1,376 @@
+__all__ = ['compute_coverage_parallel', 'CoverageFile',
+           'is_binary_coverage', 'read_coverage', 'write_coverage',
+           'convert_coverage', 'mapped_coverage_file',
+           'BINARY_COVERAGE_EXTENSION']
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import array
+import collections.abc
+import json
+import logging
+import mmap
+import struct
+import sys
+
+from .imports import lazy_import
+from .util import atomic_write
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+TestSuiteCoverage = lazy_import('bugzoo.core.coverage', 'TestSuiteCoverage')
+TestCoverage = lazy_import('bugzoo.core.coverage', 'TestCoverage')
+
+BINARY_COVERAGE_EXTENSION = '.cov'
+
+# the binary coverage format consists of a fixed-size preamble, a JSON
+# header that describes the files and tests (including the full outcome of
+# each test), and three little-endian arrays, each aligned to eight bytes:
+#
+#   lines:   u32[2 * num_lines]  the file index and line number of each line
+#   indptr:  u64[num_tests + 1]  the range of indices covered by each test
+#   indices: u32[nnz]            the lines covered by each test
+MAGIC = b'STARTCOV'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+
+
+def compute_coverage_parallel(snapshot, bz, workers):
+    # type: (Snapshot, BugZoo, int) -> TestSuiteCoverage
+    """
+    Computes line coverage for the test suite of a given snapshot by
+    distributing its tests across a number of independent containers, each
+    provisioned from the same snapshot image, and merging their results.
+
+    Parameters:
+        snapshot: the snapshot for which coverage should be computed.
+        bz: the BugZoo installation to which the snapshot belongs.
+        workers: the number of containers that should be used.
+    """
+    tests = list(snapshot.tests)
+    workers = max(1, min(workers, len(tests)))
+    shards = [tests[i::workers] for i in range(workers)]
+
+    def run(shard):
+        # type: (List[TestCase]) -> TestSuiteCoverage
+        logger.debug("provisioning container to compute coverage for tests: %s",
+                     ', '.join(t.name for t in shard))
+        container = bz.containers.provision(snapshot)
+        try:
+            return bz.containers.coverage(container, tests=shard)
+        finally:
+            del bz.containers[container.uid]
+            logger.debug("destroyed coverage container: %s", container.uid)
+
+    logger.info("computing coverage for %d tests using %d containers",
+                len(tests), workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run, shards))
+
+    merged = {}  # type: Dict[str, TestCoverage]
+    for result in results:
+        for name in result:
+            merged[name] = result[name]
+    return TestSuiteCoverage(merged)
+
+
+def _pad(n):
+    # type: (int) -> int
+    return (8 - n % 8) % 8
+
+
+def _view(buf, typecode):
+    # type: (Any, str) -> Sequence[int]
+    """
+    Interprets a little-endian region of a buffer as an array of integers,
+    without copying it on little-endian hosts.
+    """
+    if sys.byteorder == 'little':
+        return memoryview(buf).cast(typecode)
+    arr = array.array(typecode)
+    arr.frombytes(bytes(buf))
+    arr.byteswap()
+    return arr
+
+
+class _LineTable(collections.abc.Sequence):
+    """
+    Provides read-only access to the (file, line) pairs of a coverage file.
+    """
+    def __init__(self, files, lines):
+        # type: (List[str], Sequence[int]) -> None
+        self.__files = files
+        self.__lines = lines
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.__lines) // 2
+
+    def __getitem__(self, i):
+        # type: (int) -> Tuple[str, int]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return (self.__files[self.__lines[2 * i]], self.__lines[2 * i + 1])
+
+
+class _LazyTestCoverage(collections.abc.Mapping):
+    """
+    Maps the name of each test in a coverage file to its coverage, which is
+    only decoded when it is first accessed.
+    """
+    def __init__(self, source):
+        # type: (CoverageFile) -> None
+        self.__source = source
+        self.__index = {t['name']: i for (i, t) in enumerate(source.tests)}
+        self.__decoded = {}  # type: Dict[str, TestCoverage]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.__index)
+
+    def __iter__(self):
+        # type: () -> Iterator[str]
+        return iter(self.__index)
+
+    def __getitem__(self, name):
+        # type: (str) -> TestCoverage
+        if name not in self.__decoded:
+            d = self.__source.test_to_dict(self.__index[name])
+            self.__decoded[name] = TestCoverage.from_dict(d)
+        return self.__decoded[name]
+
+
+# the subclass of TestSuiteCoverage that is backed by a coverage file, which
+# is only defined once BugZoo has been imported
+_MAPPED_COVERAGE = None  # type: Optional[type]
+
+
+def _mapped_coverage_class():
+    # type: () -> type
+    global _MAPPED_COVERAGE
+    if _MAPPED_COVERAGE is not None:
+        return _MAPPED_COVERAGE
+    from bugzoo.core.coverage import TestSuiteCoverage as base
+
+    class MappedTestSuiteCoverage(base):  # type: ignore
+        """
+        A coverage report that is backed by a binary coverage file.
+        """
+        def __init__(self, source):
+            # type: (CoverageFile) -> None
+            # the constructor of TestSuiteCoverage copies (and so decodes)
+            # the coverage of every test; instead, the tests are indexed by
+            # a mapping that decodes their coverage on demand
+            self._TestSuiteCoverage__test_coverage = _LazyTestCoverage(source)
+            self.source = source
+
+        def to_dict(self):
+            # type: () -> Dict[str, Any]
+            return self.source.to_dict()
+
+    _MAPPED_COVERAGE = MappedTestSuiteCoverage
+    return _MAPPED_COVERAGE
+
+
+class CoverageFile(object):
+    """
+    Provides access to a line coverage report that is stored in the compact
+    binary format. The file is memory-mapped, and the lines covered by a
+    given test are only decoded when they are requested.
+    """
+    def __init__(self, fn):
+        # type: (str) -> None
+        self.__fn = fn
+        with open(fn, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self.__mmap)
+        (magic, version, size_header) = PREAMBLE.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError("not a binary coverage file: {}".format(fn))
+        if version != VERSION:
+            m = "unsupported binary coverage version ({}): {}"
+            raise ValueError(m.format(version, fn))
+        offset = PREAMBLE.size
+        header = json.loads(bytes(buf[offset:offset + size_header]).decode('utf-8'))  # noqa: pycodestyle
+        offset += size_header + _pad(size_header)
+
+        self.files = header['files']  # type: List[str]
+        self.tests = header['tests']  # type: List[Dict[str, Any]]
+        num_lines = header['num_lines']
+        nnz = header['nnz']
+
+        size = 8 * num_lines
+        self.__lines = _view(buf[offset:offset + size], 'I')
+        offset += size + _pad(size)
+        size = 8 * (len(self.tests) + 1)
+        self.indptr = _view(buf[offset:offset + size], 'Q')
+        offset += size
+        size = 4 * nnz
+        self.indices = _view(buf[offset:offset + size], 'I')
+        self.lines = _LineTable(self.files, self.__lines)
+
+    @property
+    def filename(self):
+        # type: () -> str
+        return self.__fn
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.tests)
+
+    def close(self):
+        # type: () -> None
+        """
+        Unmaps this file. Coverage reports that are backed by this file must
+        not be used once it has been closed.
+        """
+        self.__lines = self.indptr = self.indices = None  # type: ignore
+        self.lines = None  # type: ignore
+        self.__mmap.close()
+
+    def test_to_dict(self, i):
+        # type: (int) -> Dict[str, Any]
+        """
+        Decodes the coverage of the i-th test in this file, in the format
+        produced by BugZoo.
+        """
+        test = self.tests[i]
+        lines = {}  # type: Dict[str, List[int]]
+        for j in self.indices[self.indptr[i]:self.indptr[i + 1]]:
+            (filename, num) = self.lines[j]
+            if filename not in lines:
+                lines[filename] = []
+            lines[filename].append(num)
+        return {'test': test['name'],
+                'outcome': test['outcome'],
+                'coverage': lines}
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {t['name']: self.test_to_dict(i)
+                for (i, t) in enumerate(self.tests)}
+
+    def to_coverage(self):
+        # type: () -> TestSuiteCoverage
+        """
+        Returns a coverage report that is backed by this file. The coverage
+        of each test is decoded when it is first accessed.
+        """
+        return _mapped_coverage_class()(self)
+
+    @staticmethod
+    def write(d, fn):
+        # type: (Dict[str, Any], str) -> None
+        """
+        Writes a line coverage report, given in the JSON format produced by
+        BugZoo, to a given file in the binary format.
+        """
+        names = sorted(d)
+        files = sorted({filename for name in names
+                        for filename in d[name]['coverage']})
+        file_index = {filename: i for (i, filename) in enumerate(files)}
+        pairs = sorted({(file_index[filename], num)
+                        for name in names
+                        for (filename, nums) in d[name]['coverage'].items()
+                        for num in nums})
+        line_index = {pair: i for (i, pair) in enumerate(pairs)}
+
+        lines = array.array('I')
+        for (i, num) in pairs:
+            lines.append(i)
+            lines.append(num)
+        indptr = array.array('Q', [0])
+        indices = array.array('I')
+        tests = []  # type: List[Dict[str, Any]]
+        for name in names:
+            test = d[name]
+            covered = sorted(line_index[(file_index[filename], num)]
+                             for (filename, nums) in test['coverage'].items()
+                             for num in nums)
+            indices.extend(covered)
+            indptr.append(len(indices))
+            tests.append({'name': name, 'outcome': test['outcome']})
+        if sys.byteorder != 'little':
+            for arr in (lines, indptr, indices):
+                arr.byteswap()
+
+        header = json.dumps({'files': files,
+                             'tests': tests,
+                             'num_lines': len(pairs),
+                             'nnz': len(indices)}).encode('utf-8')
+        with atomic_write(fn, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            f.write(b'\0' * _pad(len(header)))
+            f.write(lines.tobytes())
+            f.write(b'\0' * _pad(8 * len(pairs)))
+            f.write(indptr.tobytes())
+            f.write(indices.tobytes())
+
+
+def mapped_coverage_file(coverage):
+    # type: (TestSuiteCoverage) -> Optional[CoverageFile]
+    """
+    Returns the binary coverage file that backs a given coverage report, or
+    None if the report was not loaded from a binary coverage file.
+    """
+    if _MAPPED_COVERAGE is None or not isinstance(coverage, _MAPPED_COVERAGE):
+        return None
+    return coverage.source
+
+
+def is_binary_coverage(fn):
+    # type: (str) -> bool
+    with open(fn, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_coverage(fn):
+    # type: (str) -> TestSuiteCoverage
+    """
+    Loads a line coverage report from a file in either the JSON or the
+    binary format.
+    """
+    if is_binary_coverage(fn):
+        return CoverageFile(fn).to_coverage()
+    return TestSuiteCoverage.from_file(fn)
+
+
+def write_coverage(coverage, fn, binary=None):
+    # type: (TestSuiteCoverage, str, Optional[bool]) -> None
+    """
+    Writes a line coverage report to a given file. Unless specified
+    otherwise, the binary format is used if the name of the file ends with
+    the binary coverage extension, and the JSON format is used otherwise.
+    """
+    _write_dict(coverage.to_dict(), fn, binary)
+
+
+def _write_dict(d, fn, binary=None):
+    # type: (Dict[str, Any], str, Optional[bool]) -> None
+    if binary is None:
+        binary = fn.endswith(BINARY_COVERAGE_EXTENSION)
+    if binary:
+        CoverageFile.write(d, fn)
+    else:
+        with atomic_write(fn) as f:
+            json.dump(d, f)
+
+
+def convert_coverage(fn_in, fn_out):
+    # type: (str, str) -> None
+    """
+    Converts a line coverage report between the JSON and binary formats.
+    The format of the output is determined by the extension of its name.
+    """
+    if is_binary_coverage(fn_in):
+        source = CoverageFile(fn_in)
+        d = source.to_dict()
+        source.close()
+    else:
+        with open(fn_in, 'r') as f:
+            d = json.load(f)
+    _write_dict(d, fn_out)
@@ -0,0 +1,244 @@
+__all__ = ['DaemonController', 'serve', 'forward', 'strip_daemon_args',
+           'DEFAULT_SOCKET']
+
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import traceback
+
+from cement.core.exc import CaughtSignal
+from cement.ext.ext_argparse import ArgparseController, expose
+
+from .opts import *
+from . import resident
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+DEFAULT_SOCKET = os.environ.get(
+    'START_CLI_SOCKET', os.path.expanduser('~/.start-cli/daemon.sock'))
+
+
+def _send(f, message):
+    # type: (Any, Dict[str, Any]) -> None
+    f.write((json.dumps(message) + '\n').encode('utf-8'))
+    f.flush()
+
+
+class _Forwarder(object):
+    """
+    Stands in for stdout or stderr while a command is executed by the daemon,
+    forwarding everything that is written to the client.
+    """
+    def __init__(self, f, stream):
+        # type: (Any, str) -> None
+        self.__f = f
+        self.__stream = stream
+        self.connected = True
+
+    def write(self, data):
+        # type: (str) -> int
+        if data and self.connected:
+            try:
+                _send(self.__f, {'stream': self.__stream, 'data': data})
+            except (IOError, OSError):
+                # the client has gone away; the command runs to completion
+                logger.warning("lost connection to client")
+                self.connected = False
+        return len(data)
+
+    def flush(self):
+        # type: () -> None
+        pass
+
+    def isatty(self):
+        # type: () -> bool
+        return False
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # type: () -> None
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            argv = request['argv']  # type: List[str]
+            cwd = request['cwd']  # type: str
+        except (ValueError, KeyError):
+            logger.warning("ignoring malformed request")
+            return
+        logger.info("executing command: %s", ' '.join(argv))
+        code = self.execute(argv, cwd)
+        logger.info("finished command with exit code %d: %s",
+                    code, ' '.join(argv))
+        try:
+            _send(self.wfile, {'exit': code})
+        except (IOError, OSError):
+            pass
+
+    def execute(self, argv, cwd):
+        # type: (List[str], str) -> int
+        # the working directory and standard streams belong to the process,
+        # and so the server handles one request at a time
+        from . import CLI
+        stdout, stderr = sys.stdout, sys.stderr
+        cwd_daemon = os.getcwd()
+        sys.stdout = _Forwarder(self.wfile, 'stdout')
+        sys.stderr = _Forwarder(self.wfile, 'stderr')
+        try:
+            os.chdir(cwd)
+            with CLI(argv=argv) as app:
+                app.run()
+            return 0
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            if isinstance(e.code, int):
+                return e.code
+            print(e.code, file=sys.stderr)
+            return 1
+        except CaughtSignal:
+            # the daemon itself has been asked to stop
+            raise
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            os.chdir(cwd_daemon)
+
+
+class _Server(socketserver.UnixStreamServer):
+    def server_bind(self):
+        # type: () -> None
+        super().server_bind()
+        # any client that can connect can run commands as this user
+        os.chmod(self.server_address, 0o600)
+
+
+def _is_listening(fn_socket):
+    # type: (str) -> bool
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(fn_socket)
+        return True
+    except (IOError, OSError):
+        return False
+    finally:
+        sock.close()
+
+
+def serve(fn_socket, max_resident=32):
+    # type: (str, int) -> None
+    """
+    Executes commands on behalf of clients connected to a given Unix socket
+    until interrupted, keeping expensive objects (e.g., Docker clients,
+    BugZoo, snapshots and loaded artifacts) resident between commands.
+    """
+    if os.path.exists(fn_socket):
+        if _is_listening(fn_socket):
+            msg = "daemon is already listening on socket: {}"
+            raise ValueError(msg.format(fn_socket))
+        logger.debug("removing stale socket: %s", fn_socket)
+        os.remove(fn_socket)
+    os.makedirs(os.path.dirname(os.path.abspath(fn_socket)), exist_ok=True)
+
+    resident.enable(max_resident)
+    server = _Server(fn_socket, _Handler)
+    logger.info("listening on socket: %s", fn_socket)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, CaughtSignal):
+        logger.info("shutting down daemon")
+    finally:
+        server.server_close()
+        if os.path.exists(fn_socket):
+            os.remove(fn_socket)
+        stats = resident.stats()
+        logger.info("resident objects: %d hits, %d misses",
+                    stats['hits'], stats['misses'])
+
+
+def forward(argv, fn_socket):
+    # type: (List[str], str) -> int
+    """
+    Forwards a command to the daemon listening on a given socket, and relays
+    its output to stdout and stderr.
+
+    Returns:
+        the exit code of the command.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(fn_socket)
+    except (IOError, OSError):
+        print("failed to connect to daemon on socket: {}".format(fn_socket),
+              file=sys.stderr)
+        return 1
+    with sock, sock.makefile('rwb') as f:
+        _send(f, {'argv': argv, 'cwd': os.getcwd()})
+        for line in f:
+            message = json.loads(line.decode('utf-8'))
+            if 'exit' in message:
+                return message['exit']
+            out = sys.stdout if message['stream'] == 'stdout' else sys.stderr
+            out.write(message['data'])
+            out.flush()
+    print("lost connection to daemon", file=sys.stderr)
+    return 1
+
+
+def strip_daemon_args(argv):
+    # type: (List[str]) -> Optional[Tuple[List[str], str]]
+    """
+    Removes the --daemon and --daemon-socket options from a given list of
+    command-line arguments.
+
+    Returns:
+        None if the command should not be forwarded to the daemon, or else
+        the remaining arguments and the socket.
+    """
+    if '--daemon' not in argv:
+        return None
+    fn_socket = DEFAULT_SOCKET
+    remaining = []  # type: List[str]
+    args = iter(argv)
+    for arg in args:
+        if arg == '--daemon':
+            continue
+        if arg == '--daemon-socket':
+            fn_socket = next(args, fn_socket)
+        elif arg.startswith('--daemon-socket='):
+            fn_socket = arg.split('=', 1)[1]
+        else:
+            remaining.append(arg)
+    return (remaining, fn_socket)
+
+
+class DaemonController(ArgparseController):
+    class Meta:
+        label = 'daemon'
+        description = 'executes commands on behalf of clients'
+        stacked_on = 'base'
+        stacked_type = 'embedded'
+
+    @expose(
+        help='runs a daemon that executes commands forwarded via --daemon, keeping Docker, BugZoo, snapshots and artifacts warm between commands',
+        arguments=[(['--socket'],
+                    {'help': 'the Unix socket on which the daemon listens.',
+                     'default': DEFAULT_SOCKET,
+                     'type': str}),
+                   (['--max-resident'],
+                    {'help': 'the maximum number of objects that are kept resident between commands.',
+                     'default': 32,
+                     'type': int})])
+    def serve(self):
+        # type: () -> None
+        try:
+            serve(self.app.pargs.socket, self.app.pargs.max_resident)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
@@ -0,0 +1,217 @@
+__all__ = ['TransformationDatabase', 'DATABASE_EXTENSIONS']
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import sqlite3
+
+from .imports import lazy_import
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Snippet = lazy_import('darjeeling.snippet', 'Snippet')
+SnippetDatabase = lazy_import('darjeeling.snippet', 'SnippetDatabase')
+Transformation = lazy_import('darjeeling.transformation', 'Transformation')
+FileLine = lazy_import('bugzoo.core.fileline', 'FileLine')
+
+# the file extensions that are used to store transformation databases
+DATABASE_EXTENSIONS = ('.db', '.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transformations (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    file TEXT,
+    line INTEGER,
+    snippet TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transformations_by_line
+    ON transformations (file, line);
+CREATE INDEX IF NOT EXISTS transformations_by_kind
+    ON transformations (kind);
+CREATE INDEX IF NOT EXISTS transformations_by_snippet
+    ON transformations (snippet);
+CREATE TABLE IF NOT EXISTS snippets (
+    hash TEXT PRIMARY KEY,
+    kind TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snippets_by_kind ON snippets (kind);
+"""
+
+
+def _snippet_hash(content):
+    # type: (str) -> str
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def _describe(transformation):
+    # type: (Transformation) -> Tuple[str, Optional[str], Optional[int], Optional[str], str]  # noqa: pycodestyle
+    d = transformation.to_dict()
+    kind = d.get('kind', transformation.__class__.__name__)
+    try:
+        line = transformation.line  # type: Optional[FileLine]
+    except AttributeError:
+        line = None
+    snippet = getattr(transformation, 'replacement', None) \
+        or getattr(transformation, 'statement', None)
+    return (kind,
+            line.filename if line else None,
+            line.num if line else None,
+            _snippet_hash(snippet.content) if snippet else None,
+            json.dumps(d))
+
+
+class TransformationDatabase(object):
+    """
+    Provides an indexed, on-disk store of transformations and snippets,
+    backed by SQLite. Transformations are indexed by file, line, kind and
+    snippet, allowing subsets of the database to be fetched without loading
+    the database in its entirety.
+    """
+    @staticmethod
+    def is_database(fn):
+        # type: (str) -> bool
+        """
+        Determines whether a given file is a transformation database.
+        """
+        try:
+            with open(fn, 'rb') as f:
+                return f.read(16) == b'SQLite format 3\x00'
+        except (IOError, OSError):
+            return False
+
+    def __init__(self, fn):
+        # type: (str) -> None
+        logger.debug("opening transformation database: %s", fn)
+        self.__fn = fn
+        self.__connection = sqlite3.connect(fn, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+        logger.debug("opened transformation database: %s", fn)
+
+    def __enter__(self):
+        # type: () -> TransformationDatabase
+        return self
+
+    def __exit__(self, *args):
+        # type: (*object) -> None
+        self.close()
+
+    def close(self):
+        # type: () -> None
+        self.__connection.close()
+
+    def __len__(self):
+        # type: () -> int
+        """
+        Returns the number of transformations within this database.
+        """
+        cursor = self.__connection.execute(
+            "SELECT COUNT(*) FROM transformations")
+        return cursor.fetchone()[0]
+
+    def add_transformations(self, transformations, batch_size=10000):
+        # type: (Iterable[Transformation], int) -> int
+        """
+        Adds a sequence of transformations to this database, preserving
+        their order.
+
+        Returns:
+            the number of transformations that were added.
+        """
+        sql = ("INSERT INTO transformations (kind, file, line, snippet, data) "
+               "VALUES (?, ?, ?, ?, ?)")
+        num_added = 0
+        batch = []  # type: List[Tuple]
+        with self.__connection:
+            for transformation in transformations:
+                batch.append(_describe(transformation))
+                if len(batch) >= batch_size:
+                    self.__connection.executemany(sql, batch)
+                    num_added += len(batch)
+                    batch = []
+            self.__connection.executemany(sql, batch)
+            num_added += len(batch)
+        return num_added
+
+    def add_snippets(self, snippets):
+        # type: (Iterable[Snippet]) -> int
+        """
+        Adds a collection of snippets to this database. Snippets that are
+        already present in the database are replaced.
+
+        Returns:
+            the number of snippets that were added.
+        """
+        sql = "INSERT OR REPLACE INTO snippets (hash, kind, data) VALUES (?, ?, ?)"
+        rows = [(_snippet_hash(s.content), s.kind, json.dumps(s.to_dict()))
+                for s in snippets]
+        with self.__connection:
+            self.__connection.executemany(sql, rows)
+        return len(rows)
+
+    def transformations(self,
+                        lines=None,     # type: Optional[Iterable[FileLine]]
+                        files=None,     # type: Optional[Iterable[str]]
+                        kinds=None,     # type: Optional[Iterable[str]]
+                        snippet=None    # type: Optional[str]
+                        ):              # type: (...) -> Iterator[Transformation]
+        """
+        Lazily fetches the transformations within this database, in the
+        order in which they were added, optionally restricted to a given set
+        of lines, files, kinds, or to those that use a snippet with a given
+        hash.
+        """
+        sql = "SELECT t.data FROM transformations t"
+        conditions = []  # type: List[str]
+        params = []  # type: List[object]
+        if lines is not None:
+            # use a temporary table, since the number of lines may exceed the
+            # limit on the number of parameters in a query
+            self.__connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS restrict_lines "
+                "(file TEXT, line INTEGER)")
+            self.__connection.execute("DELETE FROM restrict_lines")
+            self.__connection.executemany(
+                "INSERT INTO restrict_lines VALUES (?, ?)",
+                ((l.filename, l.num) for l in lines))
+            sql += (" JOIN restrict_lines r"
+                    " ON t.file = r.file AND t.line = r.line")
+        if files is not None:
+            files = list(files)
+            conditions.append(
+                "t.file IN ({})".format(', '.join('?' for _ in files)))
+            params += files
+        if kinds is not None:
+            kinds = list(kinds)
+            conditions.append(
+                "t.kind IN ({})".format(', '.join('?' for _ in kinds)))
+            params += kinds
+        if snippet is not None:
+            conditions.append("t.snippet = ?")
+            params.append(snippet)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY t.id"
+
+        for (data,) in self.__connection.execute(sql, params):
+            yield Transformation.from_dict(json.loads(data))
+
+    def snippets(self, kinds=None):
+        # type: (Optional[Iterable[str]]) -> SnippetDatabase
+        """
+        Loads the snippets within this database, optionally restricted to
+        those of a given set of kinds.
+        """
+        sql = "SELECT data FROM snippets"
+        params = []  # type: List[object]
+        if kinds is not None:
+            kinds = list(kinds)
+            sql += " WHERE kind IN ({})".format(', '.join('?' for _ in kinds))
+            params += kinds
+        rows = self.__connection.execute(sql, params)
+        return SnippetDatabase([Snippet.from_dict(json.loads(data))
+                                for (data,) in rows])
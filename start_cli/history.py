@@ -0,0 +1,220 @@
+__all__ = ['MissionHistory', 'apply_time_limit', 'record_duration',
+           'DEFAULT_TIME_LIMIT']
+
+from typing import Any, List, Optional, Set
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from .util import file_digest
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the time limit that is used until enough passing runs have been recorded
+DEFAULT_TIME_LIMIT = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    scenario TEXT NOT NULL,
+    speedup INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    source TEXT NOT NULL,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_mission ON runs (scenario, speedup, time);
+"""
+
+
+class MissionHistory(object):
+    """
+    Records how long passing runs of the mission of each scenario take on
+    this host at each speed-up factor, and derives a time limit for later
+    runs from those durations: a high percentile of the most recent
+    durations plus a safety margin, rounded up to a coarse granularity so
+    that the limit (which is part of the snapshot fingerprint) is stable.
+    """
+    WINDOW = 200
+    MIN_SAMPLES = 5
+    PERCENTILE = 99
+    MARGIN = 0.25
+    GRANULARITY = 30
+
+    def __init__(self, fn):
+        # type: (str) -> None
+        os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+        self.__fn = fn
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(fn,
+                                            timeout=30.0,
+                                            check_same_thread=False)
+        # allows concurrent missions to record their durations
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.executescript(SCHEMA)
+
+    @staticmethod
+    def default_file():
+        # type: () -> str
+        fn = os.environ.get('START_CLI_HISTORY')
+        if fn:
+            return fn
+        return os.path.expanduser(
+            '~/.start-cli/history/{}.sqlite'.format(socket.gethostname()))
+
+    @staticmethod
+    def load():
+        # type: () -> MissionHistory
+        return MissionHistory(MissionHistory.default_file())
+
+    def __enter__(self):
+        # type: () -> MissionHistory
+        return self
+
+    def __exit__(self, *args):
+        # type: (*Any) -> None
+        self.close()
+
+    def close(self):
+        # type: () -> None
+        self.__connection.close()
+
+    def record(self, fn_scenario, speedup, duration, source):
+        # type: (str, int, float, str) -> None
+        """
+        Records the duration of a passing run of the mission for a given
+        scenario at a given speed-up factor.
+        """
+        self.__insert(file_digest(fn_scenario), speedup, [duration], source)
+
+    def __insert(self, key, speedup, durations, source):
+        # type: (str, int, List[float], str) -> None
+        durations = [d for d in durations if d > 0]
+        if not durations:
+            logger.debug("ignoring runs with no duration from %s", source)
+            return
+        now = time.time()
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                [(key, speedup, d, source, now) for d in durations])
+        logger.debug("recorded %d passing runs from %s",
+                     len(durations), source)
+
+    def attach(self, searcher, fn_scenario, speedup):
+        # type: (Searcher, str, int) -> None
+        """
+        Records the duration of each passing test that is executed by a
+        given searcher from this point onwards. Tests that were skipped as
+        redundant are recorded by the searcher as passing in no time, and
+        tests whose outcomes were carried over from an earlier evaluation of
+        the same candidate were not executed again; neither is recorded.
+        The durations of the tests of each candidate are recorded together.
+        """
+        from darjeeling.outcome import OutcomeManager
+        outcomes = searcher.outcomes
+        record = outcomes.record
+        key = file_digest(fn_scenario)
+
+        def previous_tests(candidate):
+            # type: (Candidate) -> Set[str]
+            # the outcomes that are already known to the searcher are looked
+            # up directly, bypassing any extensions to the outcome manager
+            try:
+                known = OutcomeManager.__getitem__(outcomes, candidate)
+            except KeyError:
+                return set()
+            return set(known.tests)
+
+        def record_and_learn(candidate, outcome):
+            # type: (Candidate, CandidateOutcome) -> None
+            previous = previous_tests(candidate)
+            record(candidate, outcome)
+            tests = outcome.tests
+            durations = [tests[name].time_taken for name in tests
+                         if name not in previous and tests[name].successful]
+            try:
+                self.__insert(key, speedup, durations, 'repair')
+            except Exception:
+                logger.exception("failed to record durations of tests for candidate: %s",  # noqa: pycodestyle
+                                 candidate)
+
+        outcomes.record = record_and_learn
+
+    def durations(self, fn_scenario, speedup):
+        # type: (str, int) -> List[float]
+        """
+        Returns the durations of the most recent passing runs of the mission
+        for a given scenario at a given speed-up factor.
+        """
+        key = file_digest(fn_scenario)
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT duration FROM runs WHERE scenario = ? AND speedup = ? AND duration > 0 ORDER BY time DESC LIMIT ?",  # noqa: pycodestyle
+                (key, speedup, self.WINDOW)).fetchall()
+        return [row[0] for row in rows]
+
+    def time_limit(self, fn_scenario, speedup):
+        # type: (str, int) -> Optional[int]
+        """
+        Derives a time limit for the mission of a given scenario at a given
+        speed-up factor, or returns None if too few passing runs have been
+        recorded. The limit is never less than the longest recorded run, nor
+        less than the granularity of the limit.
+        """
+        durations = sorted(self.durations(fn_scenario, speedup))
+        if len(durations) < self.MIN_SAMPLES:
+            return None
+        # nearest-rank percentile: with fewer than 100 samples, this is the
+        # longest run
+        rank = int(math.ceil(self.PERCENTILE / 100.0 * len(durations)))
+        duration = durations[rank - 1] * (1 + self.MARGIN)
+        duration = max(duration, durations[-1])
+        granularity = self.GRANULARITY
+        return max(granularity,
+                   int(math.ceil(duration / granularity) * granularity))
+
+
+def apply_time_limit(app):
+    # type: (Any) -> None
+    """
+    Fills in the mission time limit of any command that operates on a single
+    scenario and was not given a time limit explicitly, using the passing
+    runs that have been recorded on this host. Registered as a
+    post_argument_parsing hook, after the speed-up factor has been filled in.
+    Commands that operate on many scenarios leave the time limit unset, so
+    that it is derived separately for each scenario.
+    """
+    pargs = app.pargs
+    if getattr(pargs, 'timeout_mission', DEFAULT_TIME_LIMIT) is not None:
+        return
+    fn_scenario = getattr(pargs, 'file', None)
+    speedup = getattr(pargs, 'speedup', None)
+    if not fn_scenario or speedup is None:
+        return
+    limit = None  # type: Optional[int]
+    if os.path.isfile(fn_scenario):
+        with MissionHistory.load() as history:
+            limit = history.time_limit(fn_scenario, speedup)
+    if limit is None:
+        limit = DEFAULT_TIME_LIMIT
+    else:
+        logger.info("using learned mission time limit: %d seconds", limit)
+    pargs.timeout_mission = limit
+
+
+def record_duration(fn_scenario, speedup, duration, source):
+    # type: (str, int, float, str) -> None
+    """
+    Records the duration of a passing run in the history for this host.
+    Failures to record are logged rather than raised, since the history is
+    only an optimization.
+    """
+    try:
+        with MissionHistory.load() as history:
+            history.record(fn_scenario, speedup, duration, source)
+    except Exception:
+        logger.exception("failed to record duration of passing run")
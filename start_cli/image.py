@@ -1,20 +1,108 @@
-__all__ = ['ImageController']
+__all__ = ['ImageController', 'ImageIndex', 'inputs_digest']
 
-import sys
+from typing import Any, Dict, List, Optional, Tuple
+import json
 import logging
+import os
+import sys
+import time
 
-from start_image.name import name as image_name
-from start_image.build import build_scenario_image
-from start_image import install_from_archive, save_to_archive
-from start_core.scenario import Scenario
+import tabulate
 from cement.ext.ext_argparse import ArgparseController, expose
-from docker import DockerClient
 
+from .imports import lazy_import
 from .opts import *
+from .archive import archive_format, save_image, load_image
+from .batch import Job, run_jobs, expand_files, unique_names
+from .resident import resident
+from .util import digest, file_digest, atomic_write
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
 
+image_name = lazy_import('start_image.name', 'name')
+build_scenario_image = lazy_import('start_image.build', 'build_scenario_image')
+Scenario = lazy_import('start_core.scenario', 'Scenario')
+DockerClient = lazy_import('docker', 'DockerClient')
+
+
+def _start_image_version():
+    # type: () -> Optional[str]
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('start-image').version
+    except Exception:
+        return None
+
+
+def inputs_digest(fn_scenario):
+    # type: (str) -> str
+    """
+    Computes a digest of the inputs to the image for a given scenario: the
+    contents of each file in the directory of the scenario (i.e., its config,
+    mission and any patches), and the version of the image builder.
+    """
+    directory = os.path.dirname(os.path.abspath(fn_scenario))
+    files = []  # type: List[List[str]]
+    for (dirpath, dirnames, filenames) in os.walk(directory):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            fn = os.path.join(dirpath, name)
+            files.append([os.path.relpath(fn, directory), file_digest(fn)])
+    return digest(_start_image_version(), files)
+
+
+class ImageIndex(object):
+    """
+    Records the ID of each image that was built by START, together with a
+    digest of the inputs from which it was built, allowing up-to-date images
+    to be detected without rebuilding them. Each image is recorded in its
+    own file so that concurrent builds never contend for the index.
+    """
+    def __init__(self, directory):
+        # type: (str) -> None
+        self.__directory = directory
+
+    def __path(self, image):
+        # type: (str) -> str
+        return os.path.join(self.__directory, "{}.json".format(digest(image)))
+
+    def lookup(self, image):
+        # type: (str) -> Optional[Dict[str, Any]]
+        try:
+            with open(self.__path(image), 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def record(self, image, image_id, inputs):
+        # type: (str, str, str) -> None
+        os.makedirs(self.__directory, exist_ok=True)
+        with atomic_write(self.__path(image)) as f:
+            json.dump({'image': image,
+                       'id': image_id,
+                       'inputs': inputs,
+                       'built': time.time()}, f)
+
+    def is_up_to_date(self, dkr, image, inputs):
+        # type: (DockerClient, str, str) -> bool
+        """
+        Determines whether a given image exists and was built by START from
+        the given inputs.
+        """
+        # exception classes must be resolved before they can be caught
+        from docker.errors import ImageNotFound
+
+        record = self.lookup(image)
+        if not record or record.get('inputs') != inputs:
+            return False
+        try:
+            image_id = dkr.images.get(image).id
+        except ImageNotFound:
+            return False
+        # the image may since have been rebuilt or pulled by something else
+        return image_id == record.get('id')
+
 
 class ImageController(ArgparseController):
     class Meta:
@@ -25,25 +113,151 @@ class ImageController(ArgparseController):
 
     def obtain_docker(self):
         # type: () -> DockerClient
-        return DockerClient(version=self.app.pargs.docker_client)
+        version = self.app.pargs.docker_client
+        return resident('docker', version,
+                        lambda: DockerClient(version=version))
 
-    @expose(
-        help='builds the Docker image for a given scenario',
-        arguments=[OPT_FILE, OPT_DOCKER_CLIENT])
-    def build(self):
-        # type: () -> None
-        fn_scenario = self.app.pargs.file
+    def obtain_index(self):
+        # type: () -> ImageIndex
+        return ImageIndex(os.path.join(self.app.pargs.cache_dir, 'images'))
+
+    def build_one(self, fn_scenario):
+        # type: (str) -> None
         dkr = self.obtain_docker()
+        index = self.obtain_index()
 
         logger.info("loading scenario from file [%s]", fn_scenario)
         scenario = Scenario.from_file(fn_scenario)
         logger.info("loaded scenario")
         name_image = image_name(scenario)
+        inputs = inputs_digest(fn_scenario)
+        if not self.app.pargs.force \
+           and index.is_up_to_date(dkr, name_image, inputs):
+            logger.info("image [%s] for scenario [%s] is up to date",
+                        name_image, scenario.name)
+            return
+
         logger.info("building image [%s] for scenario [%s]",
                     name_image, scenario.name)
         build_scenario_image(dkr, scenario)
         logger.info("built image [%s] for scenario [%s]",
                     name_image, scenario.name)
+        index.record(name_image, dkr.images.get(name_image).id, inputs)
+
+    @expose(
+        help='builds the Docker images for one or more scenarios, skipping those that are up to date',
+        arguments=[(['files'],
+                    {'help': 'paths to (or glob patterns for) scenario config files',
+                     'nargs': '+'}),
+                   OPT_WORKERS,
+                   OPT_FORCE_BUILD,
+                   OPT_CACHE_DIR,
+                   OPT_DOCKER_CLIENT])
+    def build(self):
+        # type: () -> None
+        files = expand_files(self.app.pargs.files)
+        if not files:
+            logger.error("no scenario files provided")
+            sys.exit(1)
+        if len(files) == 1:
+            self.build_one(files[0])
+            return
+
+        # each build compiles ArduPilot using every core, so only a few
+        # builds are run at once by default
+        workers = self.app.pargs.workers \
+            or max(1, (os.cpu_count() or 1) // 4)
+        force = self.app.pargs.force
+        dkr = self.obtain_docker()
+        index = self.obtain_index()
+
+        rows = []  # type: List[List[str]]
+        outdated = []  # type: List[Tuple[str, str, str]]
+        for fn_scenario in files:
+            scenario = Scenario.from_file(fn_scenario)
+            name_image = image_name(scenario)
+            inputs = inputs_digest(fn_scenario)
+            if not force and index.is_up_to_date(dkr, name_image, inputs):
+                logger.info("skipping up-to-date image [%s] for scenario [%s]",
+                            name_image, scenario.name)
+                rows.append([scenario.name, name_image, 'up to date', '-'])
+                continue
+            outdated.append((fn_scenario, scenario.name, name_image))
+
+        # each job writes to a log file that is named after its scenario, and
+        # so scenarios that share a name are told apart
+        jobs = []  # type: List[Job]
+        images = {}  # type: Dict[str, str]
+        dir_logs = os.path.join(self.app.pargs.cache_dir, 'images', 'logs')
+        os.makedirs(dir_logs, exist_ok=True)
+        names = unique_names([name for (_, name, _) in outdated])
+        for ((fn_scenario, _, name_image), name) in zip(outdated, names):
+            args = ['build', fn_scenario,
+                    '--cache-dir', self.app.pargs.cache_dir]
+            if self.app.pargs.docker_client:
+                args += ['--docker-client', self.app.pargs.docker_client]
+            if force:
+                args.append('--force')
+            fn_log = os.path.join(dir_logs, "{}.log".format(name))
+            jobs.append(Job(name, args, fn_log))
+            images[name] = name_image
+
+        logger.info("building %d of %d images using %d workers",
+                    len(jobs), len(files), workers)
+
+        # the images share their base layers, so the first image is built by
+        # itself to populate the Docker build cache; the remaining images are
+        # then built concurrently, each reusing those cached layers
+        results = run_jobs(jobs[:1], 1) + run_jobs(jobs[1:], workers)
+
+        for result in results:
+            if result.returncode == 0:
+                status = 'built'
+            else:
+                status = 'failed (exit code {}; see {})'.format(
+                    result.returncode, result.job.fn_log)
+            rows.append([result.job.name,
+                         images[result.job.name],
+                         status,
+                         "{:.2f}".format(result.duration / 60)])
+        print(tabulate.tabulate(
+            rows, headers=['Scenario', 'Image', 'Status', 'Time (mins)']))
+
+        if any(result.returncode != 0 for result in results):
+            sys.exit(1)
+
+    @expose(
+        help='saves the Docker image for a scenario to a (compressed) archive',
+        arguments=[OPT_FILE,
+                   OPT_ARCHIVE,
+                   OPT_COMPRESSION_LEVEL,
+                   OPT_COMPRESSION_THREADS,
+                   OPT_DOCKER_CLIENT])
+    def save(self):
+        # type: () -> None
+        fn_scenario = self.app.pargs.file
+        fn_archive = self.app.pargs.fn_archive
+        dkr = self.obtain_docker()
+
+        logger.info("loading scenario from file [%s]", fn_scenario)
+        scenario = Scenario.from_file(fn_scenario)
+        logger.info("loaded scenario")
+        image = image_name(scenario)
+
+        logger.info("saving Docker image [%s] for scenario [%s] to archive (%s): %s",
+                    image, scenario.name, archive_format(fn_archive), fn_archive)
+        try:
+            throughput = save_image(dkr,
+                                    image,
+                                    fn_archive,
+                                    level=self.app.pargs.compression_level,
+                                    threads=self.app.pargs.compression_threads)
+        except Exception:
+            logger.exception("failed to save image to archive")
+            raise
+        logger.info("saved Docker image [%s] for scenario [%s] to archive: %s",
+                    image, scenario.name, fn_archive)
+        logger.info(str(throughput))
 
     @expose(
         help='installs the Docker image for a scenario from an archive',
@@ -61,12 +275,21 @@ class ImageController(ArgparseController):
         logger.info("loaded scenario")
         image = image_name(scenario)
 
-        logger.info("installing Docker image [%s] for scenario [%s] from archive: %s",
-                    image, scenario.name, fn_archive)
+        logger.info("installing Docker image [%s] for scenario [%s] from archive (%s): %s",
+                    image, scenario.name, archive_format(fn_archive), fn_archive)
         try:
-            install_from_archive(dkr, scenario, fn_archive)
+            throughput = load_image(dkr, fn_archive)
         except Exception:
             logger.exception("failed to install image from archive")
             raise
+        # exception classes must be resolved before they can be caught
+        from docker.errors import ImageNotFound
+        try:
+            dkr.images.get(image)
+        except ImageNotFound:
+            logger.error("archive did not contain Docker image [%s]: %s",
+                         image, fn_archive)
+            sys.exit(1)
         logger.info("installed Docker image [%s] for scenario [%s] from archive: %s",
                     image, scenario.name, fn_archive)
+        logger.info(str(throughput))
@@ -0,0 +1,131 @@
+__all__ = ['lazy_import', 'LazyImport', 'ImportProfiler']
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import builtins
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+
+import tabulate
+
+
+class LazyImport(object):
+    """
+    Acts as a stand-in for a module, or for an attribute of a module, that
+    is only imported when it is first used (i.e., called or accessed). This
+    allows controllers to be registered with the CLI without paying the cost
+    of importing their (heavy) dependencies until one of their commands is
+    actually executed.
+    """
+    def __init__(self, module, name=None):
+        # type: (str, Optional[str]) -> None
+        self.__module = module
+        self.__name = name
+        self.__target = None  # type: Any
+        self.__lock = threading.RLock()
+
+    def __resolve(self):
+        # type: () -> Any
+        with self.__lock:
+            if self.__target is None:
+                target = importlib.import_module(self.__module)
+                if self.__name:
+                    target = getattr(target, self.__name)
+                self.__target = target
+        return self.__target
+
+    def __getattr__(self, attr):
+        # type: (str) -> Any
+        if attr.startswith('_LazyImport__'):
+            raise AttributeError(attr)
+        return getattr(self.__resolve(), attr)
+
+    def __call__(self, *args, **kwargs):
+        # type: (*Any, **Any) -> Any
+        return self.__resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        # type: () -> str
+        name = self.__module
+        if self.__name:
+            name = "{}.{}".format(name, self.__name)
+        return "LazyImport({})".format(name)
+
+
+def lazy_import(module, name=None):
+    # type: (str, Optional[str]) -> Any
+    """
+    Returns a lazily imported module, or a lazily imported attribute of a
+    given module.
+    """
+    return LazyImport(module, name)
+
+
+class ImportProfiler(object):
+    """
+    Measures the time taken to import each module by temporarily replacing
+    the built-in import function.
+    """
+    def __init__(self):
+        # type: () -> None
+        self.__original = None  # type: Optional[Callable[..., Any]]
+        self.__time_started = time.perf_counter()
+        self.__timings = []  # type: List[Tuple[str, float, float]]
+        self.__stack = []  # type: List[float]
+
+    def install(self):
+        # type: () -> None
+        self.__original = builtins.__import__
+        builtins.__import__ = self.__import
+
+    def uninstall(self):
+        # type: () -> None
+        if self.__original:
+            builtins.__import__ = self.__original
+            self.__original = None
+
+    def __import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # type: (str, Optional[Dict[str, Any]], Any, Any, int) -> Any
+        assert self.__original
+        if threading.current_thread() is not threading.main_thread():
+            return self.__original(name, globals, locals, fromlist, level)
+        fullname = name
+        if level > 0 and globals:
+            package = globals.get('__package__') or ''
+            try:
+                fullname = importlib.util.resolve_name('.' * level + name,
+                                                       package)
+            except (ImportError, ValueError):
+                pass
+        if fullname in sys.modules:
+            return self.__original(name, globals, locals, fromlist, level)
+
+        # time spent importing child modules is subtracted from the self time
+        # of this module
+        self.__stack.append(0.0)
+        time_start = time.perf_counter()
+        try:
+            return self.__original(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - time_start
+            children = self.__stack.pop()
+            if self.__stack:
+                self.__stack[-1] += cumulative
+            self.__timings.append((fullname, cumulative - children, cumulative))
+
+    def report(self, limit=30):
+        # type: (int) -> str
+        """
+        Produces a table of the modules that took the longest to import,
+        together with the total time since the profiler was created.
+        """
+        timings = sorted(self.__timings, key=lambda t: t[2], reverse=True)
+        rows = [(name, "{:.1f}".format(own * 1000), "{:.1f}".format(cum * 1000))
+                for (name, own, cum) in timings[:limit]]
+        table = tabulate.tabulate(
+            rows, headers=['Module', 'Self (ms)', 'Cumulative (ms)'])
+        total = time.perf_counter() - self.__time_started
+        return "{}\n\n{} modules imported; total time: {:.1f} ms".format(
+            table, len(timings), total * 1000)
@@ -0,0 +1,263 @@
+__all__ = ['CoverageMatrix', 'FORMULAS', 'localize', 'write_rankings']
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+
+from .imports import lazy_import
+from .util import atomic_write
+from .coverage import CoverageFile, mapped_coverage_file
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+np = lazy_import('numpy')
+Localization = lazy_import('darjeeling.localization', 'Localization')
+FileLine = lazy_import('bugzoo.core.fileline', 'FileLine')
+
+
+def _divide(a, b):
+    # type: (Any, Any) -> Any
+    """
+    Divides two arrays element-wise, treating division by zero as zero.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    out = np.zeros(np.broadcast(a, b).shape)
+    return np.divide(a, b, out=out, where=b != 0)
+
+
+# each formula computes the suspiciousness of every line from the number of
+# failing (ef) and passing (ep) tests that cover it, and the number of
+# failing (nf) and passing (np_) tests that do not
+def _ochiai(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    return _divide(ef, np.sqrt((ef + nf) * (ef + ep)))
+
+
+def _tarantula(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    failed = _divide(ef, ef + nf)
+    passed = _divide(ep, ep + np_)
+    return _divide(failed, failed + passed)
+
+
+def _dstar(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    numerator = ef.astype(float) ** 2
+    denominator = ep + nf
+    scores = _divide(numerator, denominator)
+    # lines that are covered by every failing test and no passing test are
+    # the most suspicious of all
+    perfect = (denominator == 0) & (ef > 0)
+    if perfect.any():
+        scores[perfect] = scores[~perfect].max(initial=0.0) + 1.0
+    return scores
+
+
+def _jaccard(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    return _divide(ef, ef + nf + ep)
+
+
+def _op2(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    return ef - _divide(ep, ep + np_ + 1)
+
+
+def _barinel(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    return 1.0 - _divide(ep, ep + ef)
+
+
+def _kulczynski2(ef, ep, nf, np_):
+    # type: (Any, Any, Any, Any) -> Any
+    return 0.5 * (_divide(ef, ef + nf) + _divide(ef, ef + ep))
+
+
+FORMULAS = {
+    'ochiai': _ochiai,
+    'tarantula': _tarantula,
+    'dstar': _dstar,
+    'jaccard': _jaccard,
+    'op2': _op2,
+    'barinel': _barinel,
+    'kulczynski2': _kulczynski2
+}  # type: Dict[str, Callable[[Any, Any, Any, Any], Any]]
+
+
+class CoverageMatrix(object):
+    """
+    Represents line coverage as a sparse test-by-line matrix, stored as the
+    row (test) and column (line) indices of its nonzero entries, from which
+    the spectrum of every line is computed in a single pass.
+    """
+    def __init__(self,
+                 lines,     # type: Sequence[Tuple[str, int]]
+                 passed,    # type: Any
+                 rows,      # type: Any
+                 cols       # type: Any
+                 ):         # type: (...) -> None
+        self.lines = lines
+        self.passed = passed
+        self.rows = rows
+        self.cols = cols
+
+    @staticmethod
+    def from_dict(d):
+        # type: (Dict[str, Any]) -> CoverageMatrix
+        """
+        Constructs a coverage matrix from a JSON-encoded line coverage
+        report, in the format produced by BugZoo.
+        """
+        tests = list(d.values())
+
+        # each file is given a contiguous range of columns, one per line, so
+        # that the lines of each file can be mapped to their columns by
+        # adding an offset; unused columns are removed at the end
+        offsets = {}  # type: Dict[str, int]
+        width = 0
+        for test in tests:
+            for (filename, nums) in test['coverage'].items():
+                if filename not in offsets:
+                    offsets[filename] = 0
+                if nums:
+                    offsets[filename] = max(offsets[filename], max(nums))
+        for filename in sorted(offsets):
+            size = offsets[filename] + 1
+            offsets[filename] = width
+            width += size
+
+        rows = []  # type: List[Any]
+        cols = []  # type: List[Any]
+        for (row, test) in enumerate(tests):
+            for (filename, nums) in test['coverage'].items():
+                if not nums:
+                    continue
+                covered = np.asarray(nums, dtype=np.int64) + offsets[filename]
+                cols.append(covered)
+                rows.append(np.full(len(covered), row, dtype=np.int64))
+        if cols:
+            rows_all = np.concatenate(rows)
+            cols_all = np.concatenate(cols)
+        else:
+            rows_all = np.zeros(0, dtype=np.int64)
+            cols_all = np.zeros(0, dtype=np.int64)
+        (used, cols_all) = np.unique(cols_all, return_inverse=True)
+
+        # maps each used column back to its file and line
+        starts = sorted((offset, filename) for (filename, offset) in offsets.items())  # noqa: pycodestyle
+        bounds = np.asarray([offset for (offset, _) in starts], dtype=np.int64)
+        owners = np.searchsorted(bounds, used, side='right') - 1
+        lines = [(starts[owner][1], int(col - starts[owner][0]))
+                 for (owner, col) in zip(owners.tolist(), used.tolist())]
+
+        passed = np.asarray([bool(t['outcome']['passed']) for t in tests],
+                            dtype=bool)
+        return CoverageMatrix(lines, passed, rows_all, cols_all)
+
+    @staticmethod
+    def from_file(source):
+        # type: (CoverageFile) -> CoverageMatrix
+        """
+        Constructs a coverage matrix directly from the arrays of a binary
+        coverage file, without decoding the coverage of each test.
+        """
+        indptr = np.frombuffer(source.indptr, dtype=np.uint64)
+        cols = np.frombuffer(source.indices, dtype=np.uint32)
+        rows = np.repeat(np.arange(len(source), dtype=np.int64),
+                         np.diff(indptr).astype(np.int64))
+        passed = np.asarray([bool(t['outcome']['passed'])
+                             for t in source.tests],
+                            dtype=bool)
+        return CoverageMatrix(source.lines, passed, rows, cols)
+
+    @staticmethod
+    def from_coverage(coverage):
+        # type: (TestSuiteCoverage) -> CoverageMatrix
+        """
+        Constructs a coverage matrix for a given coverage report, reading
+        directly from the binary coverage file that backs the report, if
+        there is one, and from its dictionary-based description otherwise.
+        """
+        source = mapped_coverage_file(coverage)
+        if source is not None:
+            return CoverageMatrix.from_file(source)
+        return CoverageMatrix.from_dict(coverage.to_dict())
+
+    @property
+    def num_tests(self):
+        # type: () -> int
+        return len(self.passed)
+
+    def spectra(self):
+        # type: () -> Tuple[Any, Any, Any, Any]
+        """
+        Computes the number of failing and passing tests that cover (ef, ep)
+        and do not cover (nf, np) each line.
+        """
+        width = len(self.lines)
+        failing = ~self.passed[self.rows]
+        ef = np.bincount(self.cols[failing], minlength=width)
+        ep = np.bincount(self.cols[~failing], minlength=width)
+        total_failed = int((~self.passed).sum())
+        total_passed = int(self.passed.sum())
+        return (ef, ep, total_failed - ef, total_passed - ep)
+
+    def scores(self, formula):
+        # type: (str) -> Dict[Tuple[str, int], float]
+        """
+        Computes the suspiciousness of each line that is covered by at least
+        one failing test, using a given formula.
+        """
+        return self.all_scores([formula])[formula]
+
+    def all_scores(self, formulas=None):
+        # type: (Optional[List[str]]) -> Dict[str, Dict[Tuple[str, int], float]]  # noqa: pycodestyle
+        """
+        Computes the suspiciousness of each line that is covered by at least
+        one failing test, using each of a given set of formulas (by default,
+        all formulas), from a single computation of the spectra.
+        """
+        (ef, ep, nf, np_) = self.spectra()
+        suspicious = np.flatnonzero(ef > 0)
+        spectra = (ef[suspicious], ep[suspicious],
+                   nf[suspicious], np_[suspicious])
+        lines = [self.lines[i] for i in suspicious.tolist()]
+        results = {}  # type: Dict[str, Dict[Tuple[str, int], float]]
+        for formula in (formulas or sorted(FORMULAS)):
+            scores = FORMULAS[formula](*spectra)
+            results[formula] = dict(zip(lines, scores.tolist()))
+        return results
+
+
+def localize(coverage, formula):
+    # type: (TestSuiteCoverage, str) -> Localization
+    """
+    Computes fault localization for a given coverage report using a given
+    suspiciousness formula.
+    """
+    matrix = CoverageMatrix.from_coverage(coverage)
+    logger.debug("computing %s suspiciousness for %d lines and %d tests",
+                 formula, len(matrix.lines), matrix.num_tests)
+    scores = matrix.scores(formula)
+    return Localization({FileLine(filename, num): score
+                         for ((filename, num), score) in scores.items()})
+
+
+def write_rankings(coverage, fn, formulas=None):
+    # type: (TestSuiteCoverage, str, Optional[List[str]]) -> None
+    """
+    Writes the ranking of suspicious lines produced by each of a given set
+    of formulas (by default, all formulas) to a JSON file.
+    """
+    matrix = CoverageMatrix.from_coverage(coverage)
+    rankings = {}  # type: Dict[str, List[Dict[str, Any]]]
+    for (formula, scores) in matrix.all_scores(formulas).items():
+        ranked = sorted(scores.items(), key=lambda e: (-e[1], e[0]))
+        rankings[formula] = [{'file': filename, 'line': num, 'score': score}
+                             for ((filename, num), score) in ranked]
+    with atomic_write(fn) as f:
+        json.dump({'tests': matrix.num_tests,
+                   'lines': len(matrix.lines),
+                   'rankings': rankings}, f)
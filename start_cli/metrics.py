@@ -0,0 +1,239 @@
+__all__ = ['SearchMonitor']
+
+from typing import Any, Dict, List, Optional, Set
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+from .util import atomic_write
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the prefix used by the name of each Prometheus metric
+PROMETHEUS_PREFIX = 'start_repair_'
+
+
+def _escape(value):
+    # type: (str) -> str
+    """
+    Escapes a given Prometheus label value.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class SearchMonitor(object):
+    """
+    Periodically reports the progress of an ongoing search, allowing stalled
+    or underperforming searches to be spotted (and terminated or retuned)
+    before they run to completion. Each sample is appended to a JSON Lines
+    file and/or written to a file in the Prometheus textfile format, which
+    may be collected by the textfile collector of a local node exporter.
+
+    Outcomes are observed by wrapping the `record` method of the outcome
+    manager of the searcher, which is called by each of its worker threads
+    once a candidate has been evaluated.
+    """
+    def __init__(self,
+                 searcher,          # type: Searcher
+                 scenario,          # type: str
+                 interval=30.0,     # type: float
+                 fn_jsonl=None,     # type: Optional[str]
+                 fn_prom=None       # type: Optional[str]
+                 ):                 # type: (...) -> None
+        self.__searcher = searcher
+        self.__scenario = scenario
+        self.__interval = interval
+        self.__fn_jsonl = fn_jsonl
+        self.__fn_prom = fn_prom
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None  # type: Optional[threading.Thread]
+        self.__time_start = time.time()
+        self.__previous = None  # type: Optional[Dict[str, Any]]
+
+        self.__num_build_failures = 0
+        self.__num_patches = 0
+        self.__best = None  # type: Optional[float]
+        self.__evals_by_thread = collections.Counter()  # type: Dict[str, int]
+
+    def __record(self, candidate, outcome):
+        # type: (Candidate, CandidateOutcome) -> None
+        thread = threading.current_thread().name
+        try:
+            # the test outcome set of darjeeling does not implement
+            # __len__, and so the tests are counted as they are iterated
+            tests = outcome.tests
+            num_tests = num_passed = 0
+            for name in tests:
+                num_tests += 1
+                if tests[name].successful:
+                    num_passed += 1
+            fitness = num_passed / num_tests if num_tests else None
+        except Exception:
+            logger.debug("failed to compute fitness of candidate outcome",
+                         exc_info=True)
+            fitness = None
+        with self.__lock:
+            self.__evals_by_thread[thread] += 1
+            if not outcome.build.successful:
+                self.__num_build_failures += 1
+            elif fitness is not None \
+                    and (self.__best is None or fitness > self.__best):
+                self.__best = fitness
+
+    def record_patch(self):
+        # type: () -> None
+        with self.__lock:
+            self.__num_patches += 1
+
+    def sample(self):
+        # type: () -> Dict[str, Any]
+        """
+        Computes a snapshot of the current progress of the search. Rates are
+        computed over the period since the previous sample.
+        """
+        now = time.time()
+        with self.__lock:
+            sample = {'scenario': self.__scenario,
+                      'time': now,
+                      'elapsed': now - self.__time_start,
+                      'num_candidate_evals': self.__searcher.num_candidate_evals,
+                      'num_test_evals': self.__searcher.num_test_evals,
+                      'num_build_failures': self.__num_build_failures,
+                      'num_patches': self.__num_patches,
+                      'best_fitness': self.__best,
+                      'candidate_evals_by_thread': dict(self.__evals_by_thread)}
+
+        previous = self.__previous
+        if previous is None:
+            previous = {'time': self.__time_start,
+                        'num_candidate_evals': 0,
+                        'num_test_evals': 0}
+        duration_mins = max(now - previous['time'], 1e-6) / 60
+        for (name, name_rate) in [('num_candidate_evals', 'candidates_per_minute'),
+                                  ('num_test_evals', 'test_evals_per_minute')]:
+            sample[name_rate] = (sample[name] - previous[name]) / duration_mins
+        self.__previous = sample
+        return sample
+
+    def __to_prometheus(self, sample):
+        # type: (Dict[str, Any]) -> str
+        labels = 'scenario="{}"'.format(_escape(self.__scenario))
+        lines = []  # type: List[str]
+        declared = set()  # type: Set[str]
+
+        def metric(name, kind, description, value, extra_labels=''):
+            # type: (str, str, str, Optional[float], str) -> None
+            if value is None:
+                return
+            name = PROMETHEUS_PREFIX + name
+            if name not in declared:
+                declared.add(name)
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} {}".format(name, kind))
+            lines.append("{}{{{}{}}} {}".format(name, labels, extra_labels, value))
+
+        metric('elapsed_seconds', 'gauge',
+               'time elapsed since the search began.',
+               sample['elapsed'])
+        metric('candidate_evals_total', 'counter',
+               'number of candidate patches that have been evaluated.',
+               sample['num_candidate_evals'])
+        metric('test_evals_total', 'counter',
+               'number of test executions.',
+               sample['num_test_evals'])
+        metric('build_failures_total', 'counter',
+               'number of candidate patches that failed to compile.',
+               sample['num_build_failures'])
+        metric('patches_total', 'counter',
+               'number of plausible patches that have been found.',
+               sample['num_patches'])
+        metric('candidates_per_minute', 'gauge',
+               'rate of candidate evaluations since the previous sample.',
+               sample['candidates_per_minute'])
+        metric('test_evals_per_minute', 'gauge',
+               'rate of test executions since the previous sample.',
+               sample['test_evals_per_minute'])
+        metric('best_fitness', 'gauge',
+               'largest fraction of passing tests for any candidate patch.',
+               sample['best_fitness'])
+        by_thread = sample['candidate_evals_by_thread']
+        for (thread, num_evals) in sorted(by_thread.items()):
+            metric('thread_candidate_evals_total', 'counter',
+                   'number of candidate patches evaluated by each thread.',
+                   num_evals, ',thread="{}"'.format(_escape(thread)))
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        # type: () -> None
+        """
+        Takes a sample of the progress of the search and writes it to disk.
+        """
+        sample = self.sample()
+        logger.info("search progress: %d candidates (%.1f/min), "
+                    "%d test evaluations (%.1f/min), %d build failures",
+                    sample['num_candidate_evals'],
+                    sample['candidates_per_minute'],
+                    sample['num_test_evals'],
+                    sample['test_evals_per_minute'],
+                    sample['num_build_failures'])
+        try:
+            if self.__fn_jsonl:
+                with open(self.__fn_jsonl, 'a') as f:
+                    f.write(json.dumps(sample) + '\n')
+            if self.__fn_prom:
+                with atomic_write(self.__fn_prom) as f:
+                    f.write(self.__to_prometheus(sample))
+                # the file must be readable by the node exporter
+                os.chmod(self.__fn_prom, 0o644)
+        except (IOError, OSError):
+            logger.exception("failed to write search metrics")
+
+    def __run(self):
+        # type: () -> None
+        while not self.__stopped.wait(self.__interval):
+            self.report()
+
+    def start(self):
+        # type: () -> None
+        outcomes = self.__searcher.outcomes
+        record = outcomes.record
+
+        def record_and_observe(candidate, outcome):
+            # type: (Candidate, CandidateOutcome) -> None
+            record(candidate, outcome)
+            self.__record(candidate, outcome)
+
+        outcomes.record = record_and_observe
+        self.__time_start = time.time()
+        self.__thread = threading.Thread(target=self.__run,
+                                         name='search-monitor',
+                                         daemon=True)
+        self.__thread.start()
+        logger.debug("started search monitor (interval: %.1f seconds)",
+                     self.__interval)
+
+    def stop(self):
+        # type: () -> None
+        """
+        Stops the monitor, and writes a final sample to disk.
+        """
+        self.__stopped.set()
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+        self.report()
+        logger.debug("stopped search monitor")
+
+    def __enter__(self):
+        # type: () -> SearchMonitor
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        # type: (*Any) -> None
+        self.stop()
@@ -1,9 +1,11 @@
+import os
+
 OPT_FILE = (['file'], {'help': "path to the scenario config file"})
 OPT_COVERAGE_FILE = \
     (['file'], {'help': 'path to a JSON-encoded coverage report.'})
 OPT_ARCHIVE = \
     (['--archive'],
-     {'help': 'path to a compressed Docker image.',
+     {'help': 'path to a Docker image archive (.tar, .tar.gz or .tar.zst), or - to stream the archive via stdin/stdout.',
       'dest': 'fn_archive',
       'type': str})
 OPT_LOCALIZATION = \
@@ -29,13 +31,17 @@ OPT_NUM_THREADS = \
      {'help': 'number of threads to use.',
       'type': int,
       'default': 1})
+OPT_WORKERS = \
+    (['--workers'],
+     {'help': 'maximum number of worker processes to use.',
+      'type': int})
 OPT_SNIPPETS = \
     (['--snippets'],
      {'help': 'loads snippets from a specified snippet database file.',
       'type': str})
 OPT_COVERAGE = \
     (['--coverage'],
-     {'help': 'path to a JSON-encoded line coverage report.',
+     {'help': 'path to a line coverage report, in either the JSON or the compact binary format.',
       'type': str})
 OPT_ANALYSIS = \
     (['--analysis'],
@@ -43,10 +49,9 @@ OPT_ANALYSIS = \
       'type': str})
 OPT_TIMEOUT = \
     (['--time-limit'],
-     {'help': 'the number of seconds that may pass without success until a mission is considered a failure.',
+     {'help': 'the number of seconds that may pass without success until a mission is considered a failure (default: learned from passing runs on this host, or 300).',
      'type': int,
-     'dest': 'timeout_mission',
-     'default': 300})
+     'dest': 'timeout_mission'})
 OPT_TIMEOUT_CONNECTION = \
     (['--timeout-connection'],
      {'help': 'the number of seconds to wait when connecting to the SITL before aborting.',
@@ -69,9 +74,8 @@ OPT_ATTACK = \
       'action': 'store_true'})
 OPT_SPEEDUP = \
     (['--speedup'],
-     {'help': 'the speed-up factor that should be applied to the simulation clock.',
-      'type': int,
-      'default': 10})
+     {'help': 'the speed-up factor that should be applied to the simulation clock (default: the calibrated factor for this host, or 10).',
+      'type': int})
 OPT_LIVENESS = \
     (['--timeout-liveness'],
      {'help': 'the number of seconds that may pass without communication with the rover until the mission is aborted.',
@@ -153,3 +157,172 @@ OPTS_REPAIR = [
     OPT_ONLY_INSERT_EXECUTED,
     OPT_NO_ORDERING
 ]
+
+OPT_CACHE_DIR = \
+    (['--cache-dir'],
+     {'help': 'the directory used to cache precomputed repair artifacts.',
+      'type': str,
+      'default': os.environ.get('START_CLI_CACHE_DIR',
+                                os.path.expanduser('~/.start-cli/cache'))})
+OPT_NO_CACHE = \
+    (['--no-cache'],
+     {'help': 'disables the reuse and caching of precomputed repair artifacts.',
+      'dest': 'no_cache',
+      'action': 'store_true'})
+OPT_CACHE_MAX_SIZE = \
+    (['--cache-max-size'],
+     {'help': 'the maximum size of the artifact cache, given in megabytes.',
+      'type': int,
+      'default': 10240})
+OPT_CACHE_MAX_AGE = \
+    (['--cache-max-age'],
+     {'help': 'the number of days after which a cached artifact expires.',
+      'type': int,
+      'default': 30})
+
+OPTS_CACHE = [
+    OPT_CACHE_DIR,
+    OPT_NO_CACHE,
+    OPT_CACHE_MAX_SIZE,
+    OPT_CACHE_MAX_AGE
+]
+
+OPT_SEQUENTIAL = \
+    (['--sequential'],
+     {'help': 'repeatedly executes the mission until its outcome can be classified as passing, failing, or flaky with a given confidence.',
+      'action': 'store_true'})
+OPT_ALPHA = \
+    (['--alpha'],
+     {'help': 'the maximum probability of accepting an outcome as consistent when it is not.',
+      'type': float,
+      'default': 0.05})
+OPT_BETA = \
+    (['--beta'],
+     {'help': 'the maximum probability of rejecting an outcome as consistent when it is.',
+      'type': float,
+      'default': 0.05})
+OPT_INDIFFERENCE = \
+    (['--indifference'],
+     {'help': 'the rate of disagreeing runs below which an outcome is considered consistent.',
+      'type': float,
+      'default': 0.1})
+OPT_MIN_RUNS = \
+    (['--min-runs'],
+     {'help': 'the minimum number of runs in sequential mode.',
+      'type': int,
+      'default': 3})
+OPT_MAX_RUNS = \
+    (['--max-runs'],
+     {'help': 'the maximum number of runs in sequential mode.',
+      'type': int,
+      'default': 30})
+
+OPTS_SEQUENTIAL = [
+    OPT_SEQUENTIAL,
+    OPT_ALPHA,
+    OPT_BETA,
+    OPT_INDIFFERENCE,
+    OPT_MIN_RUNS,
+    OPT_MAX_RUNS
+]
+
+OPT_TRACE = \
+    (['--trace'],
+     {'help': 'writes a Chrome trace (JSON) of the time and memory used by each stage to a given file.',
+      'type': str})
+
+OPT_METRICS = \
+    (['--metrics'],
+     {'help': 'periodically appends the progress of the search, as a JSON line, to a given file.',
+      'type': str})
+OPT_METRICS_PROMETHEUS = \
+    (['--metrics-prometheus'],
+     {'help': 'periodically writes the progress of the search to a given file in the Prometheus textfile format.',
+      'dest': 'metrics_prometheus',
+      'type': str})
+OPT_METRICS_INTERVAL = \
+    (['--metrics-interval'],
+     {'help': 'the number of seconds between reports of the progress of the search.',
+      'type': float,
+      'default': 30.0})
+
+OPTS_METRICS = [
+    OPT_METRICS,
+    OPT_METRICS_PROMETHEUS,
+    OPT_METRICS_INTERVAL
+]
+
+OPT_CHECKPOINT = \
+    (['--checkpoint'],
+     {'help': 'the directory to which the state of the search should be checkpointed (default: a .checkpoint subdirectory of the output directory).',
+      'type': str})
+OPT_NO_CHECKPOINT = \
+    (['--no-checkpoint'],
+     {'help': 'disables checkpointing of the state of the search.',
+      'dest': 'no_checkpoint',
+      'action': 'store_true'})
+OPT_CHECKPOINT_INTERVAL = \
+    (['--checkpoint-interval'],
+     {'help': 'the minimum number of seconds between checkpoints of the state of the search.',
+      'type': float,
+      'default': 60.0})
+OPT_RESUME = \
+    (['--resume'],
+     {'help': 'resumes the search from a given checkpoint directory, skipping candidates that have already been evaluated.',
+      'type': str})
+
+OPTS_CHECKPOINT = [
+    OPT_CHECKPOINT,
+    OPT_NO_CHECKPOINT,
+    OPT_CHECKPOINT_INTERVAL,
+    OPT_RESUME
+]
+
+OPT_OUTCOME_CACHE = \
+    (['--outcome-cache'],
+     {'help': 'the database used to share the outcomes of candidate patches across repair runs (default: outcomes.sqlite within the cache directory).',
+      'type': str})
+OPT_OUTCOME_CACHE_MAX_SIZE = \
+    (['--outcome-cache-max-size'],
+     {'help': 'the maximum size of the outcome cache, given in megabytes.',
+      'type': int,
+      'default': 1024})
+
+OPTS_OUTCOME_CACHE = [
+    OPT_OUTCOME_CACHE,
+    OPT_OUTCOME_CACHE_MAX_SIZE
+]
+
+OPT_ON_PATCH = \
+    (['--on-patch'],
+     {'help': 'a shell command that is executed whenever a patch is found; START_PATCH_FILE, START_PATCH_NUMBER and START_PATCH_MANIFEST are set in its environment.',
+      'type': str})
+
+OPT_FORCE_BUILD = \
+    (['--force'],
+     {'help': 'rebuilds images even if they are up to date.',
+      'action': 'store_true'})
+
+OPT_COMPRESSION_LEVEL = \
+    (['--compression-level'],
+     {'help': 'the compression level used for image archives.',
+      'type': int,
+      'default': 3})
+OPT_COMPRESSION_THREADS = \
+    (['--compression-threads'],
+     {'help': 'the number of threads used for zstd compression (default: one per CPU).',
+      'type': int,
+      'default': -1})
+
+OPT_POOL_SIZE = \
+    (['--pool-size'],
+     {'help': 'the number of idle, pre-started containers that are kept ready for the search (default: 0, disabled).',
+      'type': int,
+      'default': 0})
+
+OPT_FORMULA = \
+    (['--formula'],
+     {'help': 'computes fault localization using a given suspiciousness formula, rather than the default scheme of start-repair.',
+      'choices': ['barinel', 'dstar', 'jaccard', 'kulczynski2', 'ochiai',
+                  'op2', 'tarantula'],
+      'type': str})
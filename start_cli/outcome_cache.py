@@ -0,0 +1,274 @@
+__all__ = ['OutcomeCache', 'normalize_diff']
+
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .outcomes import outcome_to_dict, outcome_from_dict
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    snapshot TEXT NOT NULL,
+    diff TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (snapshot, diff)
+);
+CREATE INDEX IF NOT EXISTS outcomes_by_access ON outcomes (accessed);
+"""
+
+
+def normalize_diff(diff):
+    # type: (str) -> str
+    """
+    Computes a digest of a unified diff that ignores details that have no
+    bearing on the patched program: file headers other than the names of
+    the patched files, and trailing whitespace.
+    """
+    lines = []
+    for line in diff.splitlines():
+        if line.startswith(('diff ', 'index ')):
+            continue
+        if line.startswith(('--- ', '+++ ')):
+            # drop timestamps and the a/ and b/ prefixes from file headers
+            fn = line[4:].split('\t')[0].strip()
+            if fn.startswith(('a/', 'b/')):
+                fn = fn[2:]
+            line = line[:4] + fn
+        lines.append(line.rstrip())
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+class OutcomeCache(object):
+    """
+    Provides a persistent, on-disk store of the outcomes of candidate
+    patches, backed by SQLite, that is shared across repair runs. Outcomes
+    are indexed by a digest of the snapshot and by a normalized digest of
+    the diff of the candidate patch, so that an outcome can be reused by
+    any run on the same snapshot that produces the same patch, regardless
+    of the transformations or settings that were used to produce it.
+    """
+    def __init__(self, fn, max_size=None):
+        # type: (str, Optional[int]) -> None
+        """
+        Parameters:
+            fn: the database file.
+            max_size: an optional limit on the total size of the stored
+                outcomes, given in bytes.
+        """
+        dirname = os.path.dirname(os.path.abspath(fn))
+        os.makedirs(dirname, exist_ok=True)
+        self.__fn = fn
+        self.__max_size = max_size
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(fn,
+                                            timeout=30.0,
+                                            check_same_thread=False)
+        # allows concurrent repair runs to share the cache
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.executescript(SCHEMA)
+
+    @property
+    def filename(self):
+        # type: () -> str
+        return self.__fn
+
+    def __enter__(self):
+        # type: () -> OutcomeCache
+        return self
+
+    def __exit__(self, *args):
+        # type: (*Any) -> None
+        self.close()
+
+    def close(self):
+        # type: () -> None
+        self.__connection.close()
+
+    def __len__(self):
+        # type: () -> int
+        with self.__lock:
+            cursor = self.__connection.execute("SELECT COUNT(*) FROM outcomes")
+            return cursor.fetchone()[0]
+
+    @property
+    def size(self):
+        # type: () -> int
+        """
+        The total size of the stored outcomes, given in bytes.
+        """
+        with self.__lock:
+            cursor = self.__connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM outcomes")
+            return cursor.fetchone()[0]
+
+    def lookup(self, snapshot, diff):
+        # type: (str, str) -> Optional[CandidateOutcome]
+        """
+        Returns the stored outcome for a given snapshot and normalized diff,
+        or None if no outcome is stored.
+        """
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT outcome FROM outcomes WHERE snapshot = ? AND diff = ?",
+                (snapshot, diff)).fetchone()
+            if not row:
+                return None
+            # record the access for the purposes of LRU eviction
+            with self.__connection:
+                self.__connection.execute(
+                    "UPDATE outcomes SET accessed = ? WHERE snapshot = ? AND diff = ?",  # noqa: pycodestyle
+                    (time.time(), snapshot, diff))
+        return outcome_from_dict(json.loads(row[0]))
+
+    def store(self, snapshot, diff, outcome):
+        # type: (str, str, CandidateOutcome) -> None
+        jsn = json.dumps(outcome_to_dict(outcome))
+        now = time.time()
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?, ?, ?)",
+                (snapshot, diff, jsn, len(jsn) + len(snapshot) + len(diff),
+                 now, now))
+
+    def clear(self):
+        # type: () -> int
+        """
+        Evicts every outcome from the cache.
+
+        Returns:
+            the number of evicted outcomes.
+        """
+        with self.__lock, self.__connection:
+            cursor = self.__connection.execute("DELETE FROM outcomes")
+            num_evicted = cursor.rowcount
+        logger.debug("evicted %d outcomes from cache: %s",
+                     num_evicted, self.__fn)
+        return num_evicted
+
+    def prune(self, max_size=None, max_age=None):
+        # type: (Optional[int], Optional[float]) -> int
+        """
+        Evicts outcomes that are older than a given age, followed by the
+        least recently used outcomes until the cache fits within a given
+        size. If no size is given, the size limit of this cache is used.
+
+        Returns:
+            the number of evicted outcomes.
+        """
+        if max_size is None:
+            max_size = self.__max_size
+        num_evicted = 0
+        with self.__lock, self.__connection:
+            if max_age is not None:
+                cursor = self.__connection.execute(
+                    "DELETE FROM outcomes WHERE created < ?",
+                    (time.time() - max_age,))
+                num_evicted += cursor.rowcount
+            if max_size is not None:
+                # keep the most recently used outcomes that fit within the
+                # size limit
+                cursor = self.__connection.execute(
+                    "SELECT rowid, size FROM outcomes ORDER BY accessed DESC")
+                total = 0
+                evicted = []
+                for (rowid, size) in cursor:
+                    total += size
+                    if total > max_size:
+                        evicted.append((rowid,))
+                self.__connection.executemany(
+                    "DELETE FROM outcomes WHERE rowid = ?", evicted)
+                num_evicted += len(evicted)
+        if num_evicted:
+            logger.debug("evicted %d outcomes from cache: %s",
+                         num_evicted, self.__fn)
+        return num_evicted
+
+    def attach(self, searcher, problem, snapshot):
+        # type: (Searcher, Problem, str) -> Dict[str, int]
+        """
+        Extends the outcome manager of a given searcher so that the outcomes
+        of candidate patches that are not known to the searcher are fetched
+        from this cache, and so that the outcome of each newly evaluated
+        candidate is added to this cache.
+
+        Parameters:
+            searcher: the searcher.
+            problem: the repair problem, used to compute candidate diffs.
+            snapshot: a digest of the snapshot under repair.
+
+        Returns:
+            a dictionary that holds the number of cache hits and misses,
+            which is updated as the search progresses.
+        """
+        cache = self
+        outcomes = searcher.outcomes
+        base = outcomes.__class__
+        stats = {'hits': 0, 'misses': 0}  # type: Dict[str, int]
+
+        def key(candidate):
+            # type: (Candidate) -> str
+            return normalize_diff(str(candidate.to_diff(problem)))
+
+        def fetch(manager, candidate):
+            # type: (Any, Candidate) -> Optional[CandidateOutcome]
+            outcome = cache.lookup(snapshot, key(candidate))
+            if outcome is None:
+                stats['misses'] += 1
+                return None
+            stats['hits'] += 1
+            logger.debug("reusing cached outcome for candidate: %s", candidate)
+            base.record(manager, candidate, outcome)
+            return outcome
+
+        def known(manager, candidate):
+            # type: (Any, Candidate) -> bool
+            # the outcome manager of darjeeling does not implement
+            # __contains__, and so membership is tested by lookup
+            try:
+                base.__getitem__(manager, candidate)
+            except KeyError:
+                return False
+            return True
+
+        # the outcome manager is shared with the evaluator, and so its class,
+        # rather than the manager itself, must be extended
+        class CachedOutcomeManager(base):  # type: ignore
+            def __contains__(self, candidate):
+                # type: (Candidate) -> bool
+                return known(self, candidate) \
+                    or fetch(self, candidate) is not None
+
+            def __getitem__(self, candidate):
+                # type: (Candidate) -> CandidateOutcome
+                try:
+                    return base.__getitem__(self, candidate)
+                except KeyError:
+                    outcome = fetch(self, candidate)
+                    if outcome is None:
+                        raise
+                    return outcome
+
+            def record(self, candidate, outcome):
+                # type: (Candidate, CandidateOutcome) -> None
+                base.record(self, candidate, outcome)
+                try:
+                    cache.store(snapshot, key(candidate), outcome)
+                except Exception:
+                    logger.exception("failed to cache outcome of candidate: %s",
+                                     candidate)
+
+        outcomes.__class__ = CachedOutcomeManager
+        logger.info("using outcome cache (%d outcomes): %s",
+                    len(self), self.__fn)
+        return stats
@@ -0,0 +1,61 @@
+__all__ = ['candidate_key',
+           'candidate_to_dict',
+           'candidate_from_dict',
+           'outcome_to_dict',
+           'outcome_from_dict']
+
+from typing import Any, Dict
+import logging
+
+from .imports import lazy_import
+from .util import digest
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Candidate = lazy_import('darjeeling.candidate', 'Candidate')
+Transformation = lazy_import('darjeeling.transformation', 'Transformation')
+CandidateOutcome = lazy_import('darjeeling.outcome', 'CandidateOutcome')
+BuildOutcome = lazy_import('darjeeling.outcome', 'BuildOutcome')
+TestOutcome = lazy_import('darjeeling.outcome', 'TestOutcome')
+TestOutcomeSet = lazy_import('darjeeling.outcome', 'TestOutcomeSet')
+
+
+def candidate_to_dict(candidate):
+    # type: (Candidate) -> Dict[str, Any]
+    return {'transformations': [t.to_dict() for t in candidate.transformations]}
+
+
+def candidate_from_dict(d):
+    # type: (Dict[str, Any]) -> Candidate
+    transformations = [Transformation.from_dict(t) for t in d['transformations']]
+    return Candidate(tuple(transformations))
+
+
+def candidate_key(candidate):
+    # type: (Candidate) -> str
+    """
+    Computes a digest of the transformations that make up a given candidate
+    patch. Unlike the ID of a candidate, the digest is stable across
+    processes.
+    """
+    return digest(candidate_to_dict(candidate))
+
+
+def outcome_to_dict(outcome):
+    # type: (CandidateOutcome) -> Dict[str, Any]
+    tests = outcome.tests
+    return {'build': {'successful': outcome.build.successful,
+                      'time_taken': outcome.build.time_taken},
+            'tests': {name: {'successful': tests[name].successful,
+                             'time_taken': tests[name].time_taken}
+                      for name in tests},
+            'is_repair': outcome.is_repair}
+
+
+def outcome_from_dict(d):
+    # type: (Dict[str, Any]) -> CandidateOutcome
+    build = BuildOutcome(d['build']['successful'], d['build']['time_taken'])
+    tests = TestOutcomeSet({name: TestOutcome(t['successful'], t['time_taken'])
+                            for (name, t) in d['tests'].items()})
+    return CandidateOutcome(build, tests, d['is_repair'])
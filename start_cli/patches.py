@@ -0,0 +1,159 @@
+__all__ = ['PatchWriter']
+
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import time
+
+from .outcome_cache import normalize_diff
+from .util import atomic_write
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+class PatchWriter(object):
+    """
+    Writes each patch to disk as soon as it has been found, rather than
+    once the search has finished. Each patch is atomically written to its
+    own numbered diff file, and a manifest describing all of the patches in
+    the directory is atomically rewritten after each patch, allowing
+    downstream consumers to safely watch the directory while the search is
+    running.
+
+    An optional hook command may be executed, in the background, whenever
+    a new patch has been written. The command is executed by the shell
+    with the following environment variables:
+
+    * START_PATCH_FILE: the path to the diff file.
+    * START_PATCH_NUMBER: the number of the patch.
+    * START_PATCH_MANIFEST: the path to the manifest.
+
+    When a search is resumed, the patches that were written before it was
+    interrupted are loaded from the manifest, so that they are neither
+    overwritten nor written again.
+    """
+    def __init__(self,
+                 directory,         # type: str
+                 problem,           # type: Problem
+                 on_patch=None,     # type: Optional[str]
+                 resume=False       # type: bool
+                 ):                 # type: (...) -> None
+        self.__directory = directory
+        self.__problem = problem
+        self.__on_patch = on_patch
+        self.__time_started = time.time()
+        self.__patches = []  # type: List[Dict[str, Any]]
+        self.__digests = set()  # type: Set[str]
+        self.__hooks = []  # type: List[subprocess.Popen]
+        os.makedirs(directory, exist_ok=True)
+        if resume:
+            self.__load_manifest()
+        self.__write_manifest()
+
+    @property
+    def fn_manifest(self):
+        # type: () -> str
+        return os.path.join(self.__directory, 'manifest.json')
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.__patches)
+
+    def __load_manifest(self):
+        # type: () -> None
+        try:
+            with open(self.fn_manifest, 'r') as f:
+                patches = json.load(f)['patches']
+        except (IOError, OSError, ValueError, KeyError):
+            logger.debug("no existing patch manifest: %s", self.fn_manifest)
+            return
+        for entry in patches:
+            fn_patch = os.path.join(self.__directory, entry['file'])
+            try:
+                with open(fn_patch, 'r') as f:
+                    self.__digests.add(normalize_diff(f.read()))
+            except (IOError, OSError):
+                logger.warning("patch listed in manifest is missing: %s",
+                               fn_patch)
+            self.__patches.append(entry)
+        logger.info("loaded %d previously found patches from manifest: %s",
+                    len(self.__patches), self.fn_manifest)
+
+    def __write_manifest(self):
+        # type: () -> None
+        with atomic_write(self.fn_manifest) as f:
+            json.dump({'patches': self.__patches}, f, indent=2)
+
+    def write(self, patch, **details):
+        # type: (Candidate, **Any) -> Optional[str]
+        """
+        Writes a given patch to disk, together with any given details (e.g.,
+        the number of candidates evaluated before it was found), unless an
+        identical patch has already been written.
+
+        Returns:
+            the name of the file to which the patch was written, or None if
+            it was a duplicate.
+        """
+        diff = str(patch.to_diff(self.__problem))
+        digest = normalize_diff(diff)
+        if digest in self.__digests:
+            logger.debug("ignoring duplicate patch")
+            return None
+        self.__digests.add(digest)
+
+        num = len(self.__patches)
+        fn_patch = os.path.join(self.__directory, "{}.diff".format(num))
+        logger.debug("writing patch to %s", fn_patch)
+        try:
+            with atomic_write(fn_patch) as f:
+                f.write(diff)
+        except Exception:
+            logger.exception("failed to write patch: %s", fn_patch)
+            raise
+        logger.debug("wrote patch to %s", fn_patch)
+
+        entry = {'number': num,
+                 'file': os.path.basename(fn_patch),
+                 'sha256': hashlib.sha256(diff.encode('utf-8')).hexdigest(),
+                 'time_found': time.time(),
+                 'time_elapsed': time.time() - self.__time_started}
+        entry.update(details)
+        self.__patches.append(entry)
+        self.__write_manifest()
+
+        if self.__on_patch:
+            self.__run_hook(num, fn_patch)
+        return fn_patch
+
+    def __run_hook(self, num, fn_patch):
+        # type: (int, str) -> None
+        env = dict(os.environ)
+        env['START_PATCH_FILE'] = os.path.abspath(fn_patch)
+        env['START_PATCH_NUMBER'] = str(num)
+        env['START_PATCH_MANIFEST'] = os.path.abspath(self.fn_manifest)
+        logger.debug("executing patch hook for patch #%d: %s",
+                     num, self.__on_patch)
+        try:
+            process = subprocess.Popen(self.__on_patch, shell=True, env=env)
+        except OSError:
+            logger.exception("failed to execute patch hook: %s",
+                             self.__on_patch)
+            return
+        self.__hooks.append(process)
+
+    def close(self):
+        # type: () -> None
+        """
+        Waits for any outstanding hook commands to finish.
+        """
+        for process in self.__hooks:
+            code = process.wait()
+            if code != 0:
+                logger.warning("patch hook exited with code %d: %s",
+                               code, self.__on_patch)
+        self.__hooks = []
@@ -0,0 +1,98 @@
+__all__ = ['Pipeline']
+
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import logging
+import time
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+class Pipeline(object):
+    """
+    Executes a set of stages, arranged as a directed acyclic graph, within a
+    single process. Each stage is executed as soon as all of the stages upon
+    which it depends have finished, allowing independent stages to be
+    executed concurrently.
+    """
+    def __init__(self):
+        # type: () -> None
+        self.__stages = {}  # type: Dict[str, Callable[..., Any]]
+        self.__dependencies = {}  # type: Dict[str, List[str]]
+        self.__durations = {}  # type: Dict[str, float]
+
+    def stage(self,
+              name,             # type: str
+              func,             # type: Callable[..., Any]
+              dependencies=None  # type: Optional[List[str]]
+              ):                # type: (...) -> None
+        """
+        Adds a stage to this pipeline. Upon execution, the stage function is
+        called with the results of each of its dependencies, in order.
+        """
+        dependencies = dependencies or []
+        for dep in dependencies:
+            if dep not in self.__stages:
+                msg = "stage [{}] depends on unknown stage [{}]"
+                raise ValueError(msg.format(name, dep))
+        self.__stages[name] = func
+        self.__dependencies[name] = dependencies
+
+    @property
+    def durations(self):
+        # type: () -> Dict[str, float]
+        """
+        The number of seconds taken by each stage during the last run.
+        """
+        return dict(self.__durations)
+
+    def __execute(self, name, args):
+        # type: (str, List[Any]) -> Any
+        logger.info("starting stage: %s", name)
+        time_start = time.time()
+        result = self.__stages[name](*args)
+        self.__durations[name] = time.time() - time_start
+        logger.info("finished stage: %s (%.2f seconds)",
+                    name, self.__durations[name])
+        return result
+
+    def run(self, workers=1):
+        # type: (int) -> Dict[str, Any]
+        """
+        Executes each stage of this pipeline.
+
+        Parameters:
+            workers: the maximum number of stages that may run at once.
+
+        Returns:
+            the result of each stage, indexed by name.
+
+        Raises:
+            Exception: if any stage fails, no further stages are started and
+                the exception is propagated once the running stages finish.
+        """
+        results = {}  # type: Dict[str, Any]
+        pending = set(self.__stages)
+        running = {}  # type: Dict[Any, str]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while pending or running:
+                ready = [s for s in sorted(pending)
+                         if all(d in results for d in self.__dependencies[s])]
+                for name in ready:
+                    pending.remove(name)
+                    args = [results[d] for d in self.__dependencies[name]]
+                    future = executor.submit(self.__execute, name, args)
+                    running[future] = name
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        logger.exception("stage failed: %s", name)
+                        for other in running:
+                            other.cancel()
+                        raise
+        return results
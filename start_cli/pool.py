@@ -0,0 +1,221 @@
+__all__ = ['ContainerPool']
+
+from typing import Any, Dict, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+class ContainerPool(object):
+    """
+    Maintains a pool of idle, pre-started containers for a given snapshot so
+    that a container can be handed out as soon as it is requested, rather
+    than paying the cost of starting a new container each time.
+
+    Containers are mutated by the candidate patches that are evaluated
+    within them, and so each container is used once: when a container is
+    destroyed, it is destroyed in the background, and a fresh container is
+    started in the background to take its place in the pool. Idle containers
+    are health checked before they are handed out; unhealthy containers are
+    discarded and replaced. Containers that fail to start are replaced too,
+    after a delay that doubles with each consecutive failure.
+    """
+    RETRY_DELAY = 1.0
+    MAX_RETRY_DELAY = 60.0
+
+    def __init__(self,
+                 bz,                    # type: BugZoo
+                 snapshot,              # type: Snapshot
+                 size,                  # type: int
+                 health_check_timeout=10  # type: int
+                 ):                     # type: (...) -> None
+        self.__bz = bz
+        self.__snapshot = snapshot
+        self.__size = size
+        self.__health_check_timeout = health_check_timeout
+        self.__idle = queue.Queue()  # type: queue.Queue
+        self.__lock = threading.Lock()
+        self.__pending = 0
+        self.__handed_out = set()  # type: Set[str]
+        self.__failures = 0
+        self.__closed = threading.Event()
+        self.__base = None  # type: Optional[type]
+        self.__executor = ThreadPoolExecutor(max_workers=max(1, size))
+        self.stats = {'warm': 0, 'cold': 0, 'unhealthy': 0}  # type: Dict[str, int]  # noqa: pycodestyle
+
+    def __provision(self):
+        # type: () -> Container
+        assert self.__base
+        return self.__base.provision(self.__bz.containers, self.__snapshot)
+
+    def __destroy(self, uid):
+        # type: (str) -> None
+        assert self.__base
+        try:
+            self.__base.__delitem__(self.__bz.containers, uid)
+        except Exception:
+            logger.exception("failed to destroy container: %s", uid)
+
+    def __fill(self, delay=0.0):
+        # type: (float) -> None
+        if delay:
+            # containers that are waiting to be retried are not pending, and
+            # so threads do not wait on them
+            if self.__closed.wait(delay):
+                return
+            with self.__lock:
+                self.__pending += 1
+        try:
+            container = self.__provision()
+        except Exception:
+            logger.exception("failed to start container for pool")
+            container = None
+        with self.__lock:
+            self.__pending -= 1
+            if container is None:
+                self.__failures += 1
+            else:
+                self.__failures = 0
+        if container is not None and self.__closed.is_set():
+            self.__destroy(container.uid)
+            return
+        # None wakes up any thread that is waiting on the failed container
+        self.__idle.put(container)
+
+    def __replenish(self):
+        # type: () -> None
+        with self.__lock:
+            if self.__closed.is_set():
+                return
+            delay = 0.0
+            if self.__failures:
+                delay = min(self.MAX_RETRY_DELAY,
+                            self.RETRY_DELAY * 2 ** (self.__failures - 1))
+            else:
+                self.__pending += 1
+        if delay:
+            logger.debug("retrying container for pool in %.1f seconds", delay)
+        self.__executor.submit(self.__fill, delay)
+
+    def is_healthy(self, container):
+        # type: (Container) -> bool
+        try:
+            response = self.__bz.containers.command(
+                container, 'true', time_limit=self.__health_check_timeout)
+        except Exception:
+            return False
+        return response.code == 0
+
+    def acquire(self):
+        # type: () -> Container
+        """
+        Checks out a container from the pool. If the pool is empty, and no
+        containers are being started, a container is started on demand.
+        """
+        while True:
+            with self.__lock:
+                pending = self.__pending
+            try:
+                if pending:
+                    container = self.__idle.get()
+                else:
+                    container = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            # a container that failed to start is still replaced, so that
+            # the pool does not shrink
+            self.__replenish()
+            if container is None:
+                break
+            if self.is_healthy(container):
+                with self.__lock:
+                    self.__handed_out.add(container.uid)
+                    self.stats['warm'] += 1
+                logger.debug("checked out container from pool: %s",
+                             container.uid)
+                return container
+            logger.warning("discarding unhealthy container: %s",
+                           container.uid)
+            self.stats['unhealthy'] += 1
+            self.__executor.submit(self.__destroy, container.uid)
+
+        logger.debug("pool is empty: starting container on demand")
+        with self.__lock:
+            self.stats['cold'] += 1
+        container = self.__provision()
+        with self.__lock:
+            self.__handed_out.add(container.uid)
+        return container
+
+    def release(self, uid):
+        # type: (str) -> bool
+        """
+        Destroys a container that was checked out of this pool, in the
+        background.
+
+        Returns:
+            True if the container belonged to this pool, or False if not.
+        """
+        with self.__lock:
+            if uid not in self.__handed_out:
+                return False
+            self.__handed_out.remove(uid)
+        self.__executor.submit(self.__destroy, uid)
+        return True
+
+    def attach(self):
+        # type: () -> None
+        """
+        Extends the container manager of BugZoo so that containers for the
+        snapshot of this pool are checked out of (and returned to) the pool,
+        and starts filling the pool.
+        """
+        pool = self
+        containers = self.__bz.containers
+        base = self.__base = containers.__class__
+        name = self.__snapshot.name
+
+        # the container manager is shared with the search, and so its class,
+        # rather than the manager itself, must be extended
+        class PooledContainerManager(base):  # type: ignore
+            def provision(self, snapshot, *args, **kwargs):
+                # type: (Snapshot, *Any, **Any) -> Container
+                if args or kwargs or getattr(snapshot, 'name', None) != name:
+                    return base.provision(self, snapshot, *args, **kwargs)
+                return pool.acquire()
+
+            def __delitem__(self, uid):
+                # type: (str) -> None
+                if not pool.release(uid):
+                    base.__delitem__(self, uid)
+
+        containers.__class__ = PooledContainerManager
+        logger.info("starting pool of %d containers for snapshot: %s",
+                    self.__size, name)
+        for _ in range(self.__size):
+            self.__replenish()
+
+    def close(self):
+        # type: () -> None
+        """
+        Destroys the idle containers in this pool, waits for any outstanding
+        containers to be destroyed, and restores the container manager.
+        """
+        self.__closed.set()
+        self.__executor.shutdown(wait=True)
+        while True:
+            try:
+                container = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            if container is not None:
+                self.__destroy(container.uid)
+        if self.__base:
+            self.__bz.containers.__class__ = self.__base
+        logger.info("container pool: %d warm, %d cold, %d unhealthy",
+                    self.stats['warm'], self.stats['cold'],
+                    self.stats['unhealthy'])
@@ -0,0 +1,114 @@
+__all__ = ['HostProfile', 'apply_host_profile', 'DEFAULT_SPEEDUP']
+
+from typing import Any, Dict, Optional
+import json
+import logging
+import os
+import socket
+import time
+
+from .util import atomic_write, file_digest
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the speed-up factor that is used when a host has not been calibrated
+DEFAULT_SPEEDUP = 10
+
+
+class HostProfile(object):
+    """
+    Records the highest speed-up factor at which the missions of each
+    scenario behave as they do at the reference speed-up factor on this
+    host, as found by the calibrate command. Profiles are stored per host
+    name, so that a home directory shared between machines holds a separate
+    profile for each machine.
+    """
+    def __init__(self, fn):
+        # type: (str) -> None
+        self.__fn = fn
+        self.__scenarios = {}  # type: Dict[str, Dict[str, Any]]
+        if os.path.exists(fn):
+            try:
+                with open(fn, 'r') as f:
+                    self.__scenarios = json.load(f).get('scenarios', {})
+            except (IOError, OSError, ValueError):
+                logger.warning("ignoring malformed host profile: %s", fn)
+
+    @staticmethod
+    def default_file():
+        # type: () -> str
+        fn = os.environ.get('START_CLI_PROFILE')
+        if fn:
+            return fn
+        return os.path.expanduser(
+            '~/.start-cli/profiles/{}.json'.format(socket.gethostname()))
+
+    @staticmethod
+    def load():
+        # type: () -> HostProfile
+        return HostProfile(HostProfile.default_file())
+
+    @property
+    def filename(self):
+        # type: () -> str
+        return self.__fn
+
+    def speedup(self, fn_scenario=None):
+        # type: (Optional[str]) -> Optional[int]
+        """
+        Returns the calibrated speed-up factor for a given scenario. If that
+        scenario has not been calibrated, the lowest speed-up factor of any
+        calibrated scenario is returned instead, or None if no scenario has
+        been calibrated on this host.
+        """
+        if fn_scenario and os.path.isfile(fn_scenario):
+            entry = self.__scenarios.get(file_digest(fn_scenario))
+            if entry:
+                return entry['speedup']
+        if not self.__scenarios:
+            return None
+        return min(e['speedup'] for e in self.__scenarios.values())
+
+    def record(self, fn_scenario, speedup, results):
+        # type: (str, int, Dict[str, Any]) -> None
+        self.__scenarios[file_digest(fn_scenario)] = {
+            'scenario': os.path.abspath(fn_scenario),
+            'speedup': speedup,
+            'results': results,
+            'load': os.getloadavg()[0],
+            'cpus': os.cpu_count(),
+            'calibrated': time.time()}
+
+    def save(self):
+        # type: () -> None
+        os.makedirs(os.path.dirname(os.path.abspath(self.__fn)),
+                    exist_ok=True)
+        with atomic_write(self.__fn) as f:
+            json.dump({'host': socket.gethostname(),
+                       'scenarios': self.__scenarios}, f, indent=2)
+        logger.debug("saved host profile: %s", self.__fn)
+
+
+def apply_host_profile(app):
+    # type: (Any) -> None
+    """
+    Fills in the speed-up factor of any command that operates on a single
+    scenario and was not given one explicitly, using the profile of this
+    host. Registered as a post_argument_parsing hook. Commands that operate
+    on many scenarios leave the speed-up factor unset, so that it is
+    resolved separately for each scenario.
+    """
+    pargs = app.pargs
+    if getattr(pargs, 'speedup', DEFAULT_SPEEDUP) is not None:
+        return
+    fn_scenario = getattr(pargs, 'file', None)
+    if not fn_scenario:
+        return
+    speedup = HostProfile.load().speedup(fn_scenario)
+    if speedup is None:
+        speedup = DEFAULT_SPEEDUP
+    else:
+        logger.info("using calibrated speed-up factor for this host: %d",
+                    speedup)
+    pargs.speedup = speedup
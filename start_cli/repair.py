@@ -1,33 +1,101 @@
 __all__ = ['RepairController']
 
-from typing import List
+from typing import List, Optional, Callable, Dict, Any, Iterable, Iterator
 import logging
 import json
 import os
 import sys
-import docker
 import random
 
-import start_repair
-from start_repair import compute_coverage, Snapshot
-from kaskara.analysis import Analysis
-from darjeeling.problem import Problem
-from darjeeling.localization import Localization
-from darjeeling.transformation import Transformation
-from darjeeling.snippet import SnippetDatabase
-from darjeeling.candidate import Candidate
-from darjeeling.settings import Settings as RepairSettings
-from bugzoo.manager import BugZoo
-from bugzoo.util import indent
-from bugzoo.core.coverage import TestSuiteCoverage
-from start_core.scenario import Scenario
+import tabulate
 from cement.ext.ext_argparse import ArgparseController, expose
 
+from .imports import lazy_import
 from .opts import *
+from .cache import ArtifactCache
+from .pipeline import Pipeline
+from .stream import read_transformations, write_transformations
+from .database import TransformationDatabase, DATABASE_EXTENSIONS
+from .coverage import (compute_coverage_parallel, read_coverage,
+                       write_coverage, convert_coverage)
+from .analysis import analyze_incrementally
+from .snippets import build_snippets
+from .batch import Job, run_jobs, forward_options, expand_files, \
+    unique_names
+from .util import digest, file_digest
+from .sprt import SequentialTest, run_sequential, EXIT_CODES
+from .trace import Tracer, traced, writes_trace
+from .metrics import SearchMonitor
+from .checkpoint import Checkpoint
+from .outcome_cache import OutcomeCache
+from .patches import PatchWriter
+from .resident import resident, file_key
+from .pool import ContainerPool
+from .history import MissionHistory
+from .localization import localize, write_rankings
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
 
+# the dependencies of the repair component are only imported when a repair
+# command is executed
+start_repair = lazy_import('start_repair')
+compute_coverage = lazy_import('start_repair', 'compute_coverage')
+Snapshot = lazy_import('start_repair', 'Snapshot')
+Analysis = lazy_import('kaskara.analysis', 'Analysis')
+Problem = lazy_import('darjeeling.problem', 'Problem')
+Localization = lazy_import('darjeeling.localization', 'Localization')
+Transformation = lazy_import('darjeeling.transformation', 'Transformation')
+SnippetDatabase = lazy_import('darjeeling.snippet', 'SnippetDatabase')
+Candidate = lazy_import('darjeeling.candidate', 'Candidate')
+RepairSettings = lazy_import('darjeeling.settings', 'Settings')
+BugZoo = lazy_import('bugzoo.manager', 'BugZoo')
+indent = lazy_import('bugzoo.util', 'indent')
+TestSuiteCoverage = lazy_import('bugzoo.core.coverage', 'TestSuiteCoverage')
+Scenario = lazy_import('start_core.scenario', 'Scenario')
+DockerClient = lazy_import('docker', 'DockerClient')
+
+# the stages of the repair pipeline upon whose artifacts each stage depends
+STAGE_DEPENDENCIES = {
+    'coverage': [],
+    'localization': ['coverage'],
+    'analysis': ['localization'],
+    'snippets': ['analysis'],
+    'transformations': ['coverage', 'localization', 'analysis', 'snippets']
+}  # type: Dict[str, List[str]]
+
+# the repair options that affect the generation of transformations, and
+# hence the key of the transformations artifact; the seed and the
+# termination criterion only affect the search
+OPTS_TRANSFORMATIONS = [
+    OPT_CHECK_SCOPE,
+    OPT_CHECK_SYNTAX,
+    OPT_IGNORE_DEAD_CODE,
+    OPT_IGNORE_UNTYPED_RETURNS,
+    OPT_IGNORE_STRING_EQUIV_SNIPPETS,
+    OPT_IGNORE_EQUIV_PREPENDS,
+    OPT_IGNORE_DECLS,
+    OPT_ONLY_INSERT_EXECUTED,
+    OPT_NO_ORDERING
+]
+
+# the options that are forwarded to each scenario by the repair-batch command
+OPTS_REPAIR_JOB = [
+    OPT_LIMIT_CANDIDATES,
+    OPT_NUM_THREADS,
+    OPT_TIMEOUT,
+    OPT_TIMEOUT_REPAIR,
+    OPT_TIMEOUT_CONNECTION,
+    OPT_LIVENESS,
+    OPT_SPEEDUP,
+    OPT_CHECK_WAYPOINTS,
+    OPT_WORKAROUND,
+    OPT_DOCKER_CLIENT,
+    OPT_ON_PATCH,
+    OPT_POOL_SIZE,
+    OPT_FORMULA
+] + OPTS_REPAIR + OPTS_CACHE + OPTS_OUTCOME_CACHE
+
 
 class RepairController(ArgparseController):
     class Meta:
@@ -36,6 +104,11 @@ class RepairController(ArgparseController):
         stacked_on = 'base'
         stacked_type = 'embedded'
 
+    def _setup(self, app):
+        super()._setup(app)
+        self.__keys = {}  # type: Dict[str, str]
+        self.tracer = Tracer()
+
     def __load_scenario(self, filename):
         # type: (str) -> Scenario
         logger.info("loading scenario from file [%s]", filename)
@@ -54,12 +127,177 @@ class RepairController(ArgparseController):
         random.seed(seed)
         logger.debug("seeded RNG")
 
+    def snapshot_options(self):
+        # type: () -> Dict[str, Any]
+        pargs = self.app.pargs
+        return {'timeout_mission': pargs.timeout_mission,
+                'timeout_liveness': pargs.timeout_liveness,
+                'timeout_connection': pargs.timeout_connection,
+                'speedup': pargs.speedup,
+                'check_waypoints': pargs.check_waypoints,
+                'use_workaround': pargs.use_workaround}
+
+    def snapshot_fingerprint(self):
+        # type: () -> str
+        """
+        Computes a digest of the inputs that determine the snapshot under
+        repair, and hence the outcome of any candidate patch.
+        """
+        return digest(file_digest(self.app.pargs.file), self.snapshot_options())
+
+    def transformation_options(self):
+        # type: () -> Dict[str, Any]
+        options = {}  # type: Dict[str, Any]
+        for (flags, kwargs) in OPTS_TRANSFORMATIONS:
+            dest = kwargs.get('dest', flags[0].lstrip('-').replace('-', '_'))
+            options[dest] = getattr(self.app.pargs, dest)
+        return options
+
+    def obtain_cache(self):
+        # type: () -> Optional[ArtifactCache]
+        if self.app.pargs.no_cache:
+            return None
+        max_size = self.app.pargs.cache_max_size * 1024 * 1024
+        max_age = self.app.pargs.cache_max_age * 24 * 60 * 60
+        return ArtifactCache(self.app.pargs.cache_dir,
+                             max_size=max_size,
+                             max_age=max_age)
+
+    def image_id(self, snapshot):
+        # type: (Snapshot) -> Optional[str]
+        """
+        Returns the ID of the Docker image for a given snapshot, or None if
+        that image does not exist. The image is rebuilt whenever the source
+        code of the scenario changes, and so its ID changes with it.
+        """
+        version = self.app.pargs.docker_client
+        dkr = resident('docker', version,
+                       lambda: DockerClient(version=version))
+        try:
+            return dkr.images.get(snapshot.image).id
+        except Exception:
+            logger.warning("failed to determine ID of image: %s",
+                           snapshot.image)
+            return None
+
+    def artifact_key(self, stage, fn=None, snapshot=None):
+        # type: (str, Optional[str], Optional[Snapshot]) -> str
+        """
+        Computes a digest of the inputs to a given stage of the repair
+        pipeline. If the artifact for that stage is provided by a file, the
+        digest of the contents of that file is used instead. The key for
+        the coverage stage depends on the built image of the given snapshot.
+        """
+        if fn:
+            key = file_digest(fn)
+        elif stage == 'coverage':
+            assert snapshot is not None
+            key = digest(stage,
+                         file_digest(self.app.pargs.file),
+                         self.snapshot_options(),
+                         self.image_id(snapshot))
+        else:
+            params = {}  # type: Dict[str, Any]
+            if stage == 'snippets':
+                params = {'ignore_string_equiv_snippets':
+                          self.app.pargs.ignore_string_equiv_snippets}
+            elif stage == 'localization' and self.formula:
+                params = {'formula': self.formula}
+            elif stage == 'transformations':
+                params = self.transformation_options()
+            dependencies = [self.__keys[d] for d in STAGE_DEPENDENCIES[stage]]
+            key = digest(stage, dependencies, params)
+        self.__keys[stage] = key
+        return key
+
+    def find_artifact(self, stage, key):
+        # type: (str, str) -> Optional[str]
+        cache = self.obtain_cache()
+        if not cache:
+            return None
+        fn = cache.lookup(stage, key)
+        if fn:
+            logger.info("found cached %s artifact: %s", stage, fn)
+        self.tracer.annotate(cached=bool(fn))
+        return fn
+
+    def save_artifact(self, stage, key, write):
+        # type: (str, str, Callable[[str], None]) -> None
+        cache = self.obtain_cache()
+        if not cache:
+            return
+        logger.debug("caching %s artifact", stage)
+        inputs = {'scenario': os.path.abspath(self.app.pargs.file)}
+        try:
+            cache.store(stage, key, write, inputs=inputs)
+        except Exception:
+            logger.exception("failed to cache %s artifact", stage)
+            return
+        logger.debug("cached %s artifact", stage)
+
+    def obtain_outcome_cache(self):
+        # type: () -> Optional[OutcomeCache]
+        pargs = self.app.pargs
+        if pargs.no_cache:
+            return None
+        fn = pargs.outcome_cache \
+            or os.path.join(pargs.cache_dir, 'outcomes.sqlite')
+        return OutcomeCache(fn, max_size=pargs.outcome_cache_max_size * 1024 * 1024)
+
+    def obtain_checkpoint(self):
+        # type: () -> Optional[Checkpoint]
+        """
+        Returns the checkpoint for the search, or None if checkpointing has
+        been disabled. Unless the search is being resumed, any existing
+        checkpoint in the checkpoint directory is discarded.
+        """
+        pargs = self.app.pargs
+        if pargs.no_checkpoint and not pargs.resume:
+            return None
+        directory = pargs.resume or pargs.checkpoint \
+            or os.path.join(pargs.output, '.checkpoint')
+        checkpoint = Checkpoint(directory,
+                                self.snapshot_fingerprint(),
+                                interval=pargs.checkpoint_interval)
+        if not pargs.resume:
+            checkpoint.reset()
+        logger.info("checkpointing search to directory: %s", directory)
+        return checkpoint
+
+    @traced('bugzoo')
     def obtain_bugzoo(self, snapshot):
         # type: (Snapshot) -> BugZoo
-        bz = BugZoo(docker_client_api_version=self.app.pargs.docker_client)
-        bz.bugs.add(snapshot)
+        # exception classes must be resolved before they can be caught
+        from bugzoo.exceptions import BugAlreadyExists
+
+        docker_client = self.app.pargs.docker_client
+        bz = resident('bugzoo', docker_client,
+                      lambda: BugZoo(docker_client_api_version=docker_client))
+        try:
+            bz.bugs.add(snapshot)
+        except BugAlreadyExists:
+            # a resident BugZoo may hold a snapshot with the same name that
+            # was built with different options
+            logger.debug("replacing registered snapshot: %s", snapshot.name)
+            del bz.bugs[snapshot.name]
+            bz.bugs.add(snapshot)
         return bz
 
+    def obtain_container_pool(self, bz, snapshot):
+        # type: (BugZoo, Snapshot) -> Optional[ContainerPool]
+        """
+        Starts filling a pool of containers for a given snapshot, if a pool
+        size was given. The pool is closed when the command finishes.
+        """
+        size = self.app.pargs.pool_size
+        if not size:
+            return None
+        pool = ContainerPool(bz, snapshot, size)
+        pool.attach()
+        self.app.hook.register('pre_close', lambda app: pool.close())
+        return pool
+
+    @traced('problem')
     def obtain_problem(self, bz, snapshot, coverage, localization, analysis=None, settings=None):
         # type: (BugZoo, Snapshot) -> Problem
         return Problem(bz,
@@ -81,22 +319,43 @@ class RepairController(ArgparseController):
             ignore_string_equivalent_snippets=self.app.pargs.ignore_string_equiv_snippets,
             ignore_dead_code=self.app.pargs.ignore_dead_code)
 
+    @property
+    def formula(self):
+        # type: () -> Optional[str]
+        return getattr(self.app.pargs, 'formula', None)
+
+    def compute_localization(self, coverage):
+        # type: (TestSuiteCoverage) -> Localization
+        if not self.formula:
+            return start_repair.localize(coverage)
+        logger.debug("using suspiciousness formula: %s", self.formula)
+        return localize(coverage, self.formula)
+
+    @traced('localization')
     def obtain_localization(self, coverage):
         # type: (TestSuiteCoverage) -> Localization
         fn = self.app.pargs.localization
+        key = self.artifact_key('localization', fn)
+        if not fn:
+            fn = self.find_artifact('localization', key)
         if not fn:
             logger.info("no localization file provided")
             logger.info("computing fault localization")
-            localization = start_repair.localize(coverage)
+            localization = self.compute_localization(coverage)
             logger.info("computed fault localization:\n%s",
                         indent(repr(localization), 2))
+            self.save_artifact('localization', key, localization.to_file)
         else:
+            self.tracer.annotate(source=fn)
             logger.info("loading localization from file: %s", fn)
-            localization = Localization.from_file(fn)
+            localization = resident('localization', file_key(fn),
+                                    lambda: Localization.from_file(fn))
             logger.info("loaded localization from file:\n%s",
                         indent(repr(localization), 2))
+        self.tracer.annotate(num_lines=len(localization))
         return localization
 
+    @traced('transformations')
     def obtain_transformations(self,
                                problem,         # type: Problem
                                snapshot,        # type: Snapshot
@@ -105,9 +364,12 @@ class RepairController(ArgparseController):
                                snippets,        # type: SnippetDatabase
                                analysis,        # type: Analysis
                                settings         # type: RepairSettings
-                               ):               # type: (...) -> List[Transformation]
+                               ):               # type: (...) -> Iterable[Transformation]
         ordered = self.app.pargs.ordered
         fn = self.app.pargs.transformations
+        key = self.artifact_key('transformations', fn)
+        if not fn:
+            fn = self.find_artifact('transformations', key)
         if not fn:
             logger.info("no transformation database provided")
             logger.info("generating transformation database")
@@ -119,71 +381,182 @@ class RepairController(ArgparseController):
                                                            analysis,
                                                            settings,
                                                            ordered=ordered)
+            # the transformations are produced by a generator, and so must be
+            # materialised before they can be both cached and searched
+            if not self.app.pargs.no_cache:
+                transformations = list(transformations)
             logger.info("generated transformation database")
+            self.save_artifact(
+                'transformations', key,
+                lambda fn: self.write_transformations(transformations, fn))
+        elif TransformationDatabase.is_database(fn):
+            logger.info("fetching transformations for %d suspicious lines from database: %s",  # noqa: pycodestyle
+                        len(localization), fn)
+            def fetch(fn):
+                # type: (str) -> Iterator[Transformation]
+                # the database is closed once the transformations have been
+                # consumed, or the search has been abandoned
+                with TransformationDatabase(fn) as db:
+                    yield from db.transformations(lines=localization)
+            transformations = fetch(fn)
+            self.tracer.annotate(source=fn)
         else:
-            logger.info("loading transformation database: %s", fn)
-            # FIXME implement transformation database
-            with open(fn, 'r') as f:
-                jsn = json.load(f)
-            transformations = [Transformation.from_dict(d) for d in jsn]
-            logger.info("loaded transformation database (%d transformations)",
-                        len(transformations))
+            logger.info("streaming transformations from database: %s", fn)
+            self.tracer.annotate(source=fn)
+            transformations = read_transformations(fn)
         return transformations
 
+    def generate_coverage(self, snapshot, bz):
+        # type: (Snapshot, BugZoo) -> TestSuiteCoverage
+        """
+        Computes line coverage for a given snapshot. When more than one
+        thread is requested, the tests are distributed across that many
+        containers.
+        """
+        threads = self.app.pargs.threads
+        if threads > 1:
+            return compute_coverage_parallel(snapshot, bz, threads)
+        return compute_coverage(snapshot, bz)
+
+    @traced('coverage')
     def obtain_coverage(self, snapshot, bz):
         # type: (Snapshot, BugZoo) -> TestSuiteCoverage
         fn = self.app.pargs.coverage
+        key = self.artifact_key('coverage', fn, snapshot)
+        if not fn:
+            fn = self.find_artifact('coverage', key)
         if not fn:
             logger.info("no line coverage report provided")
             logger.info("generating line coverage report")
-            coverage = compute_coverage(snapshot, bz)
+            coverage = self.generate_coverage(snapshot, bz)
             logger.info("generated line coverage report")
+            self.save_artifact(
+                'coverage', key,
+                lambda fn: write_coverage(coverage, fn, binary=True))
         else:
             logger.info("loading line coverage report: %s", fn)
-            coverage = TestSuiteCoverage.from_file(fn)
+            self.tracer.annotate(source=fn)
+            coverage = resident('coverage', file_key(fn),
+                                lambda: read_coverage(fn))
             logger.info("loaded line coverage report")
+        self.tracer.annotate(num_tests=len(coverage))
         return coverage
 
+    def generate_snippets(self, snapshot, analysis, settings):
+        # type: (Snapshot, Analysis, RepairSettings) -> SnippetDatabase
+        """
+        Builds the snippet database for a given static analysis, using up to
+        one worker process per thread. When the artifact cache is enabled,
+        snippets are only extracted from those files whose analysis has
+        changed since they were last extracted.
+        """
+        return build_snippets(
+            analysis,
+            snapshot,
+            settings.ignore_string_equivalent_snippets,
+            workers=self.app.pargs.threads,
+            cache=self.obtain_cache())
+
+    @traced('snippets')
     def obtain_snippets(self, snapshot, analysis, settings):
         # type: (Snapshot, Analysis, RepairSettings) -> SnippetDatabase
         fn = self.app.pargs.snippets
+        key = self.artifact_key('snippets', fn)
+        if not fn:
+            fn = self.find_artifact('snippets', key)
         if not fn:
             logger.info("no snippet database provided")
             logger.info("generating snippet database")
-            snippets = SnippetDatabase.from_statements(
-                analysis.statements,
-                use_canonical_form=settings.ignore_string_equivalent_snippets)
+            snippets = self.generate_snippets(snapshot, analysis, settings)
             logger.info("generated snippet database: %d snippets",
                         len(snippets))
+            self.save_artifact('snippets', key, snippets.to_file)
+        elif TransformationDatabase.is_database(fn):
+            logger.info("loading snippets from transformation database: %s", fn)
+            self.tracer.annotate(source=fn)
+            def load():
+                # type: () -> SnippetDatabase
+                with TransformationDatabase(fn) as db:
+                    return db.snippets()
+            snippets = resident('snippets', file_key(fn), load)
+            logger.info("loaded snippet database: %d snippets", len(snippets))
         else:
             logger.info("loading provided snippet database: %s", fn)
-            snippets = SnippetDatabase.from_file(fn)
+            self.tracer.annotate(source=fn)
+            snippets = resident('snippets', file_key(fn),
+                                lambda: SnippetDatabase.from_file(fn))
             logger.info("loaded snippet database: %d snippets", len(snippets))
+        self.tracer.annotate(num_snippets=len(snippets))
         return snippets
 
-    def obtain_analysis(self, snapshot, files):
-        # type: (Snapshot, List[str]) -> Analysis
+    def generate_analysis(self, snapshot, bz, files):
+        # type: (Snapshot, BugZoo, List[str]) -> Analysis
+        """
+        Performs static analysis of a given set of files. When the artifact
+        cache is enabled, only those files that have changed since they were
+        last analyzed are analyzed, using up to one worker per thread.
+        """
+        cache = self.obtain_cache()
+        if not cache:
+            return start_repair.analyze(snapshot, files)
+        return analyze_incrementally(bz, snapshot, files, cache,
+                                     workers=self.app.pargs.threads)
+
+    @traced('analysis')
+    def obtain_analysis(self, snapshot, bz, files):
+        # type: (Snapshot, BugZoo, List[str]) -> Analysis
         fn = self.app.pargs.analysis
+        self.tracer.annotate(num_files=len(files))
+        key = self.artifact_key('analysis', fn)
+        if not fn:
+            fn = self.find_artifact('analysis', key)
         if not fn:
             logger.info("no static analysis provided")
             logger.info("performing static analysis")
-            analysis = start_repair.analyze(snapshot, files)
+            analysis = self.generate_analysis(snapshot, bz, files)
             logger.info("performed static analysis")
+            self.save_artifact('analysis', key,
+                               lambda fn: analysis.to_file(fn, snapshot))
         else:
             logger.info("loading provided static analysis: %s", fn)
-            analysis = Analysis.from_file(fn, snapshot)
+            self.tracer.annotate(source=fn)
+            analysis = resident('analysis',
+                                (file_key(fn), self.snapshot_fingerprint()),
+                                lambda: Analysis.from_file(fn, snapshot))
             logger.info("loaded static analysis")
         return analysis
 
+    def write_transformations(self, transformations, fn):
+        # type: (Iterable[Transformation], str) -> None
+        if fn.endswith(DATABASE_EXTENSIONS):
+            if os.path.exists(fn):
+                os.remove(fn)
+            with TransformationDatabase(fn) as db:
+                num_written = db.add_transformations(transformations)
+        else:
+            num_written = write_transformations(transformations, fn)
+        logger.debug("wrote %d transformations to file: %s", num_written, fn)
+
+    def write_snippets(self, snippets, fn):
+        # type: (SnippetDatabase, str) -> None
+        if fn.endswith(DATABASE_EXTENSIONS):
+            with TransformationDatabase(fn) as db:
+                db.add_snippets(snippets)
+        else:
+            snippets.to_file(fn)
+
+    @traced('snapshot')
     def obtain_snapshot(self):
         # type: () -> None
-        return self.__build_snapshot(self.app.pargs.file,
-                                     self.app.pargs.timeout_mission,
-                                     self.app.pargs.timeout_liveness,
-                                     self.app.pargs.timeout_connection,
-                                     self.app.pargs.speedup,
-                                     self.app.pargs.check_waypoints,
-                                     self.app.pargs.use_workaround)
+        key = self.snapshot_fingerprint()
+        return resident('snapshot', key, lambda: self.__build_snapshot(
+            self.app.pargs.file,
+            self.app.pargs.timeout_mission,
+            self.app.pargs.timeout_liveness,
+            self.app.pargs.timeout_connection,
+            self.app.pargs.speedup,
+            self.app.pargs.check_waypoints,
+            self.app.pargs.use_workaround))
 
     def __build_snapshot(self,
                          fn_scenario,           # type: str
@@ -213,6 +586,7 @@ class RepairController(ArgparseController):
                    OPT_LIMIT_CANDIDATES,
                    OPT_NUM_THREADS,
                    OPT_LOCALIZATION,
+                   OPT_FORMULA,
                    OPT_COVERAGE,
                    OPT_SNIPPETS,
                    OPT_TRANSFORMATIONS,
@@ -228,8 +602,13 @@ class RepairController(ArgparseController):
                    (['--output'],
                      {'help': 'output patch directory',
                       'default': 'patches',
-                      'type': str})
-                   ] + OPTS_REPAIR)
+                      'type': str}),
+                   OPT_ON_PATCH,
+                   OPT_POOL_SIZE,
+                   OPT_TRACE
+                   ] + OPTS_REPAIR + OPTS_CACHE + OPTS_OUTCOME_CACHE + OPTS_METRICS
+                     + OPTS_CHECKPOINT)
+    @writes_trace('repair')
     def repair(self):
         # type: () -> None
         logger.info("performing repair")
@@ -252,9 +631,11 @@ class RepairController(ArgparseController):
         settings = self.obtain_settings()
         snapshot = self.obtain_snapshot()
         bz = self.obtain_bugzoo(snapshot)
+        # the pool is filled while the remaining artifacts are obtained
+        self.obtain_container_pool(bz, snapshot)
         coverage = self.obtain_coverage(snapshot, bz)
         localization = self.obtain_localization(coverage)
-        analysis = self.obtain_analysis(snapshot, localization.files)
+        analysis = self.obtain_analysis(snapshot, bz, localization.files)
         problem = self.obtain_problem(bz, snapshot, coverage, localization, analysis, settings)
         snippets = self.obtain_snippets(snapshot, analysis, settings)
         transformations = self.obtain_transformations(problem,
@@ -277,18 +658,85 @@ class RepairController(ArgparseController):
                                        candidate_limit=candidate_limit,
                                        time_limit_mins=time_limit_mins)
 
+        # outcomes that were obtained by earlier runs on the same snapshot
+        # are reused
+        outcome_cache = self.obtain_outcome_cache()
+        if outcome_cache:
+            outcome_cache_stats = outcome_cache.attach(searcher,
+                                                       problem,
+                                                       self.snapshot_fingerprint())
+
+        # the RNG is restored to its state at the start of the checkpointed
+        # search, and the outcomes of evaluated candidates are reused
+        checkpoint = self.obtain_checkpoint()
+        if checkpoint:
+            if self.app.pargs.resume:
+                try:
+                    checkpoint.resume(searcher)
+                except ValueError as e:
+                    logger.error(str(e))
+                    sys.exit(1)
+            checkpoint.attach(searcher)
+
+        # the durations of passing tests determine the time limits of later
+        # runs
+        history = MissionHistory.load()
+        history.attach(searcher, self.app.pargs.file, self.app.pargs.speedup)
+
+        # each patch is written to disk as soon as it is found
+        writer = PatchWriter(dir_patches,
+                             problem,
+                             on_patch=self.app.pargs.on_patch,
+                             resume=bool(self.app.pargs.resume))
+
         logger.info("beginning search process")
-        patches = []  # type: List[Candidate]
-        if self.app.pargs.no_terminate_early:
-            logger.info("search will attempt to find as many patches as possible")
-            patches = list(searcher)
-        else:
+        terminate_early = not self.app.pargs.no_terminate_early
+        if terminate_early:
             logger.info("search will terminate on discovery of first plausible patch")
+        else:
+            logger.info("search will attempt to find as many patches as possible")
+        monitor = None  # type: Optional[SearchMonitor]
+        if self.app.pargs.metrics or self.app.pargs.metrics_prometheus:
+            monitor = SearchMonitor(searcher,
+                                    scenario=os.path.abspath(self.app.pargs.file),
+                                    interval=self.app.pargs.metrics_interval,
+                                    fn_jsonl=self.app.pargs.metrics,
+                                    fn_prom=self.app.pargs.metrics_prometheus)
+            monitor.start()
+        with self.tracer.span('search', threads=threads):
             try:
-                patches.append(next(searcher))
-            except StopIteration:
-                pass
-        if not patches:
+                for patch in searcher:
+                    self.tracer.instant('patch',
+                                        num_test_evals=searcher.num_test_evals,
+                                        num_candidate_evals=searcher.num_candidate_evals)
+                    if monitor:
+                        monitor.record_patch()
+                    if checkpoint:
+                        checkpoint.record_patch(patch)
+                    with self.tracer.span('write-patch'):
+                        writer.write(patch,
+                                     num_test_evals=searcher.num_test_evals,
+                                     num_candidate_evals=searcher.num_candidate_evals)
+                    if terminate_early:
+                        break
+            finally:
+                if monitor:
+                    monitor.stop()
+                if checkpoint:
+                    checkpoint.save()
+                if outcome_cache:
+                    logger.info("outcome cache: %d hits, %d misses",
+                                outcome_cache_stats['hits'],
+                                outcome_cache_stats['misses'])
+                    outcome_cache.prune(
+                        max_age=self.app.pargs.cache_max_age * 24 * 60 * 60)
+                    outcome_cache.close()
+                writer.close()
+                history.close()
+            self.tracer.annotate(num_patches=len(writer),
+                                 num_test_evals=searcher.num_test_evals,
+                                 num_candidate_evals=searcher.num_candidate_evals)
+        if not len(writer):
             logger.info("failed to find a patch")
 
         # report stats
@@ -296,34 +744,82 @@ class RepairController(ArgparseController):
         num_candidate_evals = searcher.num_candidate_evals
         time_running_mins = searcher.time_running.seconds / 60
 
-        logger.info("found %d plausible patches", len(patches))
+        logger.info("found %d plausible patches", len(writer))
         logger.info("time taken: %.2f minutes", time_running_mins)
         logger.info("# test evaluations: %d", searcher.num_test_evals)
         logger.info("# candidate evaluations: %d", searcher.num_candidate_evals)
 
         # if no patches are found, exit with code 1
-        if not patches:
+        if not len(writer):
             sys.exit(1)
 
-        # write patches to disk
-        for (num, patch) in enumerate(patches):
-            diff = str(patch.to_diff(problem))
-            fn_patch = "{}.diff".format(num)
-            fn_patch = os.path.join(dir_patches, fn_patch)
-            logger.debug("writing patch to %s", fn_patch)
-            try:
-                with open(fn_patch, 'w') as f:
-                    f.write(diff)
-            except Exception:
-                logger.exception("failed to write patch: %s", fn_patch)
-                raise
-            logger.debug("wrote patch to %s", fn_patch)
+    @expose(
+        help='attempts to repair many scenarios using a pool of worker processes',
+        arguments=[(['files'],
+                    {'help': 'paths to (or glob patterns for) scenario config files',
+                     'nargs': '+'}),
+                   OPT_WORKERS,
+                   (['--output'],
+                     {'help': 'output directory, containing a patch directory for each scenario',
+                      'default': 'patches',
+                      'type': str})
+                   ] + OPTS_REPAIR_JOB)
+    def repair_batch(self):
+        # type: () -> None
+        dir_out = self.app.pargs.output
+        threads = self.app.pargs.threads
+        workers = self.app.pargs.workers
+        if not workers:
+            workers = max(1, (os.cpu_count() or 1) // threads)
+
+        files = expand_files(self.app.pargs.files)
+        if not files:
+            logger.error("no scenario files provided")
+            sys.exit(1)
+        logger.info("repairing %d scenarios using %d workers (%d threads each)",
+                    len(files), workers, threads)
+
+        # each scenario is written to a subdirectory named after the
+        # directory that contains its config file
+        options = forward_options(self.app.pargs, OPTS_REPAIR_JOB)
+        names = unique_names([os.path.basename(os.path.dirname(os.path.abspath(fn)))  # noqa: pycodestyle
+                              for fn in files])
+        jobs = []  # type: List[Job]
+        for (fn_scenario, name) in zip(files, names):
+            dir_scenario = os.path.join(dir_out, name)
+            os.makedirs(dir_scenario, exist_ok=True)
+            args = ['repair', fn_scenario, '--output', dir_scenario] + options
+            fn_log = os.path.join(dir_scenario, 'repair.log')
+            jobs.append(Job(name, args, fn_log))
+
+        results = run_jobs(jobs, workers)
+
+        rows = []
+        for result in results:
+            dir_scenario = os.path.dirname(result.job.fn_log)
+            num_patches = len([fn for fn in os.listdir(dir_scenario)
+                               if fn.endswith('.diff')])
+            if result.returncode == 0:
+                status = 'repaired'
+            else:
+                status = 'failed (exit code {})'.format(result.returncode)
+            rows.append((result.job.name,
+                         status,
+                         num_patches,
+                         "{:.2f}".format(result.duration / 60)))
+        print(tabulate.tabulate(
+            rows, headers=['Scenario', 'Status', 'Patches', 'Time (mins)']))
+
+        if any(result.returncode != 0 for result in results):
+            sys.exit(1)
 
     @expose(
         help='builds the snippet database for a given scenario.',
         arguments=[OPT_FILE,
+                   OPT_NUM_THREADS,
                    OPT_COVERAGE,
                    OPT_LOCALIZATION,
+                   OPT_FORMULA,
                    OPT_SNIPPETS,
                    OPT_ANALYSIS,
                    OPT_TIMEOUT,
@@ -337,7 +833,7 @@ class RepairController(ArgparseController):
                      {'help': 'output file for snippet database',
                       'default': 'snippets.json',
                       'type': str})
-                   ] + OPTS_REPAIR)
+                   ] + OPTS_REPAIR + OPTS_CACHE)
     def snippets(self):
         # type: () -> None
         fn_out = self.app.pargs.output
@@ -348,17 +844,17 @@ class RepairController(ArgparseController):
         bz = self.obtain_bugzoo(snapshot)
         coverage = self.obtain_coverage(snapshot, bz)
         localization = self.obtain_localization(coverage)
-        analysis = self.obtain_analysis(snapshot, localization.files)
+        analysis = self.obtain_analysis(snapshot, bz, localization.files)
 
         logger.info("building snippet database for a given scenario")
-        snippets = SnippetDatabase.from_statements(
-                analysis.statements,
-                use_canonical_form=settings.ignore_string_equivalent_snippets)
+        snippets = self.generate_snippets(snapshot, analysis, settings)
         logger.info("built snippet database for a given scenario")
+        self.save_artifact('snippets', self.artifact_key('snippets'),
+                           snippets.to_file)
 
         logger.info("saving snippet database to file: %s", fn_out)
         try:
-            snippets.to_file(fn_out)
+            self.write_snippets(snippets, fn_out)
         except Exception:
             logger.exception("failed to save snippet database file: %s", fn_out)  # noqa: pycodestyle
             raise
@@ -367,8 +863,10 @@ class RepairController(ArgparseController):
     @expose(
         help='precomputes the set of transformations for a given scenario.',
         arguments=[OPT_FILE,
+                   OPT_NUM_THREADS,
                    OPT_COVERAGE,
                    OPT_LOCALIZATION,
+                   OPT_FORMULA,
                    OPT_SNIPPETS,
                    OPT_ANALYSIS,
                    OPT_TIMEOUT,
@@ -380,9 +878,9 @@ class RepairController(ArgparseController):
                    OPT_DOCKER_CLIENT,
                    (['--output'],
                      {'help': 'output file for transformation database',
-                      'default': 'transformations.json',
+                      'default': 'transformations.jsonl',
                       'type': str})
-                   ] + OPTS_REPAIR)
+                   ] + OPTS_REPAIR + OPTS_CACHE)
     def transformations(self):
         # type: () -> None
         fn_out = self.app.pargs.output
@@ -394,26 +892,31 @@ class RepairController(ArgparseController):
         bz = self.obtain_bugzoo(snapshot)
         coverage = self.obtain_coverage(snapshot, bz)
         localization = self.obtain_localization(coverage)
-        analysis = self.obtain_analysis(snapshot, localization.files)
+        analysis = self.obtain_analysis(snapshot, bz, localization.files)
         snippets = self.obtain_snippets(snapshot, analysis, settings)
         problem = self.obtain_problem(bz, snapshot, coverage, localization, analysis, settings)
 
         logger.info("precomputing transformations for scenario")
-        transformations = start_repair.transformations(problem,
-                                                       snapshot,
-                                                       coverage,
-                                                       localization,
-                                                       snippets,
-                                                       analysis,
-                                                       settings,
-                                                       ordered=ordered)
+        # the transformations are written to both the cache and the output
+        # file, and so the generator that produces them is consumed once
+        transformations = list(start_repair.transformations(problem,
+                                                            snapshot,
+                                                            coverage,
+                                                            localization,
+                                                            snippets,
+                                                            analysis,
+                                                            settings,
+                                                            ordered=ordered))
         logger.info("finished precomputing transformations")
+        self.save_artifact(
+            'transformations', self.artifact_key('transformations'),
+            lambda fn: self.write_transformations(transformations, fn))
 
         logger.info("writing precomputed transformations to disk: %s", fn_out)
         try:
-            jsn = [t.to_dict() for t in transformations]
-            with open(fn_out, 'w') as f:
-                json.dump(jsn, f)
+            self.write_transformations(transformations, fn_out)
+            if fn_out.endswith(DATABASE_EXTENSIONS):
+                self.write_snippets(snippets, fn_out)
         except Exception:
             logger.exception("failed to save precomputed transformations to disk")
         logger.info("saved precomputed transformations to disk: %s", fn_out)
@@ -421,8 +924,10 @@ class RepairController(ArgparseController):
     @expose(
         help='performs static analysis of a given scenario.',
         arguments=[OPT_FILE,
+                   OPT_NUM_THREADS,
                    OPT_COVERAGE,
                    OPT_LOCALIZATION,
+                   OPT_FORMULA,
                    OPT_SNIPPETS,
                    OPT_ANALYSIS,
                    OPT_TIMEOUT,
@@ -436,7 +941,7 @@ class RepairController(ArgparseController):
                      {'help': 'output file for static analysis',
                       'default': 'analysis.json',
                       'type': str})
-                   ])
+                   ] + OPTS_CACHE)
     def analyze(self):
         # type: () -> None
         fn_scenario = self.app.pargs.file
@@ -447,14 +952,18 @@ class RepairController(ArgparseController):
         bz = self.obtain_bugzoo(snapshot)
         coverage = self.obtain_coverage(snapshot, bz)
         localization = self.obtain_localization(coverage)
-        analysis = start_repair.analyze(snapshot, localization.files)
+        analysis = self.generate_analysis(snapshot, bz, localization.files)
+        self.save_artifact('analysis', self.artifact_key('analysis'),
+                           lambda fn: analysis.to_file(fn, snapshot))
         analysis.to_file(fn_out, snapshot)
         logger.info("saved static analysis to disk: %s", fn_out)
 
     @expose(
         help='computes fault localization from a line coverage report.',
         arguments=[OPT_FILE,
+                   OPT_NUM_THREADS,
                    OPT_COVERAGE,
+                   OPT_FORMULA,
                    OPT_TIMEOUT,
                    OPT_TIMEOUT_CONNECTION,
                    OPT_LIVENESS,
@@ -465,8 +974,11 @@ class RepairController(ArgparseController):
                    (['--output'],
                      {'help': 'output file to write results to.',
                       'default': 'localization.json',
+                      'type': str}),
+                   (['--rankings'],
+                     {'help': 'also writes the rankings of suspicious lines for every formula to a given file.',
                       'type': str})
-                   ])
+                   ] + OPTS_CACHE)
     def localize(self):
         # type: () -> None
         fn_coverage = self.app.pargs.file
@@ -476,15 +988,26 @@ class RepairController(ArgparseController):
         coverage = self.obtain_coverage(snapshot, bz)
 
         logger.info("computing fault localization")
-        localization = start_repair.localize(coverage)
+        localization = self.compute_localization(coverage)
+        self.save_artifact('localization', self.artifact_key('localization'),
+                           localization.to_file)
         print(localization)
         logger.info('writing line coverage report to file: %s', fn_out)
         localization.to_file(fn_out)
         logger.info('wrote line coverage report to file: %s', fn_out)
 
+        fn_rankings = self.app.pargs.rankings
+        if fn_rankings:
+            logger.info('writing rankings for all formulas to file: %s',
+                        fn_rankings)
+            write_rankings(coverage, fn_rankings)
+            logger.info('wrote rankings for all formulas to file: %s',
+                        fn_rankings)
+
     @expose(
         help='computes line coverage for a given scenario.',
         arguments=[OPT_FILE,
+                   OPT_NUM_THREADS,
                    OPT_TIMEOUT,
                    OPT_TIMEOUT_CONNECTION,
                    OPT_LIVENESS,
@@ -493,10 +1016,10 @@ class RepairController(ArgparseController):
                    OPT_WORKAROUND,
                    OPT_DOCKER_CLIENT,
                    (['--output'],
-                     {'help': 'output file to coverage report',
+                     {'help': 'output file to coverage report (written in the compact binary format if it ends in .cov)',
                       'default': 'coverage.json',
                       'type': str})
-                   ])
+                   ] + OPTS_CACHE)
     def coverage(self):
         # type: () -> None
         fn_scenario = self.app.pargs.file
@@ -505,17 +1028,130 @@ class RepairController(ArgparseController):
         logger.info("performing fault localization for scenario")
         snapshot = self.obtain_snapshot()
         bz = self.obtain_bugzoo(snapshot)
-        cov = compute_coverage(snapshot, bz)
+        cov = self.generate_coverage(snapshot, bz)
+        self.save_artifact('coverage',
+                           self.artifact_key('coverage', snapshot=snapshot),
+                           lambda fn: write_coverage(cov, fn, binary=True))
 
         logger.info("saving coverage to disk: %s", fn_out)
-        jsn = cov.to_dict()
-        with open(fn_out, 'w') as f:
-            json.dump(jsn, f)
+        write_coverage(cov, fn_out)
         logger.info("saved coverage to disk: %s", fn_out)
 
         logger.info("Coverage:\n%s", cov)
         logger.info("saved fault localization to disk: %s", fn_out)
 
+    @expose(
+        help='converts a line coverage report between the JSON and compact binary formats.',
+        arguments=[(['input'],
+                    {'help': 'path to a line coverage report, in either format.'}),
+                   (['output'],
+                    {'help': 'output file (written in the compact binary format if it ends in .cov, and as JSON otherwise).'})])
+    def convert_coverage(self):
+        # type: () -> None
+        fn_in = self.app.pargs.input
+        fn_out = self.app.pargs.output
+        logger.info("converting line coverage report: %s -> %s",
+                    fn_in, fn_out)
+        try:
+            convert_coverage(fn_in, fn_out)
+        except Exception:
+            logger.exception("failed to convert line coverage report")
+            raise
+        logger.info("converted line coverage report: %s (%d bytes) -> %s (%d bytes)",
+                    fn_in, os.path.getsize(fn_in),
+                    fn_out, os.path.getsize(fn_out))
+
+    @expose(
+        help='precomputes all repair artifacts for a given scenario in a single pass.',
+        arguments=[OPT_FILE,
+                   OPT_NUM_THREADS,
+                   OPT_COVERAGE,
+                   OPT_LOCALIZATION,
+                   OPT_FORMULA,
+                   OPT_SNIPPETS,
+                   OPT_TRANSFORMATIONS,
+                   OPT_ANALYSIS,
+                   OPT_TIMEOUT,
+                   OPT_TIMEOUT_CONNECTION,
+                   OPT_LIVENESS,
+                   OPT_SPEEDUP,
+                   OPT_CHECK_WAYPOINTS,
+                   OPT_WORKAROUND,
+                   OPT_DOCKER_CLIENT,
+                   (['--output'],
+                     {'help': 'output directory for repair artifacts',
+                      'default': 'artifacts',
+                      'type': str}),
+                   OPT_TRACE
+                   ] + OPTS_REPAIR + OPTS_CACHE)
+    @writes_trace('prepare')
+    def prepare(self):
+        # type: () -> None
+        dir_out = self.app.pargs.output
+        threads = self.app.pargs.threads
+        logger.debug("ensuring artifact directory exists: %s", dir_out)
+        os.makedirs(dir_out, exist_ok=True)
+
+        def output(fn):
+            # type: (str) -> str
+            return os.path.join(dir_out, fn)
+
+        def save(name, write):
+            # type: (str, Callable[[str], None]) -> None
+            fn = output(name)
+            logger.info("saving artifact to disk: %s", fn)
+            with self.tracer.span('save', file=fn):
+                write(fn)
+            logger.info("saved artifact to disk: %s", fn)
+
+        # the snapshot and BugZoo instance are shared by all stages
+        self.seed_rng()
+        settings = self.obtain_settings()
+        snapshot = self.obtain_snapshot()
+        bz = self.obtain_bugzoo(snapshot)
+
+        pipeline = Pipeline()
+        pipeline.stage('coverage',
+                       lambda: self.obtain_coverage(snapshot, bz))
+        pipeline.stage('localization',
+                       self.obtain_localization,
+                       ['coverage'])
+        pipeline.stage('analysis',
+                       lambda l: self.obtain_analysis(snapshot, bz, l.files),
+                       ['localization'])
+        pipeline.stage('snippets',
+                       lambda a: self.obtain_snippets(snapshot, a, settings),
+                       ['analysis'])
+        pipeline.stage('problem',
+                       lambda c, l, a: self.obtain_problem(bz, snapshot, c, l, a, settings),
+                       ['coverage', 'localization', 'analysis'])
+        pipeline.stage('transformations',
+                       lambda p, c, l, s, a: self.obtain_transformations(p, snapshot, c, l, s, a, settings),
+                       ['problem', 'coverage', 'localization', 'snippets', 'analysis'])
+
+        # each artifact is written to disk while later stages are running
+        pipeline.stage('save-coverage',
+                       lambda c: save('coverage.json', lambda fn: write_coverage(c, fn)),
+                       ['coverage'])
+        pipeline.stage('save-localization',
+                       lambda l: save('localization.json', l.to_file),
+                       ['localization'])
+        pipeline.stage('save-analysis',
+                       lambda a: save('analysis.json', lambda fn: a.to_file(fn, snapshot)),
+                       ['analysis'])
+        pipeline.stage('save-snippets',
+                       lambda s: save('snippets.json', s.to_file),
+                       ['snippets'])
+        pipeline.stage('save-transformations',
+                       lambda t: save('transformations.jsonl', lambda fn: self.write_transformations(t, fn)),
+                       ['transformations'])
+
+        logger.info("preparing repair artifacts for scenario")
+        pipeline.run(workers=max(threads, 2))
+        logger.info("prepared repair artifacts for scenario: %s", dir_out)
+        for (stage, duration) in sorted(pipeline.durations.items()):
+            logger.info("* %s: %.2f seconds", stage, duration)
+
     @expose(
         help='ensures that a scenario produces an expected set of test outcomes',
         arguments=[OPT_FILE,
@@ -525,7 +1161,7 @@ class RepairController(ArgparseController):
                    OPT_SPEEDUP,
                    OPT_CHECK_WAYPOINTS,
                    OPT_WORKAROUND,
-                   OPT_DOCKER_CLIENT])
+                   OPT_DOCKER_CLIENT] + OPTS_SEQUENTIAL)
     def validate(self):
         # type: () -> None
         fn_scenario = self.app.pargs.file
@@ -542,6 +1178,25 @@ class RepairController(ArgparseController):
                                          speedup,
                                          check_waypoints,
                                          use_workaround)
-        logger.info("validating scenario")
-        start_repair.validate(snapshot, verbose=self.app.pargs.verbose)
-        logger.info("validated scenario")
+        if not self.app.pargs.sequential:
+            logger.info("validating scenario")
+            start_repair.validate(snapshot, verbose=self.app.pargs.verbose)
+            logger.info("validated scenario")
+            return
+
+        # a validation run fails by raising an exception (or returning False)
+        def trial():
+            # type: () -> bool
+            try:
+                valid = start_repair.validate(snapshot,
+                                              verbose=self.app.pargs.verbose)
+            except Exception:
+                logger.exception("scenario failed validation")
+                return False
+            return valid is not False
+
+        logger.info("validating scenario sequentially")
+        sprt = SequentialTest.from_args(self.app.pargs)
+        decision = run_sequential(trial, sprt)
+        logger.info("validation outcome: %s", sprt)
+        sys.exit(EXIT_CODES[decision])
@@ -0,0 +1,82 @@
+__all__ = ['resident', 'enable', 'is_enabled', 'clear', 'stats', 'file_key']
+
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+_lock = threading.RLock()
+_objects = OrderedDict()  # type: OrderedDict[Tuple[str, Hashable], Any]
+_stats = {'hits': 0, 'misses': 0}  # type: Dict[str, int]
+_max_entries = None  # type: Optional[int]
+
+
+def enable(max_entries=32):
+    # type: (int) -> None
+    """
+    Allows expensive objects (e.g., Docker clients, snapshots and loaded
+    artifacts) to be kept resident and reused across commands within this
+    process. Used by the daemon; ordinary CLI invocations construct each
+    object afresh.
+
+    Parameters:
+        max_entries: the maximum number of resident objects; the least
+            recently used objects are discarded beyond this limit.
+    """
+    global _max_entries
+    _max_entries = max_entries
+
+
+def is_enabled():
+    # type: () -> bool
+    return _max_entries is not None
+
+
+def clear():
+    # type: () -> None
+    with _lock:
+        _objects.clear()
+
+
+def stats():
+    # type: () -> Dict[str, int]
+    with _lock:
+        return dict(_stats, entries=len(_objects))
+
+
+def file_key(fn):
+    # type: (str) -> Tuple[str, int, int]
+    """
+    Identifies the current version of a given file, without reading it.
+    """
+    st = os.stat(fn)
+    return (os.path.abspath(fn), st.st_size, st.st_mtime_ns)
+
+
+def resident(kind, key, factory):
+    # type: (str, Hashable, Callable[[], Any]) -> Any
+    """
+    Returns the resident object of a given kind with a given key, if there
+    is one, or else constructs it using a given factory and, if residency
+    has been enabled, keeps it resident.
+    """
+    if not is_enabled():
+        return factory()
+    with _lock:
+        ident = (kind, key)
+        if ident in _objects:
+            _objects.move_to_end(ident)
+            _stats['hits'] += 1
+            logger.debug("reusing resident %s: %s", kind, key)
+            return _objects[ident]
+        _stats['misses'] += 1
+        obj = factory()
+        _objects[ident] = obj
+        while len(_objects) > _max_entries:
+            (evicted, _) = _objects.popitem(last=False)
+            logger.debug("discarding resident %s: %s", *evicted)
+        return obj
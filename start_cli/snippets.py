@@ -0,0 +1,147 @@
+__all__ = ['build_snippets']
+
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib
+import json
+import logging
+
+from .analysis import split_analysis
+from .cache import ArtifactCache
+from .imports import lazy_import
+from .util import digest
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Statement = lazy_import('kaskara.statements', 'Statement')
+Snippet = lazy_import('darjeeling.snippet', 'Snippet')
+SnippetDatabase = lazy_import('darjeeling.snippet', 'SnippetDatabase')
+
+# the name of the cache stage used to store the snippets of each file
+STAGE = 'snippets-file'
+
+
+def extractor_version():
+    # type: () -> str
+    return importlib.import_module('darjeeling.version').__version__
+
+
+def extract_snippets(statements, snapshot, use_canonical_form):
+    # type: (List[Dict[str, Any]], Snapshot, bool) -> List[Tuple[str, Dict[str, Any]]]  # noqa: pycodestyle
+    """
+    Extracts the snippets for a given list of dictionary-based statement
+    descriptions, belonging to a single file of a given snapshot. Executed
+    by worker processes.
+
+    Returns:
+        the hash of the content and the dictionary-based description of
+        each distinct snippet, in the order in which they were first seen.
+    """
+    db = SnippetDatabase.from_statements(
+        [Statement.from_dict(d, snapshot) for d in statements],
+        use_canonical_form=use_canonical_form)
+    snippets = []  # type: List[Tuple[str, Dict[str, Any]]]
+    for snippet in db:
+        d = snippet.to_dict()
+        content_hash = hashlib.sha1(d['content'].encode('utf-8')).hexdigest()
+        snippets.append((content_hash, d))
+    return snippets
+
+
+def _extract_file(args):
+    # type: (Tuple[List[Dict[str, Any]], Snapshot, bool]) -> List[Tuple[str, Dict[str, Any]]]  # noqa: pycodestyle
+    return extract_snippets(*args)
+
+
+def merge_snippets(shards):
+    # type: (List[List[Tuple[str, Dict[str, Any]]]]) -> Dict[str, Dict[str, Any]]  # noqa: pycodestyle
+    """
+    Merges the snippets extracted from each file, using the hash of their
+    content to identify duplicates. The origins of duplicate snippets are
+    combined.
+    """
+    index = {}  # type: Dict[str, Dict[str, Any]]
+    for shard in shards:
+        for (content_hash, d) in shard:
+            existing = index.get(content_hash)
+            if existing is None:
+                index[content_hash] = d
+                continue
+            locations = d.get('locations')
+            if isinstance(locations, list) \
+               and isinstance(existing.get('locations'), list):
+                for location in locations:
+                    if location not in existing['locations']:
+                        existing['locations'].append(location)
+    return index
+
+
+def build_snippets(analysis,            # type: Analysis
+                   snapshot,            # type: Snapshot
+                   use_canonical_form,  # type: bool
+                   workers=1,           # type: int
+                   cache=None           # type: Optional[ArtifactCache]
+                   ):                   # type: (...) -> SnippetDatabase
+    """
+    Builds the snippet database for a given static analysis. The statements
+    of each source file are processed separately, using up to a given number
+    of worker processes, and the resulting snippets are merged. When a cache
+    is given, the snippets of each file are reused for as long as the
+    analysis of that file is unchanged.
+    """
+    fragments = split_analysis(analysis.to_dict(snapshot))
+    files = sorted(fragments)
+    version = extractor_version()
+    keys = {fn: digest(STAGE, version, use_canonical_form,
+                       fragments[fn]['statements'])
+            for fn in files}  # type: Dict[str, str]
+
+    shards = {}  # type: Dict[str, List[Tuple[str, Dict[str, Any]]]]
+    if cache:
+        for fn in files:
+            fn_shard = cache.lookup(STAGE, keys[fn])
+            if fn_shard:
+                with open(fn_shard, 'r') as f:
+                    shards[fn] = [tuple(e) for e in json.load(f)]  # type: ignore  # noqa: pycodestyle
+    missing = [fn for fn in files if fn not in shards]
+    logger.info("reusing cached snippets for %d of %d files",
+                len(files) - len(missing), len(files))
+
+    if missing:
+        tasks = [(fragments[fn]['statements'], snapshot, use_canonical_form)
+                 for fn in missing]
+        workers = max(1, min(workers, len(missing)))
+        logger.info("extracting snippets from %d files using %d workers",
+                    len(missing), workers)
+        if workers == 1:
+            results = [_extract_file(task) for task in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_extract_file, tasks,
+                                            chunksize=chunksize))
+        for (fn, shard) in zip(missing, results):
+            shards[fn] = shard
+            if cache:
+                def write(fn_out, shard=shard):
+                    # type: (str, List[Tuple[str, Dict[str, Any]]]) -> None
+                    with open(fn_out, 'w') as f:
+                        json.dump(shard, f)
+                try:
+                    cache.store(STAGE, keys[fn], write, inputs={'file': fn},
+                                prune=False)
+                except Exception:
+                    logger.exception("failed to cache snippets for file: %s",
+                                     fn)
+        if cache:
+            try:
+                cache.prune()
+            except Exception:
+                logger.exception("failed to prune artifact cache")
+
+    index = merge_snippets([shards[fn] for fn in files])
+    logger.debug("merged %d distinct snippets from %d files",
+                 len(index), len(files))
+    return SnippetDatabase([Snippet.from_dict(d) for d in index.values()])
@@ -0,0 +1,183 @@
+__all__ = ['SequentialTest', 'run_sequential', 'EXIT_CODES']
+
+from typing import Any, Callable, Dict, Optional
+import logging
+import math
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+PASS = 'pass'
+FAIL = 'fail'
+FLAKY = 'flaky'
+INCONCLUSIVE = 'inconclusive'
+
+# the exit code that is used to report each decision
+EXIT_CODES = {PASS: 0, FAIL: 1, FLAKY: 2, INCONCLUSIVE: 3}  # type: Dict[str, int]
+
+
+class _SPRT(object):
+    """
+    Wald's sequential probability ratio test between two hypotheses about
+    the success probability of a Bernoulli trial: H0 (p = p0) and H1 (p = p1).
+    """
+    def __init__(self, p0, p1, alpha, beta):
+        # type: (float, float, float, float) -> None
+        self.__llr_success = math.log(p1 / p0)
+        self.__llr_failure = math.log((1 - p1) / (1 - p0))
+        self.__upper = math.log((1 - beta) / alpha)
+        self.__lower = math.log(beta / (1 - alpha))
+        self.llr = 0.0
+
+    def record(self, success):
+        # type: (bool) -> None
+        self.llr += self.__llr_success if success else self.__llr_failure
+
+    @property
+    def accepts_h1(self):
+        # type: () -> bool
+        return self.llr >= self.__upper
+
+    @property
+    def accepts_h0(self):
+        # type: () -> bool
+        return self.llr <= self.__lower
+
+
+def _confidence(llr):
+    # type: (float) -> float
+    """
+    Converts a log-likelihood ratio into the probability of the favoured
+    hypothesis, assuming equal prior probabilities.
+    """
+    return 1.0 / (1.0 + math.exp(-llr))
+
+
+class SequentialTest(object):
+    """
+    Classifies the outcome of a repeatedly executed, nondeterministic check
+    as consistently passing, consistently failing, or flaky, using as few
+    executions as possible.
+
+    Two sequential probability ratio tests are run side by side: one tests
+    whether the pass rate is high (1 - indifference) rather than even (0.5),
+    and the other tests whether it is low (indifference) rather than even.
+    """
+    def __init__(self,
+                 alpha=0.05,            # type: float
+                 beta=0.05,             # type: float
+                 indifference=0.1,      # type: float
+                 min_runs=3,            # type: int
+                 max_runs=30            # type: int
+                 ):                     # type: (...) -> None
+        """
+        Parameters:
+            alpha: the maximum probability of wrongly accepting a
+                consistent outcome (i.e., a type I error).
+            beta: the maximum probability of wrongly rejecting a consistent
+                outcome (i.e., a type II error).
+            indifference: the failure rate (or pass rate) below which an
+                outcome is considered to be consistent.
+            min_runs: the minimum number of executions.
+            max_runs: the maximum number of executions, after which the
+                outcome is considered to be inconclusive.
+        """
+        assert 0.0 < indifference < 0.5
+        assert 0 < min_runs <= max_runs
+        self.__test_pass = _SPRT(0.5, 1.0 - indifference, alpha, beta)
+        self.__test_fail = _SPRT(0.5, indifference, alpha, beta)
+        self.__min_runs = min_runs
+        self.__max_runs = max_runs
+        self.runs = 0
+        self.passes = 0
+
+    @staticmethod
+    def from_args(args):
+        # type: (Any) -> SequentialTest
+        """
+        Constructs a sequential test from a set of parsed command-line
+        arguments (see OPTS_SEQUENTIAL).
+        """
+        return SequentialTest(alpha=args.alpha,
+                              beta=args.beta,
+                              indifference=args.indifference,
+                              min_runs=args.min_runs,
+                              max_runs=args.max_runs)
+
+    def record(self, passed):
+        # type: (bool) -> None
+        self.runs += 1
+        if passed:
+            self.passes += 1
+        self.__test_pass.record(passed)
+        self.__test_fail.record(passed)
+
+    @property
+    def decision(self):
+        # type: () -> Optional[str]
+        """
+        The outcome that has been decided upon, or None if more executions
+        are required before an outcome can be decided.
+        """
+        if self.runs < self.__min_runs:
+            return None
+        if self.__test_pass.accepts_h1:
+            return PASS
+        if self.__test_fail.accepts_h1:
+            return FAIL
+        if self.__test_pass.accepts_h0 and self.__test_fail.accepts_h0:
+            return FLAKY
+        if self.runs >= self.__max_runs:
+            return INCONCLUSIVE
+        return None
+
+    @property
+    def confidence(self):
+        # type: () -> Optional[float]
+        """
+        The confidence in the current decision, given as the probability of
+        the accepted hypothesis relative to its alternative.
+        """
+        decision = self.decision
+        if decision == PASS:
+            return _confidence(self.__test_pass.llr)
+        if decision == FAIL:
+            return _confidence(self.__test_fail.llr)
+        if decision == FLAKY:
+            return min(_confidence(-self.__test_pass.llr),
+                       _confidence(-self.__test_fail.llr))
+        return None
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {'decision': self.decision,
+                'confidence': self.confidence,
+                'runs': self.runs,
+                'passes': self.passes}
+
+    def __str__(self):
+        # type: () -> str
+        confidence = self.confidence
+        s = "{} ({}/{} runs passed".format(self.decision or 'undecided',
+                                          self.passes,
+                                          self.runs)
+        if confidence is not None:
+            s += "; confidence: {:.4f}".format(confidence)
+        return s + ")"
+
+
+def run_sequential(trial, test):
+    # type: (Callable[[], bool], SequentialTest) -> str
+    """
+    Repeatedly executes a given trial until the given sequential test reaches
+    a decision.
+
+    Returns:
+        the decision that was reached.
+    """
+    while test.decision is None:
+        passed = trial()
+        test.record(passed)
+        logger.info("run #%d %s: %s",
+                    test.runs, 'passed' if passed else 'failed', test)
+    return test.decision
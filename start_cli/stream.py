@@ -0,0 +1,102 @@
+__all__ = ['open_file', 'write_transformations', 'read_transformations']
+
+from typing import IO, Iterable, Iterator, Any
+import bz2
+import gzip
+import json
+import logging
+import lzma
+
+from .imports import lazy_import
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Transformation = lazy_import('darjeeling.transformation', 'Transformation')
+
+COMPRESSORS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open
+}
+
+MAGIC_NUMBERS = [
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open)
+]
+
+
+def open_file(fn, mode='r'):
+    # type: (str, str) -> IO[Any]
+    """
+    Opens a possibly compressed text file for reading or writing.
+    """
+    if 'w' in mode:
+        for (ext, opener) in COMPRESSORS.items():
+            if fn.endswith(ext):
+                return opener(fn, 'wt')
+        return open(fn, 'w')
+
+    with open(fn, 'rb') as f:
+        header = f.read(6)
+    for (magic, opener) in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return opener(fn, 'rt')
+    return open(fn, 'r')
+
+
+def write_transformations(transformations, fn):
+    # type: (Iterable[Transformation], str) -> int
+    """
+    Incrementally writes a sequence of transformations to a given file. If
+    the file has a '.json' extension, the transformations are written as a
+    single JSON list, in the legacy format; otherwise, they are written as
+    JSON Lines.
+
+    Returns:
+        the number of transformations that were written.
+    """
+    legacy = fn.endswith('.json')
+    num_written = 0
+    with open_file(fn, 'w') as f:
+        if legacy:
+            f.write('[')
+        for transformation in transformations:
+            if legacy and num_written > 0:
+                f.write(',\n')
+            f.write(json.dumps(transformation.to_dict()))
+            if not legacy:
+                f.write('\n')
+            num_written += 1
+        if legacy:
+            f.write(']')
+    return num_written
+
+
+def read_transformations(fn):
+    # type: (str) -> Iterator[Transformation]
+    """
+    Lazily reads the transformations from a given file, written in either the
+    JSON Lines or the legacy JSON list format. Only the legacy format needs
+    to be loaded into memory in its entirety.
+    """
+    with open_file(fn, 'r') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+
+        if first == '[':
+            logger.info("loading transformations from legacy JSON list format: %s",  # noqa: pycodestyle
+                        fn)
+            jsn = json.loads(first + f.read())
+            for d in jsn:
+                yield Transformation.from_dict(d)
+            return
+
+        line = first + f.readline()
+        while line:
+            line = line.strip()
+            if line:
+                yield Transformation.from_dict(json.loads(line))
+            line = f.readline()
@@ -1,17 +1,41 @@
 __all__ = ['TestController']
 
-import sys
+from typing import Any, Dict, List, Tuple
+import itertools
+import json
 import logging
+import math
+import os
+import shutil
+import sys
+import time
 
-from start_core.test import execute as execute_test
-from start_core.scenario import Scenario
+import tabulate
 from cement.ext.ext_argparse import ArgparseController, expose
 
+from .imports import lazy_import
 from .opts import *
+from .batch import Job, JobResult, NETNS_PREFIX, run_jobs, expand_files, \
+    forward_options, unique_names
+from .util import atomic_write
+from .sprt import SequentialTest, run_sequential, EXIT_CODES
+from .profile import HostProfile, DEFAULT_SPEEDUP
+from .history import DEFAULT_TIME_LIMIT, record_duration
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
 
+execute_test = lazy_import('start_core.test', 'execute')
+Scenario = lazy_import('start_core.scenario', 'Scenario')
+
+# the options that are forwarded to each mission by the test-batch command
+OPTS_MISSION = [
+    OPT_LIVENESS,
+    OPT_TIMEOUT,
+    OPT_TIMEOUT_CONNECTION,
+    OPT_CHECK_WAYPOINTS
+]
+
 
 class TestController(ArgparseController):
     class Meta:
@@ -29,8 +53,11 @@ class TestController(ArgparseController):
             OPT_TIMEOUT,
             OPT_TIMEOUT_CONNECTION,
             OPT_ATTACK,
-            OPT_CHECK_WAYPOINTS
-        ])
+            OPT_CHECK_WAYPOINTS,
+            (['--report'],
+             {'help': 'writes a JSON-encoded summary of the outcome to a given file.',
+              'type': str})
+        ] + OPTS_SEQUENTIAL)
     def execute(self):
         # type: () -> None
         fn_scenario = self.app.pargs.file
@@ -41,17 +68,282 @@ class TestController(ArgparseController):
         speedup = self.app.pargs.speedup
         scenario = Scenario.from_file(fn_scenario)
         attack = scenario.attack if self.app.pargs.attack else None
-        (passed, reason) = execute_test(sitl=scenario.sitl,
-                                        mission=scenario.mission,
-                                        attack=attack,
-                                        speedup=speedup,
-                                        timeout_mission=timeout_mission,
-                                        timeout_liveness=timeout_liveness,
-                                        timeout_connection=timeout_connection,
-                                        check_wps=check_waypoints)
+
+        def run():
+            # type: () -> Tuple[bool, Any]
+            time_run_start = time.time()
+            (passed, reason) = execute_test(sitl=scenario.sitl,
+                                            mission=scenario.mission,
+                                            attack=attack,
+                                            speedup=speedup,
+                                            timeout_mission=timeout_mission,
+                                            timeout_liveness=timeout_liveness,
+                                            timeout_connection=timeout_connection,
+                                            check_wps=check_waypoints)
+            # the durations of passing runs without the attack determine the
+            # time limits of later runs
+            if passed and not attack:
+                record_duration(fn_scenario, speedup,
+                                time.time() - time_run_start, 'execute')
+            return (passed, reason)
+
+        fn_report = self.app.pargs.report
+        time_start = time.time()
+        if self.app.pargs.sequential:
+            reasons = []  # type: List[str]
+            def trial():
+                # type: () -> bool
+                (passed, reason) = run()
+                if not passed:
+                    logger.info("mission failed: %s", reason)
+                    reasons.append(str(reason))
+                return passed
+
+            sprt = SequentialTest.from_args(self.app.pargs)
+            decision = run_sequential(trial, sprt)
+            duration = time.time() - time_start
+            if fn_report:
+                report = sprt.to_dict()
+                report['passed'] = decision == 'pass'
+                report['reason'] = reasons[-1] if reasons else None
+                report['duration'] = duration
+                with atomic_write(fn_report) as f:
+                    json.dump(report, f)
+            logger.info("mission outcome: %s", sprt)
+            sys.exit(EXIT_CODES[decision])
+
+        (passed, reason) = run()
+        duration = time.time() - time_start
+
+        if fn_report:
+            with atomic_write(fn_report) as f:
+                json.dump({'passed': passed,
+                           'reason': None if passed else str(reason),
+                           'duration': duration}, f)
+
         if passed:
             logger.info("mission was successfully completed.")
             sys.exit(0)
         else:
             logger.info("mission failed: %s", reason)
             sys.exit(1)
+
+    @expose(
+        help='executes many missions concurrently on isolated SITL instances',
+        arguments=[
+            (['files'],
+             {'help': 'paths to (or glob patterns for) scenario config files',
+              'nargs': '+'}),
+            (['--speedup'],
+             {'help': 'the speed-up factors that should be used.',
+              'type': int,
+              'nargs': '+',
+              'dest': 'speedups',
+              'default': [10]}),
+            (['--attack'],
+             {'help': 'whether each mission should be executed with the attack, without it, or both.',
+              'choices': ['off', 'on', 'both'],
+              'default': 'off'}),
+            (['--repeat'],
+             {'help': 'the number of times that each combination should be executed.',
+              'type': int,
+              'default': 1}),
+            (['--isolation'],
+             {'help': 'the isolation used for each SITL instance: a private network namespace, or none.',
+              'choices': ['netns', 'none'],
+              'default': 'netns'}),
+            OPT_WORKERS,
+            (['--output'],
+             {'help': 'output directory for mission logs and reports',
+              'default': 'missions',
+              'type': str})
+        ] + OPTS_MISSION + OPTS_SEQUENTIAL)
+    def test_batch(self):
+        # type: () -> None
+        dir_out = self.app.pargs.output
+        workers = self.app.pargs.workers or os.cpu_count() or 1
+        attack_modes = {'off': [False],
+                        'on': [True],
+                        'both': [False, True]}[self.app.pargs.attack]
+
+        prefix = None
+        if self.app.pargs.isolation == 'netns':
+            for tool in ('unshare', 'ip'):
+                if not shutil.which(tool):
+                    logger.error("network namespace isolation requires '%s'",
+                                 tool)
+                    sys.exit(1)
+            prefix = NETNS_PREFIX
+
+        files = expand_files(self.app.pargs.files)
+        if not files:
+            logger.error("no scenario files provided")
+            sys.exit(1)
+
+        # the jobs for each scenario are named after the directory that holds
+        # it, and so scenarios in the same directory are told apart
+        names = unique_names([os.path.basename(os.path.dirname(os.path.abspath(fn)))  # noqa: pycodestyle
+                              for fn in files])
+        labels = dict(zip(files, names))  # type: Dict[str, str]
+
+        options = forward_options(self.app.pargs, OPTS_MISSION + OPTS_SEQUENTIAL)
+        jobs = []  # type: List[Job]
+        descriptions = {}
+        combinations = itertools.product(files,
+                                         self.app.pargs.speedups,
+                                         attack_modes,
+                                         range(self.app.pargs.repeat))
+        for (fn_scenario, speedup, attack, run) in combinations:
+            scenario = labels[fn_scenario]
+            name = "{}.speedup-{}.attack-{}.{}".format(
+                scenario, speedup, 'on' if attack else 'off', run)
+            dir_job = os.path.join(dir_out, scenario)
+            os.makedirs(dir_job, exist_ok=True)
+            fn_report = os.path.join(dir_job, name + '.json')
+            args = ['execute', fn_scenario,
+                    '--speedup', str(speedup),
+                    '--report', fn_report] + options
+            if attack:
+                args.append('--attack')
+            jobs.append(Job(name, args, os.path.join(dir_job, name + '.log'), prefix))
+            descriptions[name] = {'scenario': fn_scenario,
+                                  'speedup': speedup,
+                                  'attack': attack,
+                                  'run': run,
+                                  'report': fn_report}
+
+        def report(result):
+            # type: (JobResult) -> None
+            jsn = dict(descriptions[result.job.name])
+            jsn['wall_clock'] = result.duration
+            try:
+                with open(jsn.pop('report'), 'r') as f:
+                    jsn.update(json.load(f))
+            except (IOError, OSError, ValueError):
+                jsn['passed'] = False
+                jsn['reason'] = "mission crashed (exit code {}); see log: {}".format(
+                    result.returncode, result.job.fn_log)
+            print(json.dumps(jsn))
+            sys.stdout.flush()
+
+        logger.info("executing %d missions using %d workers", len(jobs), workers)
+        results = run_jobs(jobs, workers, on_complete=report)
+        num_passed = sum(1 for r in results if r.returncode == 0)
+        logger.info("%d of %d missions passed", num_passed, len(results))
+
+    @expose(
+        help='finds the highest speed-up factor at which the missions of a given scenario behave as they do at the reference speed-up factor on this host',
+        arguments=[
+            OPT_FILE,
+            (['--speedups'],
+             {'help': 'the speed-up factors that should be tried, in increasing order.',
+              'type': int,
+              'nargs': '+',
+              'default': [5, 10, 15, 20, 25, 30, 40, 50]}),
+            (['--reference-speedup'],
+             {'help': 'the speed-up factor at which the reference outcome is obtained.',
+              'type': int,
+              'default': 1}),
+            (['--no-save'],
+             {'help': 'reports the calibrated speed-up factor without saving it to the profile for this host.',
+              'action': 'store_true'}),
+            OPT_ATTACK,
+            OPT_ALPHA,
+            OPT_BETA,
+            OPT_INDIFFERENCE,
+            OPT_MIN_RUNS,
+            OPT_MAX_RUNS
+        ] + OPTS_MISSION)
+    def calibrate(self):
+        # type: () -> None
+        fn_scenario = self.app.pargs.file
+        scenario = Scenario.from_file(fn_scenario)
+        attack = scenario.attack if self.app.pargs.attack else None
+        reference = self.app.pargs.reference_speedup
+        # learned time limits only apply to the speed-up factor at which
+        # they were learned; the given (or default) limit applies at the
+        # default speed-up factor, and is scaled up for slower factors so
+        # that slow but otherwise passing missions do not time out
+        base_timeout = self.app.pargs.timeout_mission or DEFAULT_TIME_LIMIT
+
+        def time_limit(speedup):
+            # type: (int) -> int
+            scale = max(1.0, float(DEFAULT_SPEEDUP) / speedup)
+            return int(math.ceil(base_timeout * scale))
+
+        speedups = sorted(s for s in set(self.app.pargs.speedups)
+                          if s > reference)
+
+        def evaluate(speedup):
+            # type: (int) -> Dict[str, Any]
+            durations = []  # type: List[float]
+
+            def trial():
+                # type: () -> bool
+                time_start = time.time()
+                (passed, reason) = execute_test(
+                    sitl=scenario.sitl,
+                    mission=scenario.mission,
+                    attack=attack,
+                    speedup=speedup,
+                    timeout_mission=timeout_mission,
+                    timeout_liveness=self.app.pargs.timeout_liveness,
+                    timeout_connection=self.app.pargs.timeout_connection,
+                    check_wps=self.app.pargs.check_waypoints)
+                durations.append(time.time() - time_start)
+                if not passed:
+                    logger.info("mission failed: %s", reason)
+                return passed
+
+            timeout_mission = time_limit(speedup)
+            logger.info("executing missions at speed-up factor %d (time limit: %d seconds)",  # noqa: pycodestyle
+                        speedup, timeout_mission)
+            sprt = SequentialTest.from_args(self.app.pargs)
+            run_sequential(trial, sprt)
+            logger.info("outcome at speed-up factor %d: %s", speedup, sprt)
+            result = sprt.to_dict()
+            result['speedup'] = speedup
+            result['load'] = os.getloadavg()[0]
+            result['mean_duration'] = sum(durations) / len(durations)
+            return result
+
+        # missions must behave consistently at the reference speed-up factor
+        # for any other factor to be compared against it
+        results = [evaluate(reference)]
+        expected = results[0]['decision']
+        if expected not in ('pass', 'fail'):
+            logger.error("missions are %s at the reference speed-up factor (%d)",
+                         expected, reference)
+            sys.exit(1)
+
+        # the outcome only becomes less reliable as the factor increases, and
+        # so calibration stops at the first factor that no longer matches
+        calibrated = reference
+        for speedup in speedups:
+            result = evaluate(speedup)
+            results.append(result)
+            if result['decision'] != expected:
+                break
+            calibrated = speedup
+
+        rows = [(r['speedup'],
+                 r['decision'],
+                 r['runs'],
+                 "{:.2f}".format(r['passes'] / r['runs']),
+                 "{:.1f}".format(r['mean_duration']),
+                 "{:.2f}".format(r['load']))
+                for r in results]
+        print(tabulate.tabulate(
+            rows, headers=['Speed-up', 'Outcome', 'Runs', 'Pass Rate',
+                           'Mean Duration (s)', 'Load']))
+        print("\ncalibrated speed-up factor: {}".format(calibrated))
+
+        if not self.app.pargs.no_save:
+            profile = HostProfile.load()
+            profile.record(fn_scenario, calibrated, {
+                'reference_speedup': reference,
+                'expected': expected,
+                'outcomes': results})
+            profile.save()
+            logger.info("saved calibrated speed-up factor to host profile: %s",
+                        profile.filename)
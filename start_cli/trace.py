@@ -0,0 +1,197 @@
+__all__ = ['Tracer', 'traced', 'writes_trace', 'memory_usage']
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import contextlib
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+from .util import atomic_write
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+def memory_usage():
+    # type: () -> Tuple[Optional[float], float]
+    """
+    Returns the current and peak resident set size of this process, given
+    in megabytes. The current size is None on platforms without procfs.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS, and in kilobytes elsewhere
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        current_mb = pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (IOError, OSError, ValueError, IndexError):
+        current_mb = None
+    return (current_mb, peak_mb)
+
+
+class Tracer(object):
+    """
+    Records the time spent within (possibly nested and concurrent) spans of
+    work, together with the memory usage of this process at the end of each
+    span and any counts attached to those spans. The recorded events can be
+    written to disk in the Chrome trace event format, which can be viewed
+    using chrome://tracing or Perfetto.
+    """
+    def __init__(self):
+        # type: () -> None
+        self.__events = []  # type: List[Dict[str, Any]]
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__time_origin = time.perf_counter()
+        self.__pid = os.getpid()
+        self.__threads = {}  # type: Dict[int, str]
+
+    def __timestamp(self):
+        # type: () -> float
+        """
+        Returns the number of microseconds since this tracer was created.
+        """
+        return (time.perf_counter() - self.__time_origin) * 1e6
+
+    def __stack(self):
+        # type: () -> List[Dict[str, Any]]
+        if not hasattr(self.__local, 'stack'):
+            self.__local.stack = []
+        return self.__local.stack
+
+    def __record(self, event):
+        # type: (Dict[str, Any]) -> None
+        thread = threading.current_thread()
+        event['pid'] = self.__pid
+        event['tid'] = thread.ident
+        with self.__lock:
+            self.__threads[thread.ident] = thread.name
+            self.__events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        # type: (str, **Any) -> Iterator[Dict[str, Any]]
+        """
+        Records the time spent within a block as a span with a given name.
+        Any keyword arguments, as well as any annotations that are added
+        during the block, are attached to the span.
+        """
+        stack = self.__stack()
+        stack.append(args)
+        time_start = self.__timestamp()
+        try:
+            yield args
+        finally:
+            time_end = self.__timestamp()
+            stack.pop()
+            (rss, peak_rss) = memory_usage()
+            args['rss_mb'] = rss
+            args['peak_rss_mb'] = peak_rss
+            self.__record({'name': name,
+                           'cat': 'start-cli',
+                           'ph': 'X',
+                           'ts': time_start,
+                           'dur': time_end - time_start,
+                           'args': args})
+            self.counter('memory', rss_mb=rss, peak_rss_mb=peak_rss)
+
+    def annotate(self, **args):
+        # type: (**Any) -> None
+        """
+        Attaches a set of values (e.g., counts) to the innermost span that is
+        open on the calling thread. Has no effect if there is no open span.
+        """
+        stack = self.__stack()
+        if stack:
+            stack[-1].update(args)
+
+    def counter(self, name, **values):
+        # type: (str, **Optional[float]) -> None
+        """
+        Records the current values of a named set of counters.
+        """
+        values = {k: v for (k, v) in values.items() if v is not None}
+        self.__record({'name': name,
+                       'ph': 'C',
+                       'ts': self.__timestamp(),
+                       'args': values})
+
+    def instant(self, name, **args):
+        # type: (str, **Any) -> None
+        """
+        Records an event that occurred at a single point in time.
+        """
+        self.__record({'name': name,
+                       'cat': 'start-cli',
+                       'ph': 'i',
+                       's': 'p',
+                       'ts': self.__timestamp(),
+                       'args': args})
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        with self.__lock:
+            events = list(self.__events)
+            threads = dict(self.__threads)
+        metadata = [{'name': 'thread_name',
+                     'ph': 'M',
+                     'pid': self.__pid,
+                     'tid': tid,
+                     'args': {'name': name}}
+                    for (tid, name) in threads.items()]
+        return {'traceEvents': metadata + events,
+                'displayTimeUnit': 'ms'}
+
+    def to_file(self, fn):
+        # type: (str) -> None
+        logger.debug("writing trace to file: %s", fn)
+        with atomic_write(fn) as f:
+            json.dump(self.to_dict(), f)
+        logger.info("wrote trace to file: %s", fn)
+
+
+def traced(name):
+    # type: (str) -> Callable[[Callable[..., Any]], Callable[..., Any]]
+    """
+    Decorates a method of an object with a `tracer` attribute so that each
+    call to that method is recorded as a span with a given name.
+    """
+    def decorator(method):
+        # type: (Callable[..., Any]) -> Callable[..., Any]
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            # type: (Any, *Any, **Any) -> Any
+            with self.tracer.span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def writes_trace(name):
+    # type: (str) -> Callable[[Callable[..., Any]], Callable[..., Any]]
+    """
+    Decorates a command of a controller with a `tracer` attribute so that
+    the command is recorded as a span with a given name, and so that the
+    trace is written to the file given by its `--trace` option, if any, once
+    the command has finished (successfully or otherwise).
+    """
+    def decorator(command):
+        # type: (Callable[..., Any]) -> Callable[..., Any]
+        @functools.wraps(command)
+        def wrapper(self, *args, **kwargs):
+            # type: (Any, *Any, **Any) -> Any
+            try:
+                with self.tracer.span(name):
+                    return command(self, *args, **kwargs)
+            finally:
+                fn_trace = self.app.pargs.trace
+                if fn_trace:
+                    self.tracer.to_file(fn_trace)
+        return wrapper
+    return decorator
@@ -0,0 +1,52 @@
+__all__ = ['digest', 'file_digest', 'atomic_write']
+
+from typing import Any, Iterator
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+
+
+def digest(*parts):
+    # type: (*Any) -> str
+    """
+    Computes a SHA-256 hex digest of a sequence of JSON-serializable values.
+    """
+    jsn = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(jsn.encode('utf-8')).hexdigest()
+
+
+def file_digest(fn, block_size=1 << 20):
+    # type: (str, int) -> str
+    """
+    Computes a SHA-256 hex digest of the contents of a given file.
+    """
+    h = hashlib.sha256()
+    with open(fn, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_write(fn, mode='w'):
+    # type: (str, str) -> Iterator[Any]
+    """
+    Opens a temporary file alongside a given file for writing, and moves it
+    into place once the block has been exited without error. Readers will
+    either see the old contents of the file or the new contents, but never
+    a partially written file.
+    """
+    dirname = os.path.dirname(os.path.abspath(fn))
+    fd, fn_tmp = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(fn_tmp, fn)
+    except BaseException:
+        try:
+            os.remove(fn_tmp)
+        except OSError:
+            pass
+        raise
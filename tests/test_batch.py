@@ -0,0 +1,15 @@
+from start_cli.batch import unique_names
+
+
+def test_unique_names_are_unchanged():
+    assert unique_names(['a', 'b', 'c']) == ['a', 'b', 'c']
+
+
+def test_repeated_names_are_suffixed():
+    assert unique_names(['a', 'a', 'b', 'a']) == ['a', 'a-2', 'b', 'a-3']
+
+
+def test_suffixed_names_avoid_given_names():
+    names = unique_names(['a', 'a', 'a-2', 'a-3', 'a'])
+    assert names == ['a', 'a-4', 'a-2', 'a-3', 'a-5']
+    assert len(set(names)) == len(names)
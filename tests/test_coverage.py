@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip('bugzoo')
+
+from bugzoo.core.coverage import TestSuiteCoverage as SuiteCoverage
+
+from start_cli.coverage import (CoverageFile, mapped_coverage_file,
+                                read_coverage, write_coverage)
+
+
+def _report():
+    def test(name, passed, coverage):
+        response = {'code': 0 if passed else 1,
+                    'duration': 1.5,
+                    'output': ''}
+        return {'test': name,
+                'outcome': {'passed': passed, 'response': response},
+                'coverage': coverage}
+    return {'p1': test('p1', True, {'foo.c': [1, 2, 6], 'bar.c': [3]}),
+            'p2': test('p2', True, {'foo.c': [2, 10]}),
+            'n1': test('n1', False, {'foo.c': [6, 10], 'baz.c': []})}
+
+
+def _normalize(d):
+    return {name: {'test': t['test'],
+                   'outcome': t['outcome'],
+                   'coverage': {fn: sorted(lines)
+                                for (fn, lines) in t['coverage'].items()
+                                if lines}}
+            for (name, t) in d.items()}
+
+
+def test_binary_round_trip(tmp_path):
+    coverage = SuiteCoverage.from_dict(_report())
+    fn = str(tmp_path / 'coverage.cov')
+    write_coverage(coverage, fn)
+
+    loaded = read_coverage(fn)
+    assert isinstance(loaded, SuiteCoverage)
+    assert mapped_coverage_file(loaded) is not None
+    assert sorted(loaded) == ['n1', 'p1', 'p2']
+    assert len(loaded) == 3
+    assert not loaded['n1'].outcome.passed
+    assert loaded['p1'].outcome.response.duration == 1.5
+    assert _normalize(loaded.to_dict()) == _normalize(coverage.to_dict())
+    assert _normalize(SuiteCoverage.to_dict(loaded)) \
+        == _normalize(coverage.to_dict())
+
+
+def test_binary_coverage_is_decoded_lazily(tmp_path, monkeypatch):
+    fn = str(tmp_path / 'coverage.cov')
+    write_coverage(SuiteCoverage.from_dict(_report()), fn)
+
+    decoded = []
+    test_to_dict = CoverageFile.test_to_dict
+
+    def spy(self, i):
+        decoded.append(i)
+        return test_to_dict(self, i)
+    monkeypatch.setattr(CoverageFile, 'test_to_dict', spy)
+
+    loaded = read_coverage(fn)
+    assert decoded == []
+    loaded['p2']
+    loaded['p2']
+    assert len(decoded) == 1
+
+
+def test_json_coverage_is_not_mapped(tmp_path):
+    fn = str(tmp_path / 'coverage.json')
+    write_coverage(SuiteCoverage.from_dict(_report()), fn)
+    loaded = read_coverage(fn)
+    assert mapped_coverage_file(loaded) is None
+    assert _normalize(loaded.to_dict()) == _normalize(_report())
@@ -0,0 +1,64 @@
+import math
+
+import pytest
+
+pytest.importorskip('bugzoo')
+pytest.importorskip('numpy')
+
+from bugzoo.core.coverage import TestSuiteCoverage as SuiteCoverage
+
+from start_cli.coverage import read_coverage, write_coverage
+from start_cli.localization import CoverageMatrix, write_rankings
+
+
+def _report():
+    def test(name, passed, coverage):
+        response = {'code': 0 if passed else 1,
+                    'duration': 1.0,
+                    'output': ''}
+        return {'test': name,
+                'outcome': {'passed': passed, 'response': response},
+                'coverage': coverage}
+    return {'p1': test('p1', True, {'foo.c': [1, 2, 3], 'bar.c': [7]}),
+            'p2': test('p2', True, {'foo.c': [1, 4]}),
+            'n1': test('n1', False, {'foo.c': [1, 2, 4], 'bar.c': [7, 8]}),
+            'n2': test('n2', False, {'foo.c': [2, 4]})}
+
+
+def _ochiai(report):
+    failing = [t for t in report.values() if not t['outcome']['passed']]
+    passing = [t for t in report.values() if t['outcome']['passed']]
+
+    def covers(test, line):
+        return line[1] in test['coverage'].get(line[0], [])
+
+    lines = {(fn, num) for t in report.values()
+             for (fn, nums) in t['coverage'].items() for num in nums}
+    scores = {}
+    for line in lines:
+        ef = sum(1 for t in failing if covers(t, line))
+        ep = sum(1 for t in passing if covers(t, line))
+        if ef:
+            scores[line] = ef / math.sqrt(len(failing) * (ef + ep))
+    return scores
+
+
+@pytest.mark.parametrize('fn', ['coverage.json', 'coverage.cov'])
+def test_scores_of_loaded_coverage(tmp_path, fn):
+    fn = str(tmp_path / fn)
+    write_coverage(SuiteCoverage.from_dict(_report()), fn)
+    coverage = read_coverage(fn)
+    matrix = CoverageMatrix.from_coverage(coverage)
+    assert matrix.num_tests == 4
+    scores = matrix.scores('ochiai')
+    expected = _ochiai(_report())
+    assert set(scores) == set(expected)
+    for line in expected:
+        assert scores[line] == pytest.approx(expected[line])
+
+
+def test_scores_of_computed_coverage(tmp_path):
+    coverage = SuiteCoverage.from_dict(_report())
+    scores = CoverageMatrix.from_coverage(coverage).scores('ochiai')
+    assert scores == pytest.approx(_ochiai(_report()))
+    write_rankings(coverage, str(tmp_path / 'rankings.json'), ['ochiai'])
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip('bugzoo')
+pytest.importorskip('kaskara')
+pytest.importorskip('darjeeling')
+
+from bugzoo.core.bug import Bug
+from kaskara.analysis import Analysis
+
+from start_cli.snippets import build_snippets
+
+
+def _snapshot():
+    return Bug.from_dict({'name': 'example',
+                          'image': 'example',
+                          'dataset': None,
+                          'program': None,
+                          'source': None,
+                          'source-location': '/experiment/source',
+                          'languages': ['cpp'],
+                          'test-harness': {'type': 'empty'},
+                          'compiler': {'type': 'simple',
+                                       'context': '/experiment/source',
+                                       'command': 'make',
+                                       'command_clean': 'make clean',
+                                       'command_with_instrumentation': 'make',
+                                       'time-limit': 10}})
+
+
+def _analysis(snapshot):
+    def location(fn, line):
+        return '/experiment/source/{}@{}:1::{}:10'.format(fn, line, line)
+
+    def statement(content, fn, line):
+        return {'content': content,
+                'canonical': content,
+                'kind': 'BinaryOperator',
+                'location': location(fn, line),
+                'reads': ['x'],
+                'writes': ['y'],
+                'visible': ['x', 'y'],
+                'decls': [],
+                'live_before': ['x'],
+                'requires_syntax': []}
+    d = {'functions': [{'name': 'f',
+                        'location': location('a.cpp', 1),
+                        'body': location('a.cpp', 1),
+                        'return-type': 'int',
+                        'global': True,
+                        'pure': False}],
+         'statements': [statement('y = x;', 'a.cpp', 2),
+                        statement('x++;', 'a.cpp', 3),
+                        statement('y = x;', 'b.cpp', 5)],
+         'loops': []}
+    return Analysis.from_dict(d, snapshot)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_build_snippets(workers):
+    snapshot = _snapshot()
+    db = build_snippets(_analysis(snapshot), snapshot, False, workers=workers)
+    snippets = {s.content: s for s in db}
+    assert set(snippets) == {'y = x;', 'x++;'}
+    locations = sorted(str(loc) for loc in snippets['y = x;'].locations)
+    assert locations == ['a.cpp@2:1::2:10', 'b.cpp@5:1::5:10']